@@ -0,0 +1,49 @@
+"""Measure the memory used per region for the different region storages
+
+Usage: python benchmarks/region_memory.py [--regions N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import tracemalloc
+
+from virtual_allocator import AllocationPolicy, Allocator, RegionStorage
+
+
+def measure(storage: RegionStorage, num_regions: int) -> float:
+    """Allocate `num_regions` regions and return the number of bytes allocated per region"""
+    gc.collect()
+    tracemalloc.start()
+    alloc = Allocator(
+        address=0,
+        size=num_regions * 16,
+        block_size=16,
+        alignment=16,
+        allocation_policy=AllocationPolicy.BEST_FIT,
+        region_storage=storage,
+    )
+    # Free every other region, so the regions do not get merged and a mix of free and allocated regions is measured
+    regions = [alloc.allocate(16) for _ in range(num_regions)]
+    for region in regions[::2]:
+        alloc.free(region)
+    del regions
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(alloc._regions) == num_regions
+    return used / num_regions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--regions", type=int, default=100_000, help="Number of regions to allocate")
+    args = parser.parse_args()
+
+    for storage in RegionStorage:
+        print(f"{storage.name:<12} {measure(storage, args.regions):8.1f} bytes/region")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Measure the throughput of a globally locked allocator and a sharded allocator for multiple threads
+
+Every thread allocates a batch of regions and frees them again, until the total number of operations is reached.
+Throughput only scales with the number of threads on a free-threaded Python build, with the GIL the benchmark shows the
+overhead of the locking.
+
+Usage: python benchmarks/sharded_scaling.py [--ops N] [--threads 1 2 4 8]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import threading
+import time
+import typing as ty
+
+from virtual_allocator import AllocationPolicy, Allocator, MemoryRegion
+from virtual_allocator.sharded import ShardedAllocator
+
+_HEAP_SIZE = 1 << 30
+_BLOCK_SIZE = 64
+
+
+class _LockedAllocator:
+    """Allocator with a single global lock, the baseline for the sharded allocator"""
+
+    def __init__(self) -> None:
+        self._allocator = Allocator(0, _HEAP_SIZE, _BLOCK_SIZE, _BLOCK_SIZE, AllocationPolicy.BEST_FIT)
+        self._lock = threading.Lock()
+
+    def allocate(self, size: int) -> MemoryRegion:
+        with self._lock:
+            return self._allocator.allocate(size)
+
+    def free(self, region: MemoryRegion) -> None:
+        with self._lock:
+            self._allocator.free(region)
+
+
+class _AllocatorProtocol(ty.Protocol):
+    def allocate(self, size: int) -> MemoryRegion: ...
+
+    def free(self, region: MemoryRegion) -> None: ...
+
+
+def _worker(alloc: _AllocatorProtocol, num_ops: int, seed: int, barrier: threading.Barrier) -> None:
+    rng = random.Random(seed)
+    sizes = [rng.randrange(1, 64) * _BLOCK_SIZE for _ in range(64)]
+    barrier.wait()
+    for _ in range(num_ops // (2 * len(sizes))):
+        regions = [alloc.allocate(size) for size in sizes]
+        for region in regions:
+            alloc.free(region)
+
+
+def run(alloc: _AllocatorProtocol, num_threads: int, num_ops: int) -> float:
+    """Run the workload with `num_threads` threads and return the operations per second"""
+    barrier = threading.Barrier(num_threads + 1)
+    threads = [
+        threading.Thread(target=_worker, args=(alloc, num_ops // num_threads, seed, barrier))
+        for seed in range(num_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return num_ops / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=400_000, help="Total number of operations per run")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8], help="Numbers of threads to run")
+    args = parser.parse_args()
+
+    gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil_enabled else 'disabled'}")
+    print(f"{'threads':>7} {'global lock ops/s':>18} {'sharded ops/s':>14}")
+    for num_threads in args.threads:
+        locked = run(_LockedAllocator(), num_threads, args.ops)
+        sharded = run(
+            ShardedAllocator(
+                0, _HEAP_SIZE, _BLOCK_SIZE, _BLOCK_SIZE, AllocationPolicy.BEST_FIT, num_shards=max(args.threads)
+            ),
+            num_threads,
+            args.ops,
+        )
+        print(f"{num_threads:>7} {locked:>18,.0f} {sharded:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Compare allocation policies on synthetic workloads of different sizes
+
+Each workload first allocates the given number of regions and then runs twice as many churn steps on them:
+
+* uniform: free a random region and allocate a new one, sizes are uniformly distributed
+* power_law: like uniform, but the sizes follow a power law, most regions are small and a few are very large
+* lifo: free the most recently allocated region and allocate a new one
+* fifo: free the least recently allocated region and allocate a new one
+* resize: reallocate a random region to a new size
+
+The traces are generated up front with a fixed seed, so all policies replay the same operations. The heap is 25%
+larger than the peak size of the live regions of a trace, so the policies are compared at a realistic fill level. Each
+run is replayed twice, once for the timing and once under tracemalloc for the peak memory, since tracing slows down the
+allocator.
+
+The first fit policy scans the regions for every allocation, runs with 100000 regions and more take a long time with it.
+
+Usage: python benchmarks/suite.py [--regions 1000 10000] [--policies FIRST_FIT BEST_FIT] [--workloads ...]
+       python benchmarks/suite.py --regions 100000 1000000 --policies BEST_FIT TLSF
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import gc
+import random
+import time
+import tracemalloc
+import typing as ty
+
+from virtual_allocator import AllocationPolicy, Allocator, MemoryRegion, OutOfMemoryError
+
+_BLOCK_SIZE = 16
+_MAX_BLOCKS = 1024
+
+# Trace operations as (operation, region id, size)
+_ALLOCATE = 0
+_FREE = 1
+_RESIZE = 2
+
+_Trace: ty.TypeAlias = list[tuple[int, int, int]]
+
+
+def _uniform_size(rng: random.Random) -> int:
+    return rng.randint(1, 64) * _BLOCK_SIZE
+
+
+def _power_law_size(rng: random.Random) -> int:
+    return min(int(rng.paretovariate(1.2)), _MAX_BLOCKS) * _BLOCK_SIZE
+
+
+def _churn(num_regions: int, rng: random.Random, size: ty.Callable[[random.Random], int], order: str) -> _Trace:
+    """Allocate `num_regions` regions, then free a region chosen by `order` and allocate a new one repeatedly"""
+    trace = [(_ALLOCATE, region_id, size(rng)) for region_id in range(num_regions)]
+    live = collections.deque(range(num_regions))
+    for region_id in range(num_regions, 3 * num_regions):
+        if order == "lifo":
+            victim = live.pop()
+        elif order == "fifo":
+            victim = live.popleft()
+        else:
+            idx = rng.randrange(len(live))
+            live[idx], live[-1] = live[-1], live[idx]
+            victim = live.pop()
+        trace.append((_FREE, victim, 0))
+        trace.append((_ALLOCATE, region_id, size(rng)))
+        live.append(region_id)
+    return trace
+
+
+def _resize(num_regions: int, rng: random.Random) -> _Trace:
+    """Allocate `num_regions` regions, then reallocate random regions to new sizes"""
+    trace = [(_ALLOCATE, region_id, _uniform_size(rng)) for region_id in range(num_regions)]
+    trace.extend((_RESIZE, rng.randrange(num_regions), _uniform_size(rng)) for _ in range(2 * num_regions))
+    return trace
+
+
+WORKLOADS: dict[str, ty.Callable[[int, random.Random], _Trace]] = {
+    "uniform": lambda n, rng: _churn(n, rng, _uniform_size, "random"),
+    "power_law": lambda n, rng: _churn(n, rng, _power_law_size, "random"),
+    "lifo": lambda n, rng: _churn(n, rng, _uniform_size, "lifo"),
+    "fifo": lambda n, rng: _churn(n, rng, _uniform_size, "fifo"),
+    "resize": _resize,
+}
+
+
+def _peak_live_size(trace: _Trace) -> int:
+    """Get the peak of the total size of the live regions of `trace`"""
+    sizes: dict[int, int] = {}
+    live_size = peak_size = 0
+    for operation, region_id, size in trace:
+        if operation == _FREE:
+            live_size -= sizes.pop(region_id)
+        else:
+            live_size += size - sizes.get(region_id, 0)
+            sizes[region_id] = size
+        peak_size = max(peak_size, live_size)
+    return peak_size
+
+
+class Result(ty.NamedTuple):
+    ops_per_second: float
+    peak_bytes: int
+    fragmentation: float
+    out_of_memory_errors: int
+
+
+def replay(alloc: Allocator, trace: _Trace) -> int:
+    """Replay `trace` on `alloc` and return the number of operations which raised :class:`OutOfMemoryError`"""
+    regions: dict[int, MemoryRegion] = {}
+    out_of_memory_errors = 0
+    for operation, region_id, size in trace:
+        try:
+            if operation == _ALLOCATE:
+                regions[region_id] = alloc.allocate(size)
+            elif operation == _FREE:
+                region = regions.pop(region_id, None)
+                if region is not None:
+                    alloc.free(region)
+            else:
+                region = regions.get(region_id)
+                if region is not None:
+                    regions[region_id], _ = alloc.reallocate(region, size)
+        except OutOfMemoryError:
+            out_of_memory_errors += 1
+    return out_of_memory_errors
+
+
+def run(policy: AllocationPolicy, trace: _Trace, heap_size: int) -> Result:
+    """Replay `trace` with `policy`, once for the timing and once for the peak memory"""
+    alloc = Allocator(0, heap_size, _BLOCK_SIZE, _BLOCK_SIZE, policy)
+    gc.collect()
+    start = time.perf_counter()
+    out_of_memory_errors = replay(alloc, trace)
+    duration = time.perf_counter() - start
+    fragmentation = alloc.stats().fragmentation
+    del alloc
+
+    gc.collect()
+    tracemalloc.start()
+    replay(Allocator(0, heap_size, _BLOCK_SIZE, _BLOCK_SIZE, policy), trace)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return Result(len(trace) / duration, peak_bytes, fragmentation, out_of_memory_errors)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--regions", type=int, nargs="+", default=[1_000, 10_000], help="Numbers of live regions")
+    parser.add_argument(
+        "--policies",
+        nargs="+",
+        choices=[policy.name for policy in AllocationPolicy],
+        default=["FIRST_FIT", "BEST_FIT"],
+        help="Allocation policies to compare",
+    )
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the trace generation")
+    args = parser.parse_args()
+
+    print(
+        f"{'workload':<10} {'regions':>9} {'policy':<10} {'ops/s':>12} {'peak MiB':>9} {'fragmentation':>13} {'OOM':>5}"
+    )
+    for workload in args.workloads:
+        for num_regions in args.regions:
+            trace = WORKLOADS[workload](num_regions, random.Random(args.seed))
+            heap_size = _peak_live_size(trace) * 5 // 4 // _BLOCK_SIZE * _BLOCK_SIZE
+            for policy_name in args.policies:
+                result = run(AllocationPolicy[policy_name], trace, heap_size)
+                print(
+                    f"{workload:<10} {num_regions:>9} {policy_name:<10} {result.ops_per_second:>12,.0f} "
+                    f"{result.peak_bytes / 2**20:>9.1f} {result.fragmentation:>13.3f} {result.out_of_memory_errors:>5}"
+                )
+
+
+if __name__ == "__main__":
+    main()
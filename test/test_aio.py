@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from virtual_allocator import AllocationPolicy, Allocator, MemoryRegion, OutOfMemoryError
+from virtual_allocator.aio import AsyncAllocator
+
+
+def _allocator() -> AsyncAllocator:
+    return AsyncAllocator(Allocator(0, 256, block_size=16, alignment=16, allocation_policy=AllocationPolicy.FIRST_FIT))
+
+
+def test_wait_for_free():
+    """Test that allocations wait for free memory in order"""
+
+    async def main() -> None:
+        alloc = _allocator()
+        r1 = await alloc.allocate(128)
+        r2 = await alloc.allocate(128)
+
+        big = asyncio.create_task(alloc.allocate(192))
+        small = asyncio.create_task(alloc.allocate(64))
+        await asyncio.sleep(0)
+        assert alloc.num_waiters == 2
+
+        # The big allocation does not fit yet, the small allocation behind it is served anyway
+        alloc.free(r1)
+        assert await small == MemoryRegion(0, 64, is_free=False)
+        assert not big.done()
+
+        alloc.free(r2)
+        assert await big == MemoryRegion(64, 192, is_free=False)
+        assert alloc.num_waiters == 0
+
+    asyncio.run(main())
+
+
+def test_no_starvation():
+    """Test that a large waiting allocation is served while small allocations keep arriving"""
+
+    async def main() -> None:
+        alloc = AsyncAllocator(
+            Allocator(0, 256, block_size=16, alignment=16, allocation_policy=AllocationPolicy.FIRST_FIT), max_retries=2
+        )
+        held = [await alloc.allocate(128), await alloc.allocate(128)]
+        big = asyncio.create_task(alloc.allocate(192))
+        await asyncio.sleep(0)
+
+        # Each released region would fit the next small allocation, but never the large one
+        small_tasks = []
+        for _ in range(8):
+            small_tasks.append(asyncio.create_task(alloc.allocate(128)))
+            await asyncio.sleep(0)
+            if held:
+                alloc.free(held.pop(0))
+            await asyncio.sleep(0)
+            held.extend(task.result() for task in small_tasks if task.done())
+            small_tasks = [task for task in small_tasks if not task.done()]
+            if big.done():
+                break
+        assert big.done()
+        assert big.result() == MemoryRegion(0, 192, is_free=False)
+
+        for task in small_tasks:
+            task.cancel()
+        await asyncio.gather(*small_tasks, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+def test_exceeds_size():
+    """Test that allocations larger than the allocator fail instead of waiting"""
+
+    async def main() -> None:
+        alloc = _allocator()
+        with pytest.raises(OutOfMemoryError):
+            await alloc.allocate(272)
+        assert alloc.num_waiters == 0
+
+    asyncio.run(main())
+
+
+def test_resize():
+    """Test that shrinking a region wakes waiting allocations"""
+
+    async def main() -> None:
+        alloc = _allocator()
+        region = await alloc.allocate(256)
+        waiting = asyncio.create_task(alloc.allocate(128))
+        await asyncio.sleep(0)
+
+        alloc.resize(region, 128)
+        assert await waiting == MemoryRegion(128, 128, is_free=False)
+
+    asyncio.run(main())
+
+
+def test_timeout():
+    """Test waiting with a timeout"""
+
+    async def main() -> None:
+        alloc = _allocator()
+        region = await alloc.allocate(256)
+        with pytest.raises(TimeoutError):
+            await alloc.allocate(16, timeout=0.01)
+        assert alloc.num_waiters == 0
+
+        alloc.free(region)
+        assert await alloc.allocate(16, timeout=0.01) == MemoryRegion(0, 16, is_free=False)
+
+    asyncio.run(main())
+
+
+def test_cancel():
+    """Test that cancelled allocations leave the queue and release allocated memory"""
+
+    async def main() -> None:
+        alloc = _allocator()
+        region = await alloc.allocate(256)
+        first = asyncio.create_task(alloc.allocate(256))
+        second = asyncio.create_task(alloc.allocate(128))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        assert alloc.num_waiters == 1
+        alloc.free(region)
+        region = await second
+        assert region == MemoryRegion(0, 128, is_free=False)
+
+        # Cancel the task after the memory for it was allocated, but before it resumed
+        third = asyncio.create_task(alloc.allocate(256))
+        await asyncio.sleep(0)
+        alloc.free(region)
+        third.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await third
+        assert alloc.allocator.regions == [MemoryRegion(0, 256, is_free=True)]
+
+    asyncio.run(main())
@@ -1,11 +1,19 @@
+import dataclasses
+import itertools
+import random
+
 import pytest
 
+import virtual_allocator
 from virtual_allocator import (
     AlignmentError,
     AllocationPolicy,
     Allocator,
+    Histogram,
     MemoryRegion,
     OutOfMemoryError,
+    Placement,
+    RegionStorage,
     UnknownRegionError,
 )
 
@@ -46,7 +54,7 @@ def test_free(subtests):
 
     # Check that the region is really unknown
     with pytest.raises(UnknownRegionError):
-        alloc._get_region_idx(big_region)
+        alloc._get_region_handle(big_region)
 
     # Check that we can allocate 128 bytes again
     big_region2 = alloc.allocate(128)
@@ -107,7 +115,7 @@ def test_best_fit_allocation():
     """Test the best fit allocation policy"""
     alloc = Allocator(address=0, size=256, block_size=16, alignment=32, allocation_policy=AllocationPolicy.BEST_FIT)
 
-    regions_to_free = list()
+    regions_to_free = []
     alloc.allocate(32)
     regions_to_free.append(alloc.allocate(64))
     alloc.allocate(32)
@@ -136,7 +144,7 @@ def test_first_fit_allocation():
     """Test the first fit allocation policy"""
     alloc = Allocator(address=0, size=256, block_size=16, alignment=32, allocation_policy=AllocationPolicy.FIRST_FIT)
 
-    regions_to_free = list()
+    regions_to_free = []
     alloc.allocate(32)
     regions_to_free.append(alloc.allocate(64))
     alloc.allocate(32)
@@ -259,3 +267,698 @@ def test_block_size():
         MemoryRegion(0, 64, is_free=False),
         MemoryRegion(64, 64, is_free=True),
     ]
+
+
+def test_best_fit_index():
+    """Test that the free region index finds the same regions as scanning all free regions"""
+    rng = random.Random(0)
+    alloc = Allocator(address=0, size=4096, block_size=16, alignment=32, allocation_policy=AllocationPolicy.BEST_FIT)
+    allocated = []
+    for _ in range(500):
+        if allocated and rng.random() < 0.4:
+            alloc.free(allocated.pop(rng.randrange(len(allocated))))
+            continue
+        size = rng.randrange(1, 9) * 16
+        fitting = [r for r in alloc.regions if r.is_free and r.total_size >= size + alloc.get_padding(size)]
+        if not fitting:
+            with pytest.raises(OutOfMemoryError):
+                alloc.allocate(size)
+            continue
+        expected = min(fitting, key=lambda region: region.size)
+        region = alloc.allocate(size)
+        assert region.address == expected.address
+        allocated.append(region)
+
+
+def test_region_storage():
+    """Test that all region storages result in the same regions"""
+    rng = random.Random(0)
+    for policy in AllocationPolicy:
+        allocators = [
+            Allocator(0, 4096, block_size=16, alignment=32, allocation_policy=policy, region_storage=storage)
+            for storage in RegionStorage
+        ]
+        allocated: list[MemoryRegion] = []
+        for _ in range(500):
+            op = rng.random()
+            size = rng.randrange(1, 9) * 16
+            try:
+                if not allocated or op < 0.4:
+                    region = allocators[0].allocate(size)
+                    for alloc in allocators[1:]:
+                        alloc.allocate(size)
+                    allocated.append(region)
+                elif op < 0.7:
+                    region = allocated.pop(rng.randrange(len(allocated)))
+                    for alloc in allocators:
+                        alloc.free(region)
+                else:
+                    idx = rng.randrange(len(allocated))
+                    region = allocators[0].resize(allocated[idx], size)
+                    for alloc in allocators[1:]:
+                        alloc.resize(allocated[idx], size)
+                    allocated[idx] = region
+            except OutOfMemoryError:
+                pass
+            assert all(alloc.regions == allocators[0].regions for alloc in allocators)
+
+
+def test_allocate_many():
+    """Test that allocating a batch places the regions like allocating them one after another"""
+    sizes = [16, 64, 32, 16, 48, 0, 16]
+    for policy in AllocationPolicy:
+        batch_alloc = Allocator(0, 512, block_size=16, alignment=32, allocation_policy=policy)
+        single_alloc = Allocator(0, 512, block_size=16, alignment=32, allocation_policy=policy)
+        for alloc in (batch_alloc, single_alloc):
+            regions = [alloc.allocate(size) for size in (32, 64, 32, 96, 32, 64)]
+            alloc.free(regions[1])
+            alloc.free(regions[3])
+
+        assert batch_alloc.allocate_many(sizes) == [single_alloc.allocate(size) for size in sizes]
+        assert batch_alloc.regions == single_alloc.regions
+
+        regions = batch_alloc.regions
+        with pytest.raises(OutOfMemoryError):
+            batch_alloc.allocate_many([32, 256])
+        assert batch_alloc.regions == regions
+
+        with pytest.raises(AlignmentError):
+            batch_alloc.allocate_many([32, 8])
+        assert batch_alloc.regions == regions
+
+
+def test_free_many():
+    """Test freeing a batch of regions"""
+    alloc = Allocator(0, 256, block_size=16, alignment=32, allocation_policy=AllocationPolicy.BEST_FIT)
+    regions = alloc.allocate_many([32] * 6)
+
+    with pytest.raises(UnknownRegionError):
+        alloc.free_many([regions[0], MemoryRegion(16, 32, False)])
+    assert len(alloc.regions) == 7
+
+    alloc.free_many([regions[4], regions[1], regions[2], regions[1]])
+    assert alloc.regions == [
+        MemoryRegion(0, 32, False),
+        MemoryRegion(32, 64, True),
+        MemoryRegion(96, 32, False),
+        MemoryRegion(128, 32, True),
+        MemoryRegion(160, 32, False),
+        MemoryRegion(192, 64, True),
+    ]
+
+    alloc.free_many([regions[0], regions[3], regions[5], MemoryRegion(32, 64, True)])
+    assert alloc.regions == [MemoryRegion(0, 256, True)]
+
+
+def test_tlsf_allocation():
+    """Test the two-level segregated fit allocation policy"""
+    alloc = Allocator(address=0, size=2272, block_size=16, alignment=16, allocation_policy=AllocationPolicy.TLSF)
+
+    regions_to_free = []
+    alloc.allocate(16)
+    regions_to_free.append(alloc.allocate(1072))
+    alloc.allocate(16)
+    regions_to_free.append(alloc.allocate(1152))
+    alloc.allocate(16)
+    with pytest.raises(OutOfMemoryError):
+        alloc.allocate(16)
+    for region in regions_to_free:
+        alloc.free(region)
+
+    # The size class of the request is rounded up, the 1152 byte hole is in the next populated class
+    assert alloc.allocate(1056) == MemoryRegion(1104, 1056, is_free=False)
+    # No populated class above the request, the 1072 byte hole in the class of the request fits
+    assert alloc.allocate(1072) == MemoryRegion(16, 1072, is_free=False)
+
+    with pytest.raises(OutOfMemoryError):
+        alloc.allocate(112)
+
+
+def test_duplicate_empty_free_regions(subtests):
+    """Test that empty free regions at the same address are indexed separately"""
+    # Allocations of a size, frees of the empty region at 0 and batches freeing it multiple times
+    operations = [
+        ("allocate", 0), ("free_many", 1), ("free", 1), ("allocate", 0), ("free_many", 2), ("allocate", 0),
+        ("free_many", 2), ("allocate", 0), ("allocate", 0), ("allocate", 0), ("allocate", 0), ("allocate", 0),
+        ("free", 1), ("free_many", 1), ("allocate", 0), ("allocate", 0), ("allocate", 0), ("allocate", 0),
+        ("free_many", 2), ("allocate", 16), ("free", 1), ("allocate", 16), ("allocate", 0), ("free", 1),
+        ("free_many", 3),
+    ]  # fmt: skip
+    empty = MemoryRegion(0, 0, False)
+    for policy in AllocationPolicy:
+        for storage in RegionStorage:
+            for max_deferred_frees in (0, 4):
+                with subtests.test(policy=policy, storage=storage, max_deferred_frees=max_deferred_frees):
+                    alloc = Allocator(
+                        0, 256, 16, 16, policy, region_storage=storage, max_deferred_frees=max_deferred_frees
+                    )
+                    for operation, arg in operations:
+                        try:
+                            if operation == "allocate":
+                                alloc.allocate(arg)
+                            elif operation == "free_many":
+                                alloc.free_many([empty] * arg)
+                            else:
+                                alloc.free(empty)
+                        except UnknownRegionError:
+                            pass
+                        alloc.coalesce()
+                        alloc.validate()
+
+
+def test_next_fit_allocation():
+    """Test the next fit allocation policy"""
+    for storage in RegionStorage:
+        alloc = Allocator(0, 256, 16, 16, allocation_policy=AllocationPolicy.NEXT_FIT, region_storage=storage)
+        regions = [alloc.allocate(32) for _ in range(4)]
+        alloc.free(regions[0])
+
+        # The scan resumes after the previous allocation instead of at the lowest free region
+        assert alloc.allocate(32).address == 128
+        assert alloc.allocate(96).address == 160
+        # No free region after the previous allocation, the scan wraps around
+        wrapped_region = alloc.allocate(32)
+        assert wrapped_region.address == 0
+
+        alloc.free(regions[1])
+        alloc.free(regions[2])
+        alloc.free(wrapped_region)
+        # The previous allocation is merged into the following free region, the cursor moves along
+        alloc.free(regions[3])
+        assert alloc.allocate(16).address == 0
+        assert alloc.allocate(16).address == 16
+
+
+def test_worst_fit_allocation():
+    """Test the worst fit allocation policy"""
+    alloc = Allocator(0, 256, 16, 16, allocation_policy=AllocationPolicy.WORST_FIT)
+    regions = [alloc.allocate(size) for size in (32, 32, 64, 32)]
+    alloc.free(regions[1])
+    alloc.free(regions[3])
+
+    # The largest free region is used even though the hole at 32 fits
+    assert alloc.allocate(16).address == 128
+    assert alloc.allocate(112).address == 144
+    assert alloc.allocate(32).address == 32
+    with pytest.raises(OutOfMemoryError):
+        alloc.allocate(16)
+
+    # Compare with the largest free region, many operations drop removed regions from the heap
+    rng = random.Random(0)
+    alloc = Allocator(0, 1 << 16, 16, 16, allocation_policy=AllocationPolicy.WORST_FIT)
+    allocated: list[MemoryRegion] = []
+    for _ in range(2000):
+        if allocated and rng.random() < 0.5:
+            alloc.free(allocated.pop(rng.randrange(len(allocated))))
+            continue
+        largest = max(
+            (region for region in alloc.regions if region.is_free),
+            key=lambda region: (region.total_size, -region.address),
+            default=None,
+        )
+        size = rng.randrange(1, 64) * 16
+        if largest is None or largest.total_size < size:
+            with pytest.raises(OutOfMemoryError):
+                alloc.allocate(size)
+        else:
+            allocated.append(alloc.allocate(size))
+            assert allocated[-1].address == largest.address
+        assert alloc.stats().largest_free_size == max(
+            (region.total_size for region in alloc.regions if region.is_free), default=0
+        )
+
+
+def test_allocate_alignment(subtests):
+    """Test allocating regions with a larger alignment than the allocator"""
+    for policy in AllocationPolicy:
+        with subtests.test(policy=policy):
+            alloc = Allocator(0, 512, 16, 16, policy)
+            small = alloc.allocate(16)
+            # The memory in front of the aligned address stays free, the padding uses the alignment of the allocator
+            aligned = alloc.allocate(16, alignment=128)
+            assert aligned == MemoryRegion(128, 16, False)
+            assert alloc.regions[:3] == [small, MemoryRegion(16, 112, True), aligned]
+            assert alloc.allocate(112, hint=Placement.LOW) == MemoryRegion(16, 112, False)
+            alloc.free(small)
+            alloc.free(aligned)
+
+            rng = random.Random(0)
+            allocated: list[MemoryRegion] = []
+            for _ in range(200):
+                if allocated and rng.random() < 0.4:
+                    alloc.free(allocated.pop(rng.randrange(len(allocated))))
+                    continue
+                size = rng.randrange(1, 4) * 16
+                alignment = 16 << rng.randrange(4)
+                fits = any(
+                    region.is_free
+                    and region.address + -region.address % alignment + size <= region.address + region.size
+                    for region in alloc.regions
+                )
+                if fits:
+                    allocated.append(alloc.allocate(size, alignment=alignment))
+                    assert allocated[-1].address % alignment == 0
+                else:
+                    with pytest.raises(OutOfMemoryError):
+                        alloc.allocate(size, alignment=alignment)
+                regions = alloc.regions
+                assert all(region.address % 16 == 0 for region in regions)
+                assert all(not (a.is_free and b.is_free) for a, b in itertools.pairwise(regions))
+
+    alloc = Allocator(8, 256, 16, 16, AllocationPolicy.FIRST_FIT)
+    for alignment in (0, 24):
+        with pytest.raises(AlignmentError):
+            Allocator(0, 256, 16, 16, AllocationPolicy.FIRST_FIT).allocate(16, alignment=alignment)
+    with pytest.raises(AlignmentError):
+        alloc.allocate(16, alignment=32)
+
+
+def test_allocate_hint(subtests):
+    """Test placement hints overriding the allocation policy"""
+    for storage in RegionStorage:
+        with subtests.test(storage=storage):
+            alloc = Allocator(0, 512, 16, 32, AllocationPolicy.BEST_FIT, region_storage=storage)
+            assert alloc.allocate(16, hint=Placement.HIGH) == MemoryRegion(480, 16, False, 16)
+            assert alloc.allocate(48, hint=Placement.HIGH) == MemoryRegion(416, 48, False, 16)
+            assert alloc.allocate(64, alignment=256, hint=Placement.HIGH) == MemoryRegion(256, 64, False)
+            assert alloc.allocate(16, hint=Placement.LOW) == MemoryRegion(0, 16, False, 16)
+
+            # The region is placed at a free address, otherwise by the allocation policy
+            assert alloc.allocate(32, hint=0x100) == MemoryRegion(320, 32, False)
+            assert alloc.allocate(32, hint=0x160) == MemoryRegion(352, 32, False)
+            assert alloc.allocate(0, hint=0x180) == MemoryRegion(384, 0, False)
+            assert alloc.allocate(32, hint=0x1000) == MemoryRegion(384, 32, False)
+            assert alloc.allocate(32, hint=0x40) == MemoryRegion(64, 32, False)
+            assert alloc.regions[:3] == [
+                MemoryRegion(0, 16, False, 16),
+                MemoryRegion(32, 32, True),
+                MemoryRegion(64, 32, False),
+            ]
+            with pytest.raises(AlignmentError):
+                alloc.allocate(32, hint=0x70)
+            with pytest.raises(AlignmentError):
+                alloc.allocate(32, alignment=64, hint=0x20)
+            with pytest.raises(OutOfMemoryError):
+                alloc.allocate(256, hint=Placement.HIGH)
+
+            # The end of the memory range is not aligned, the highest address is rounded down
+            alloc = Allocator(0, 100, 4, 16, AllocationPolicy.FIRST_FIT, region_storage=storage)
+            assert alloc.allocate(16, hint=Placement.HIGH) == MemoryRegion(80, 16, False)
+            assert alloc.allocate(32, alignment=32, hint=Placement.HIGH) == MemoryRegion(32, 32, False)
+            alloc.validate()
+
+
+def test_deferred_free():
+    """Test the deferred free mode"""
+    for storage in RegionStorage:
+        alloc = Allocator(0, 256, 16, 32, AllocationPolicy.FIRST_FIT, region_storage=storage, max_deferred_frees=4)
+        regions = [alloc.allocate(32) for _ in range(6)]
+        alloc.free(regions[1])
+        alloc.free(regions[3])
+        with pytest.raises(UnknownRegionError):
+            alloc.free(regions[3])
+
+        # The most recently freed region of the same size is reused instead of the first fitting region
+        assert alloc.allocate(32) == regions[3]
+        assert alloc.allocate(64).address == 192
+
+        # The deferred region behind the region is merged to grow into it
+        assert alloc.resize(regions[0], 64) == MemoryRegion(0, 64, False)
+
+        alloc.free_many(regions[2:5])
+        with pytest.raises(OutOfMemoryError):
+            alloc.allocate(128)
+        # The deferred regions are merged when an allocation does not fit otherwise
+        assert alloc.allocate(96) == MemoryRegion(64, 96, False)
+
+        alloc.free(regions[5])
+        # The statistics count the deferred region as free memory without merging it
+        stats = alloc.stats()
+        assert (stats.free_size, stats.largest_free_size) == (32, 0)
+        assert alloc.regions[-2:] == [MemoryRegion(160, 32, True), MemoryRegion(192, 64, False)]
+
+        # Lookups report the deferred regions as part of the free regions without merging them
+        alloc = Allocator(0, 256, 16, 32, AllocationPolicy.FIRST_FIT, region_storage=storage, max_deferred_frees=4)
+        regions = [alloc.allocate(32) for _ in range(4)]
+        alloc.free(regions[1])
+        alloc.free(regions[3])
+        assert alloc.region_at(40) == MemoryRegion(32, 32, True)
+        assert alloc.region_at(100) == alloc.region_at(200) == MemoryRegion(96, 160, True)
+        assert alloc.regions_in(40, 120) == [MemoryRegion(32, 32, True), regions[2], MemoryRegion(96, 160, True)]
+        assert alloc.allocate(32) == regions[3]
+
+        # Reaching the maximum number of deferred regions merges them
+        alloc = Allocator(0, 256, 16, 32, AllocationPolicy.FIRST_FIT, region_storage=storage, max_deferred_frees=2)
+        regions = [alloc.allocate(32) for _ in range(3)]
+        alloc.free(regions[0])
+        # Batches are placed in the free regions, the quick lists are not used
+        assert alloc.allocate_many([32]) == [MemoryRegion(96, 32, False)]
+        alloc.free(regions[1])
+        assert alloc.allocate(64).address == 0
+
+
+def test_region_at():
+    """Test looking up regions by address"""
+    alloc = Allocator(0x100, 256, 16, 32, AllocationPolicy.FIRST_FIT)
+    regions = [alloc.allocate(size) for size in (16, 0, 64)]
+    assert alloc.region_at(0x100) == alloc.region_at(0x11F) == regions[0]
+    # The empty region at 0x120 contains no address
+    assert alloc.region_at(0x120) == regions[2]
+    assert alloc.region_at(0x1FF) == MemoryRegion(0x160, 160, True)
+    for address in (0xFF, 0x200):
+        with pytest.raises(UnknownRegionError):
+            alloc.region_at(address)
+
+    assert alloc.regions_in(0x110, 0x121) == regions
+    assert alloc.regions_in(0x120, 0x160) == regions[1:]
+    assert alloc.regions_in(0, 0x101) == regions[:1]
+    assert alloc.regions_in(0x130, 0x130) == []
+    assert alloc.regions_in(0x200, 0x300) == []
+
+
+def test_region_at_random(subtests, monkeypatch):
+    """Test that the address index stays consistent with the regions"""
+    # Small chunks exercise splitting and removing chunks of the address index
+    monkeypatch.setattr(virtual_allocator._SortedAddresses, "_CHUNK_SIZE", 4)
+    for storage in RegionStorage:
+        with subtests.test(storage=storage):
+            rng = random.Random(0)
+            alloc = Allocator(0, 1 << 14, 16, 16, AllocationPolicy.BEST_FIT, region_storage=storage)
+            alloc.region_at(0)
+            allocated: list[MemoryRegion] = []
+            for _ in range(1000):
+                try:
+                    if not allocated or rng.random() < 0.5:
+                        allocated.append(alloc.allocate(rng.randrange(0, 16) * 16))
+                    elif rng.random() < 0.7:
+                        alloc.free(allocated.pop(rng.randrange(len(allocated))))
+                    else:
+                        idx = rng.randrange(len(allocated))
+                        allocated[idx] = alloc.resize(allocated[idx], rng.randrange(0, 16) * 16)
+                except OutOfMemoryError:
+                    pass
+
+                address = rng.randrange(1 << 14)
+                start, end = sorted(rng.randrange(1 << 14) for _ in range(2))
+                regions = alloc.regions
+                assert alloc.region_at(address) == next(
+                    region for region in regions if region.address <= address < region.address + region.total_size
+                )
+                assert alloc.regions_in(start, end) == [
+                    region
+                    for region in regions
+                    if region.address < end and (region.address + region.total_size > start or region.address == start)
+                ]
+            alloc.compact()
+            assert alloc.regions_in(0, 1 << 14) == alloc.regions
+
+
+def test_validate(subtests):
+    """Test that validate detects broken invariants"""
+    for storage in RegionStorage:
+        with subtests.test(storage=storage):
+            alloc = Allocator(0, 256, 16, 32, AllocationPolicy.BEST_FIT, region_storage=storage)
+            regions = [alloc.allocate(size) for size in (16, 0, 32)]
+            alloc.free(regions[1])
+            alloc.validate()
+
+            # Bypass the allocator to break the region table
+            table = alloc._regions
+            handle = table.find(64, 192, 0, True)
+            table.update(handle, 64, 128, 0, True)
+            with pytest.raises(AssertionError, match="Regions end at 0xc0"):
+                alloc.validate()
+            table.insert_after(handle, 192, 64, 0, True)
+            with pytest.raises(AssertionError, match="not merged"):
+                alloc.validate()
+            table.update(handle, 64, 112, 16, True)
+            with pytest.raises(AssertionError, match="is padded"):
+                alloc.validate()
+            table.update(handle, 64, 128, 0, True)
+            table.remove(table.find(192, 64, 0, True))
+            table.insert_after(handle, 192, 64, 0, False)
+            with pytest.raises(AssertionError, match="Free region index"):
+                alloc.validate()
+            table.update(table.first(), 0, 16, 0, False)
+            with pytest.raises(AssertionError, match="does not align"):
+                alloc.validate()
+            table.update(table.first(), 0, 64, 0, False)
+            with pytest.raises(AssertionError, match="does not start at the end"):
+                alloc.validate()
+
+            # Bypass the allocator to break the indexes
+            alloc = Allocator(0, 256, 16, 32, AllocationPolicy.BEST_FIT, region_storage=storage)
+            alloc._free_index.add(0, 0)
+            with pytest.raises(AssertionError, match="Free region index"):
+                alloc.validate()
+            alloc._regions._handles[256] = alloc._regions.first()
+            with pytest.raises(AssertionError, match="counts do not match"):
+                alloc.validate()
+
+            alloc = Allocator(0, 100, 4, 16, AllocationPolicy.FIRST_FIT, region_storage=storage)
+            table = alloc._regions
+            table.update(table.first(), 0, 84, 0, True)
+            table.insert_after(table.first(), 84, 16, 0, False)
+            with pytest.raises(AssertionError, match="is not aligned to 16"):
+                alloc.validate()
+
+
+def test_compact():
+    """Test compaction of the allocated regions"""
+    for storage in RegionStorage:
+        alloc = Allocator(0, 256, 16, 32, allocation_policy=AllocationPolicy.FIRST_FIT, region_storage=storage)
+        regions = [alloc.allocate(size) for size in (32, 64, 16, 32, 48)]
+        alloc.free(regions[0])
+        alloc.free(regions[3])
+        with pytest.raises(OutOfMemoryError):
+            alloc.allocate(96)
+
+        assert alloc.compact() == {32: 0, 96: 64, 160: 96}
+        assert alloc.regions == [
+            MemoryRegion(0, 64, is_free=False),
+            MemoryRegion(64, 16, is_free=False, padding=16),
+            MemoryRegion(96, 48, is_free=False, padding=16),
+            MemoryRegion(160, 96, is_free=True),
+        ]
+        assert alloc.compact() == {}
+        alloc.allocate(96)
+        assert alloc.compact() == {}
+        assert alloc.regions[-1] == MemoryRegion(160, 96, is_free=False)
+
+        alloc.free_many(alloc.regions)
+        assert alloc.compact() == {}
+        assert alloc.regions == [MemoryRegion(0, 256, is_free=True)]
+
+
+def test_compact_alignment(tmp_path):
+    """Test that compaction keeps the alignment requested for a region"""
+    for storage in RegionStorage:
+        alloc = Allocator(0, 1024, 16, 32, allocation_policy=AllocationPolicy.FIRST_FIT, region_storage=storage)
+        r1, r2 = alloc.allocate_many([32, 256])
+        r3 = alloc.allocate(64, alignment=256)
+        assert r3 == MemoryRegion(512, 64, is_free=False)
+        alloc.free(r2)
+
+        assert alloc.compact() == {512: 256}
+        assert alloc.regions == [
+            r1,
+            MemoryRegion(32, 224, is_free=True),
+            MemoryRegion(256, 64, is_free=False),
+            MemoryRegion(320, 704, is_free=True),
+        ]
+        alloc.validate()
+
+        # The alignment is part of the snapshot
+        path = tmp_path / "allocator.snapshot"
+        alloc.snapshot(path)
+        restored = Allocator.restore(path, storage)
+        assert restored.allocate(64) == MemoryRegion(32, 64, is_free=False)
+        assert restored.compact() == {}
+        assert restored.regions[3] == MemoryRegion(256, 64, is_free=False)
+
+        # An empty region at the address of an aligned region moves along with it
+        alloc = Allocator(0, 1024, 16, 32, allocation_policy=AllocationPolicy.FIRST_FIT, region_storage=storage)
+        r1, r2 = alloc.allocate_many([32, 64])
+        empty = alloc.allocate(0, hint=256)
+        assert alloc.allocate(64, alignment=128, hint=256) == MemoryRegion(256, 64, is_free=False)
+        alloc.free(r2)
+        assert alloc.compact() == {256: 128}
+        assert alloc.regions == [
+            r1,
+            MemoryRegion(32, 96, is_free=True),
+            dataclasses.replace(empty, address=128),
+            MemoryRegion(128, 64, is_free=False),
+            MemoryRegion(192, 832, is_free=True),
+        ]
+        alloc.validate()
+
+
+def test_resize_alignment(subtests):
+    """Test that growing and moving a region keeps the alignment requested for it"""
+    for storage in RegionStorage:
+        with subtests.test(storage=storage):
+            alloc = Allocator(0, 8192, 16, 16, AllocationPolicy.FIRST_FIT, region_storage=storage)
+            region = alloc.allocate(1024, alignment=1024, hint=1024)
+            neighbour = alloc.allocate(16, hint=2048)
+            assert (region, neighbour) == (MemoryRegion(1024, 1024, False), MemoryRegion(2048, 16, False))
+
+            # The start address in the previous free region is aligned, the memory behind the region stays free
+            region = alloc.resize(region, 1536)
+            assert alloc.regions[:3] == [region, MemoryRegion(1536, 512, True), neighbour]
+            assert region == MemoryRegion(0, 1536, False)
+
+            region, moved = alloc.reallocate(region, 3072)
+            assert (region, moved) == (MemoryRegion(3072, 3072, False), True)
+            assert alloc.compact() == {2048: 0, 3072: 1024}
+            alloc.validate()
+
+            # The previous free region does not reach the aligned address
+            alloc = Allocator(0, 8192, 16, 16, AllocationPolicy.FIRST_FIT, region_storage=storage)
+            alloc.allocate(512)
+            region = alloc.allocate(1024, alignment=1024, hint=1024)
+            alloc.allocate(16, hint=2048)
+            with pytest.raises(OutOfMemoryError):
+                alloc.resize(region, 1536)
+
+
+def test_resize_increase_previous():
+    """Test growing a region into the previous free region"""
+    alloc = Allocator(address=0, size=256, block_size=16, alignment=32, allocation_policy=AllocationPolicy.FIRST_FIT)
+    r1, r2, r3, _ = alloc.allocate_many([64, 32, 32, 128])
+    alloc.free(r1)
+    alloc.free(r3)
+
+    # The next free region is used first
+    r2 = alloc.resize(r2, 64)
+    assert r2 == MemoryRegion(64, 64, is_free=False)
+
+    # Only the memory missing after the region is taken from the previous region
+    r2 = alloc.resize(r2, 96)
+    assert alloc.regions == [
+        MemoryRegion(0, 32, is_free=True),
+        MemoryRegion(32, 96, is_free=False),
+        MemoryRegion(128, 128, is_free=False),
+    ]
+
+    r2 = alloc.resize(r2, 112)
+    assert alloc.regions == [
+        MemoryRegion(0, 112, is_free=False, padding=16),
+        MemoryRegion(128, 128, is_free=False),
+    ]
+    with pytest.raises(OutOfMemoryError):
+        alloc.resize(r2, 144)
+
+
+def test_reallocate():
+    """Test reallocation of regions in place and by moving them"""
+    alloc = Allocator(address=0, size=256, block_size=16, alignment=32, allocation_policy=AllocationPolicy.FIRST_FIT)
+    r1, r2, _ = alloc.allocate_many([32, 32, 64])
+
+    assert alloc.reallocate(r2, 16) == (MemoryRegion(32, 16, is_free=False, padding=16), False)
+
+    region, moved = alloc.reallocate(r1, 64)
+    assert (region, moved) == (MemoryRegion(128, 64, is_free=False), True)
+    assert alloc.regions == [
+        MemoryRegion(0, 32, is_free=True),
+        MemoryRegion(32, 16, is_free=False, padding=16),
+        MemoryRegion(64, 64, is_free=False),
+        MemoryRegion(128, 64, is_free=False),
+        MemoryRegion(192, 64, is_free=True),
+    ]
+
+    regions = alloc.regions
+    with pytest.raises(OutOfMemoryError):
+        alloc.reallocate(region, 160)
+    assert alloc.regions == regions
+
+
+def test_snapshot(tmp_path, subtests):
+    """Test snapshot and restore of the allocator state"""
+    alloc = Allocator(address=64, size=1024, block_size=16, alignment=32, allocation_policy=AllocationPolicy.BEST_FIT)
+    regions = alloc.allocate_many([32, 16, 64, 0, 128, 48])
+    alloc.free_many(regions[2::2])
+    path = tmp_path / "allocator.snapshot"
+    alloc.snapshot(path)
+
+    for region_storage in RegionStorage:
+        with subtests.test(region_storage=region_storage):
+            restored = Allocator.restore(path, region_storage)
+            assert restored.regions == alloc.regions
+            # The free region index is rebuilt as well
+            assert restored.allocate(64) == MemoryRegion(128, 64, is_free=False)
+            restored.free(regions[1])
+            assert restored.regions[1] == MemoryRegion(96, 32, is_free=True)
+
+    data = path.read_bytes()
+    with subtests.test("invalid"):
+        path.write_bytes(b"X" + data[1:])
+        with pytest.raises(ValueError):
+            Allocator.restore(path)
+    with subtests.test("truncated"):
+        path.write_bytes(data[:-1])
+        with pytest.raises(ValueError):
+            Allocator.restore(path)
+
+
+def test_stats(subtests):
+    """Test the statistics of instrumented and uninstrumented allocators"""
+    for policy in AllocationPolicy:
+        with subtests.test(policy=policy):
+            alloc = Allocator(address=0, size=256, block_size=16, alignment=16, allocation_policy=policy)
+            regions = alloc.allocate_many([32, 64, 32, 32])
+            alloc.free(regions[1])
+            stats = alloc.stats()
+            assert (stats.free_size, stats.largest_free_size) == (160, 96)
+            assert stats.fragmentation == pytest.approx(0.4)
+            assert stats.operations == {}
+            assert stats.scan_lengths.count == 0
+
+    alloc = Allocator(0, 256, 16, 16, AllocationPolicy.FIRST_FIT, instrumented=True)
+    r1, r2, _ = alloc.allocate_many([64, 64, 64])
+    alloc.free(r1)
+    alloc.allocate(32)
+    with pytest.raises(OutOfMemoryError):
+        alloc.allocate(128)
+    with pytest.raises(OutOfMemoryError):
+        alloc.resize(r2, 128)
+    alloc.reallocate(r2, 96)
+
+    stats = alloc.stats()
+    assert {name: (op.calls, op.out_of_memory_errors) for name, op in stats.operations.items()} == {
+        "allocate": (2, 1),
+        "allocate_many": (1, 0),
+        "resize": (1, 1),
+        "reallocate": (1, 0),
+        "free": (1, 0),
+        "free_many": (0, 0),
+    }
+    assert stats.operations["allocate"].latency_ns.quantile(1.0) > 0
+    # Only the allocations scanned the regions, the reallocation grew into the previous free region
+    assert stats.scan_lengths.count == 2
+    assert stats.scan_lengths.quantile(1.0) == 7
+    assert stats.free_size == 64
+
+
+def test_histogram():
+    """Test quantiles of histograms"""
+    histogram = Histogram((1, 0, 2, 1))
+    assert histogram.count == 4
+    assert histogram.quantile(0.25) == 0
+    assert histogram.quantile(0.5) == 3
+    assert histogram.quantile(1.0) == 7
+    assert Histogram().quantile(0.5) == 0
+
+
+def test_batch_empty_regions():
+    """Test that batches place and free empty regions like individual calls"""
+    alloc = Allocator(0, 256, block_size=16, alignment=16, allocation_policy=AllocationPolicy.FIRST_FIT)
+    e1, e2, _ = alloc.allocate_many([0, 0, 32])
+    alloc.free_many([e1, e2])
+    assert alloc.regions == [
+        MemoryRegion(0, 0, True),
+        MemoryRegion(0, 32, False),
+        MemoryRegion(32, 224, True),
+    ]
+
+    # The empty free region is used by the first empty allocation, like with allocate()
+    assert alloc.allocate_many([0, 0]) == [MemoryRegion(0, 0, False), MemoryRegion(32, 0, False)]
@@ -0,0 +1,87 @@
+import pytest
+
+from virtual_allocator import AllocationPolicy, Allocator, MemoryRegion, OutOfMemoryError, UnknownRegionError
+from virtual_allocator.arena import Arena
+
+
+def _allocator(size: int = 1024) -> Allocator:
+    return Allocator(address=0, size=size, block_size=16, alignment=32, allocation_policy=AllocationPolicy.FIRST_FIT)
+
+
+def test_bump_allocation():
+    """Test allocating regions from an arena with a bump pointer"""
+    alloc = _allocator()
+    alloc.allocate(64)
+    arena = Arena(alloc, 256)
+    assert arena.region == MemoryRegion(64, 256, is_free=False)
+
+    regions = [arena.allocate(size) for size in (16, 64, 0, 32)]
+    assert regions == [
+        MemoryRegion(64, 16, is_free=False, padding=16),
+        MemoryRegion(96, 64, is_free=False),
+        MemoryRegion(160, 0, is_free=False),
+        MemoryRegion(160, 32, is_free=False),
+    ]
+    assert arena.used_size == 128
+
+    # Only the most recently allocated region can be freed, and only once
+    arena.free(regions[3])
+    with pytest.raises(UnknownRegionError):
+        arena.free(regions[0])
+    with pytest.raises(UnknownRegionError):
+        arena.free(regions[3])
+    with pytest.raises(UnknownRegionError):
+        arena.free(MemoryRegion(320, 0, is_free=False))
+    assert arena.used_size == 96
+    with pytest.raises(OutOfMemoryError):
+        arena.allocate(176)
+    assert arena.allocate(160) == MemoryRegion(160, 160, is_free=False)
+
+    arena.reset()
+    assert arena.used_size == 0
+    assert arena.allocate(16) == regions[0]
+
+    arena.release()
+    assert arena.is_released
+    assert alloc.regions == [MemoryRegion(0, 64, is_free=False), MemoryRegion(64, 960, is_free=True)]
+    with pytest.raises(ValueError):
+        arena.allocate(16)
+
+
+def test_policy_allocation():
+    """Test allocating regions from an arena managed by an allocator"""
+    alloc = _allocator()
+    with Arena(alloc, 256, AllocationPolicy.BEST_FIT) as arena:
+        regions = [arena.allocate(64) for _ in range(3)]
+        arena.free(regions[1])
+        assert arena.used_size == 128
+        assert arena.allocate(32) == MemoryRegion(64, 32, is_free=False)
+        with pytest.raises(OutOfMemoryError):
+            arena.allocate(128)
+    assert arena.is_released
+    assert alloc.regions == [MemoryRegion(0, 1024, is_free=True)]
+
+
+def test_nested_arenas():
+    """Test that releasing or resetting an arena releases the arenas nested in it"""
+    alloc = _allocator()
+    outer = Arena(alloc, 512)
+    outer.allocate(32)
+    inner = Arena(outer, 128, AllocationPolicy.FIRST_FIT)
+    assert inner.region == MemoryRegion(32, 128, is_free=False)
+    assert inner.allocate(16) == MemoryRegion(32, 16, is_free=False, padding=16)
+    innermost = Arena(inner, 64)
+    assert innermost.allocate(32) == MemoryRegion(64, 32, is_free=False)
+
+    outer.reset()
+    assert inner.is_released and innermost.is_released
+    with pytest.raises(ValueError):
+        innermost.allocate(16)
+    with pytest.raises(ValueError):
+        inner.release()
+
+    inner = Arena(outer, 128)
+    inner.release()
+    assert outer.used_size == 0
+    outer.release()
+    assert alloc.regions == [MemoryRegion(0, 1024, is_free=True)]
@@ -0,0 +1,104 @@
+import itertools
+import random
+
+import pytest
+
+from virtual_allocator import AlignmentError, MemoryRegion, OutOfMemoryError, UnknownRegionError
+from virtual_allocator.buddy import BuddyAllocator
+
+
+def test_allocate():
+    """Test allocation of memory"""
+    alloc = BuddyAllocator(address=0x1000, size=256, block_size=16)
+    with pytest.raises(ValueError):
+        alloc.allocate(-16)
+    with pytest.raises(AlignmentError):
+        alloc.allocate(24)
+
+    assert alloc.allocate(48) == MemoryRegion(0x1000, 48, is_free=False, padding=16)
+    assert alloc.allocate(16) == MemoryRegion(0x1040, 16, is_free=False)
+    assert alloc.allocate(128) == MemoryRegion(0x1080, 128, is_free=False)
+    assert alloc.regions == [
+        MemoryRegion(0x1000, 48, is_free=False, padding=16),
+        MemoryRegion(0x1040, 16, is_free=False),
+        MemoryRegion(0x1050, 16, is_free=True),
+        MemoryRegion(0x1060, 32, is_free=True),
+        MemoryRegion(0x1080, 128, is_free=False),
+    ]
+
+    with pytest.raises(OutOfMemoryError):
+        alloc.allocate(64)
+
+
+def test_free():
+    """Test that freed blocks are merged with their buddies"""
+    alloc = BuddyAllocator(address=0, size=256, block_size=16)
+    regions = [alloc.allocate(16) for _ in range(4)]
+
+    alloc.free(regions[1])
+    alloc.free(regions[2])
+    # The freed blocks are adjacent but no buddies
+    assert alloc.regions[:4] == [
+        MemoryRegion(0, 16, is_free=False),
+        MemoryRegion(16, 16, is_free=True),
+        MemoryRegion(32, 16, is_free=True),
+        MemoryRegion(48, 16, is_free=False),
+    ]
+
+    with pytest.raises(UnknownRegionError):
+        alloc.free(regions[1])
+    alloc.free(MemoryRegion(16, 16, is_free=True))
+
+    alloc.free(regions[0])
+    alloc.free(regions[3])
+    assert alloc.regions == [MemoryRegion(0, 256, is_free=True)]
+
+
+def test_resize():
+    """Test resizing regions in place"""
+    alloc = BuddyAllocator(address=0, size=256, block_size=16)
+    r1 = alloc.allocate(16)
+    r2 = alloc.allocate(16)
+
+    with pytest.raises(OutOfMemoryError):
+        alloc.resize(r1, 32)
+    with pytest.raises(OutOfMemoryError):
+        # The region is the upper half of its buddy pair and cannot grow
+        alloc.resize(r2, 32)
+
+    alloc.free(r2)
+    r1 = alloc.resize(r1, 64)
+    assert r1 == MemoryRegion(0, 64, is_free=False)
+
+    r1 = alloc.resize(r1, 16)
+    assert alloc.regions == [
+        MemoryRegion(0, 16, is_free=False),
+        MemoryRegion(16, 16, is_free=True),
+        MemoryRegion(32, 32, is_free=True),
+        MemoryRegion(64, 64, is_free=True),
+        MemoryRegion(128, 128, is_free=True),
+    ]
+
+
+def test_non_power_of_two_size():
+    """Test memory ranges which are no power of two multiple of the block size"""
+    rng = random.Random(0)
+    alloc = BuddyAllocator(address=0, size=16 * 13, block_size=16)
+    assert [region.size for region in alloc.regions] == [128, 64, 16]
+
+    allocated = []
+    for _ in range(1000):
+        if allocated and rng.random() < 0.5:
+            alloc.free(allocated.pop(rng.randrange(len(allocated))))
+        else:
+            try:
+                allocated.append(alloc.allocate(rng.randrange(1, 5) * 16))
+            except OutOfMemoryError:
+                pass
+        regions = alloc.regions
+        assert sum(region.total_size for region in regions) == 16 * 13
+        assert all(a.address + a.total_size == b.address for a, b in itertools.pairwise(regions))
+
+    for region in allocated:
+        alloc.free(region)
+    assert [region.size for region in alloc.regions] == [128, 64, 16]
@@ -0,0 +1,42 @@
+import functools
+
+import pytest
+
+from virtual_allocator import AllocationPolicy, Allocator
+from virtual_allocator.fuzz import fuzz
+
+
+@pytest.mark.parametrize("policy", list(AllocationPolicy))
+def test_fuzz(policy):
+    """Test that the region storages behave like the reference"""
+    report = fuzz(2000, policy, size=1 << 16, max_live_regions=200, check_interval=100)
+    assert report.divergence is None
+    assert report.operations == 2000
+    assert report.out_of_memory_errors
+    assert report.peak_live_regions == 200
+
+
+def test_divergence():
+    """Test that the first divergence from the reference is reported"""
+    # Deferred frees reuse freed regions before lower free regions, which changes the placement. The regions are only
+    # compared at the end, comparing them merges the deferred regions.
+    backends = {"deferred": functools.partial(Allocator, max_deferred_frees=64)}
+    report = fuzz(2000, backends=backends, size=1 << 16, max_live_regions=200, check_interval=2000)
+    divergence = report.divergence
+    assert divergence is not None
+    assert divergence.backend == "deferred"
+    assert divergence.operation == report.operations
+    assert divergence.expected != divergence.actual
+
+    # The region storages alone do not diverge up to the same operation
+    assert fuzz(report.operations, size=1 << 16, max_live_regions=200, check_interval=1).divergence is None
+
+
+def test_shared_divergence(monkeypatch):
+    """Test that a bug shared by all region storages diverges from the reference model"""
+    monkeypatch.setattr(Allocator, "get_padding", lambda self, size: -size % (2 * self._alignment))
+    report = fuzz(2000, size=1 << 16, max_live_regions=200, check_interval=100)
+    divergence = report.divergence
+    assert divergence is not None
+    assert divergence.backend == "linked_list"
+    assert divergence.call.startswith("allocate")
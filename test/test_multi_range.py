@@ -0,0 +1,110 @@
+import pytest
+
+from virtual_allocator import AlignmentError, AllocationPolicy, MemoryRegion, OutOfMemoryError, UnknownRegionError
+from virtual_allocator.multi_range import MultiRangeAllocator
+
+
+def test_windows():
+    """Test adding and removing windows"""
+    alloc = MultiRangeAllocator([(0x1000, 256), (0, 128)], 16, 16, AllocationPolicy.FIRST_FIT)
+    assert alloc.windows == [(0, 128), (0x1000, 256)]
+    assert alloc.regions == [MemoryRegion(0, 128, is_free=True), MemoryRegion(0x1000, 256, is_free=True)]
+
+    for address, size in ((64, 128), (0xF80, 256), (0x1000, 16), (0x200, 0)):
+        with pytest.raises(ValueError):
+            alloc.add_window(address, size)
+
+    alloc.add_window(0x800, 512)
+    assert alloc.windows == [(0, 128), (0x800, 512), (0x1000, 256)]
+    region = alloc.allocate(512)
+    assert region.address == 0x800
+
+    with pytest.raises(ValueError):
+        # The window contains an allocated region
+        alloc.remove_window(0x800)
+    with pytest.raises(ValueError):
+        alloc.remove_window(0x810)
+
+    alloc.free(region)
+    alloc.remove_window(0x800)
+    assert alloc.windows == [(0, 128), (0x1000, 256)]
+    with pytest.raises(OutOfMemoryError):
+        alloc.allocate(512)
+
+
+@pytest.mark.parametrize(
+    "policy, addresses",
+    [
+        # The lowest window fitting the size
+        (AllocationPolicy.FIRST_FIT, [0, 0x1000, 0x40]),
+        # The window with the smallest largest free region fitting the size
+        (AllocationPolicy.BEST_FIT, [0x2000, 0x1000, 0x10A0]),
+        (AllocationPolicy.TLSF, [0x2000, 0x1000, 0x10A0]),
+        (AllocationPolicy.NEXT_FIT, [0, 0x1000, 0x40]),
+        # The window with the largest free region
+        (AllocationPolicy.WORST_FIT, [0x1000, 0x1040, 0]),
+    ],
+)
+def test_allocate(policy, addresses):
+    """Test picking the window of an allocation"""
+    alloc = MultiRangeAllocator([(0, 128), (0x1000, 256), (0x2000, 64)], 16, 32, policy)
+    regions = [alloc.allocate(size) for size in (48, 160, 48)]
+    assert [region.address for region in regions] == addresses
+
+    with pytest.raises(OutOfMemoryError):
+        # The free memory of all windows is larger, but no single window fits
+        alloc.allocate(192)
+    with pytest.raises(ValueError):
+        alloc.allocate(-16)
+    with pytest.raises(AlignmentError):
+        alloc.allocate(8)
+
+    for region in regions:
+        alloc.free(region)
+    assert alloc.allocate(256).address == 0x1000
+
+
+def test_resize():
+    """Test resizing and reallocating regions across windows"""
+    alloc = MultiRangeAllocator([(0, 128), (0x1000, 256)], 16, 16, AllocationPolicy.BEST_FIT)
+    region = alloc.allocate(64)
+    assert region.address == 0
+
+    region = alloc.resize(region, 128)
+    assert region == MemoryRegion(0, 128, is_free=False)
+    with pytest.raises(OutOfMemoryError):
+        alloc.resize(region, 144)
+
+    # The region is moved to the other window
+    region, moved = alloc.reallocate(region, 144)
+    assert moved and region.address == 0x1000
+    region, moved = alloc.reallocate(region, 64)
+    assert not moved
+    # The first window is free again
+    assert alloc.allocate(128).address == 0
+
+    with pytest.raises(OutOfMemoryError):
+        alloc.reallocate(region, 512)
+    with pytest.raises(UnknownRegionError):
+        alloc.free(MemoryRegion(0x800, 16, is_free=False))
+    with pytest.raises(UnknownRegionError):
+        alloc.free(MemoryRegion(-16, 16, is_free=False))
+
+
+@pytest.mark.parametrize("policy", [AllocationPolicy.FIRST_FIT, AllocationPolicy.NEXT_FIT])
+def test_largest_free_size_bound(policy):
+    """Test that a stale upper bound of the largest free size of a window is corrected"""
+    alloc = MultiRangeAllocator([(0, 256), (0x1000, 256)], 16, 16, policy)
+    regions = [alloc.allocate(64) for _ in range(4)]
+    assert [region.address for region in regions] == [0, 64, 128, 192]
+    alloc.free(regions[1])
+    alloc.free(regions[2])
+    # Returning memory raises the bound to the merged free region
+    assert alloc.allocate(128).address == 64
+
+    alloc.free(regions[0])
+    alloc.free(regions[3])
+    # Only 64 bytes are left at either end of the first window, the allocation fails there and moves on
+    assert alloc.allocate(128).address == 0x1000
+    # The first window still takes regions fitting its free regions
+    assert alloc.allocate(64).address in (0, 192)
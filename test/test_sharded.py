@@ -0,0 +1,66 @@
+import concurrent.futures
+
+import pytest
+
+from virtual_allocator import AllocationPolicy, MemoryRegion, OutOfMemoryError, UnknownRegionError
+from virtual_allocator.sharded import ShardedAllocator
+
+
+def test_shards():
+    """Test the partitioning of the memory range into shards"""
+    alloc = ShardedAllocator(0x100, 1000, 16, 32, AllocationPolicy.FIRST_FIT, num_shards=3)
+    assert alloc.regions == [
+        MemoryRegion(0x100, 320, is_free=True),
+        MemoryRegion(0x240, 320, is_free=True),
+        MemoryRegion(0x380, 360, is_free=True),
+    ]
+
+    with pytest.raises(ValueError):
+        ShardedAllocator(0, 64, 16, 32, AllocationPolicy.FIRST_FIT, num_shards=3)
+
+
+def test_steal():
+    """Test that allocations fall back to other shards if the home shard is full"""
+    alloc = ShardedAllocator(0, 256, 16, 16, AllocationPolicy.BEST_FIT, num_shards=2)
+    regions = [alloc.allocate(64) for _ in range(4)]
+    assert [region.address for region in regions] == [0, 64, 128, 192]
+
+    with pytest.raises(OutOfMemoryError):
+        alloc.allocate(16)
+
+    alloc.free(regions[1])
+    alloc.free(regions[2])
+    with pytest.raises(OutOfMemoryError):
+        # The free memory is split between the shards, a region cannot span shards
+        alloc.allocate(128)
+
+    with pytest.raises(UnknownRegionError):
+        alloc.free(MemoryRegion(-16, 16, is_free=False))
+
+    region = alloc.resize(alloc.allocate(64), 32)
+    alloc.free(region)
+
+
+def test_threads():
+    """Test allocating and freeing from multiple threads"""
+    alloc = ShardedAllocator(0, 1 << 20, 16, 16, AllocationPolicy.BEST_FIT, num_shards=4)
+
+    def worker(seed: int) -> list[Exception]:
+        """Allocate and free regions, return the allocator errors, other exceptions are raised by the futures"""
+        errors: list[Exception] = []
+        for idx in range(200):
+            try:
+                regions = [alloc.allocate(16 * (1 + (seed + idx + offset) % 8)) for offset in range(8)]
+                for region in regions:
+                    alloc.free(region)
+            except (OutOfMemoryError, UnknownRegionError) as exc:
+                errors.append(exc)
+        return errors
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(worker, seed) for seed in range(8)]
+        errors = [error for future in futures for error in future.result()]
+
+    assert not errors
+    assert all(region.is_free for region in alloc.regions)
+    assert len(alloc.regions) == alloc.num_shards
@@ -0,0 +1,111 @@
+import multiprocessing
+import random
+
+import pytest
+
+from virtual_allocator import Allocator, MemoryRegion, OutOfMemoryError
+from virtual_allocator.shared import SharedAllocator
+
+
+@pytest.fixture
+def shared_alloc():
+    alloc = SharedAllocator(0x1000, 1 << 16, 16, 32, max_regions=256)
+    yield alloc
+    alloc.close()
+    alloc.unlink()
+
+
+def _worker(alloc: SharedAllocator, seed: int, results) -> None:
+    """Allocate and free regions, report the regions left allocated"""
+    rng = random.Random(seed)
+    regions = []
+    for _ in range(200):
+        if regions and rng.random() < 0.4:
+            alloc.free(regions.pop(rng.randrange(len(regions))))
+        elif len(regions) < 20:
+            regions.append(alloc.allocate(rng.randrange(1, 8) * 16))
+    results.put(regions)
+    alloc.close()
+
+
+def test_shared(shared_alloc):
+    """Test allocating and freeing from an allocator attached by name"""
+    other_alloc = SharedAllocator.attach(shared_alloc.name, shared_alloc.lock)
+    region = other_alloc.allocate(64)
+    assert shared_alloc.regions == other_alloc.regions == [region, MemoryRegion(0x1040, (1 << 16) - 64, True)]
+
+    shared_alloc.free(region)
+    assert other_alloc.regions == [MemoryRegion(0x1000, 1 << 16, True)]
+    other_alloc.close()
+
+
+def test_region_at(shared_alloc):
+    """Test that region lookups see the regions changed through another attached allocator"""
+    other_alloc = SharedAllocator.attach(shared_alloc.name, shared_alloc.lock)
+    regions = [other_alloc.allocate(48) for _ in range(4)]
+    other_alloc.free(regions[1])
+    assert shared_alloc.region_at(0x1040 + 20) == MemoryRegion(0x1040, 64, True)
+    assert shared_alloc.regions_in(0x1040, 0x10C0) == [MemoryRegion(0x1040, 64, True), regions[2]]
+
+    other_alloc.free_many([regions[0], regions[2], regions[3]])
+    assert shared_alloc.region_at(0x1080) == MemoryRegion(0x1000, 1 << 16, True)
+    shared_alloc.validate()
+    other_alloc.close()
+
+
+def test_snapshot(shared_alloc, tmp_path):
+    """Test that a snapshot of a shared allocator is restored into a regular allocator"""
+    region = shared_alloc.allocate(64)
+    path = tmp_path / "shared.snapshot"
+    shared_alloc.snapshot(path)
+    assert Allocator.restore(path).regions == shared_alloc.regions
+    with pytest.raises(NotImplementedError):
+        SharedAllocator.restore(path)
+    shared_alloc.free(region)
+
+
+def test_processes():
+    """Test allocating and freeing from multiple processes at once"""
+    # Spawned processes attach to the shared memory, the lock has to belong to the same context
+    ctx = multiprocessing.get_context("spawn")
+    shared_alloc = SharedAllocator(0x1000, 1 << 16, 16, 32, max_regions=256, lock=ctx.RLock())
+    try:
+        results = ctx.Queue()
+        processes = [ctx.Process(target=_worker, args=(shared_alloc, seed, results)) for seed in range(4)]
+        for process in processes:
+            process.start()
+        regions = [region for _ in processes for region in results.get(timeout=60)]
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+
+        assert sorted(regions, key=lambda region: region.address) == [
+            region for region in shared_alloc.regions if not region.is_free
+        ]
+        shared_alloc.free_many(regions)
+        assert shared_alloc.regions == [MemoryRegion(0x1000, 1 << 16, True)]
+    finally:
+        shared_alloc.close()
+        shared_alloc.unlink()
+
+
+def test_max_regions():
+    """Test that operations needing more regions than the shared memory has room for fail without changes"""
+    alloc = SharedAllocator(0, 1024, 16, 16, max_regions=4)
+    try:
+        regions = [alloc.allocate(16) for _ in range(3)]
+        with pytest.raises(OutOfMemoryError):
+            alloc.allocate(16)
+        with pytest.raises(OutOfMemoryError):
+            alloc.resize(regions[0], 32)
+        with pytest.raises(OutOfMemoryError):
+            alloc.allocate_many([16, 16])
+        assert alloc.regions == [*regions, MemoryRegion(48, 976, True)]
+
+        alloc.free_many(regions)
+        assert alloc.allocate_many([16, 16]) == [MemoryRegion(0, 16, False), MemoryRegion(16, 16, False)]
+        with pytest.raises(ValueError):
+            SharedAllocator(0, 1024, 16, 16, max_regions=0)
+    finally:
+        alloc.close()
+        alloc.unlink()
@@ -0,0 +1,71 @@
+import pytest
+
+from virtual_allocator import AlignmentError, AllocationPolicy, Allocator, MemoryRegion, OutOfMemoryError
+
+np = pytest.importorskip("numpy")
+simulate = pytest.importorskip("virtual_allocator.simulate").simulate
+
+
+def _run_allocator(policy, heap_size, sizes, lifetimes, arrivals):
+    """Run the requests on an allocator and return the addresses, occupancy and fragmentation after each request"""
+    alloc = Allocator(0, heap_size, block_size=16, alignment=32, allocation_policy=policy)
+    ends = arrivals + lifetimes
+    free_order = iter(np.argsort(ends, kind="stable").tolist())
+    next_free = next(free_order, None)
+    regions: dict[int, MemoryRegion] = {}
+    addresses, occupancy, fragmentation = [], [], []
+    for idx, size in enumerate(sizes.tolist()):
+        while next_free is not None and ends[next_free] <= arrivals[idx]:
+            if next_free in regions:
+                alloc.free(regions.pop(next_free))
+            next_free = next(free_order, None)
+        try:
+            regions[idx] = alloc.allocate(size)
+            addresses.append(regions[idx].address)
+        except OutOfMemoryError:
+            addresses.append(-1)
+        stats = alloc.stats()
+        occupancy.append(heap_size - stats.free_size)
+        fragmentation.append(stats.fragmentation)
+    return addresses, occupancy, fragmentation
+
+
+@pytest.mark.parametrize("policy", [AllocationPolicy.FIRST_FIT, AllocationPolicy.BEST_FIT])
+def test_simulate(subtests, policy):
+    """Test that the simulation places the requests like the allocator"""
+    rng = np.random.default_rng(0)
+    num_requests = 2000
+    for batched in (False, True):
+        with subtests.test(batched=batched):
+            sizes = rng.integers(1, 40, num_requests) * 16
+            # Batches of arrivals and integer lifetimes free many regions at once
+            if batched:
+                arrivals = np.sort(rng.integers(0, num_requests // 50, num_requests)).astype(float)
+                lifetimes = np.ceil(rng.exponential(5, num_requests))
+            else:
+                arrivals = np.arange(num_requests, dtype=float)
+                lifetimes = rng.exponential(100, num_requests)
+            lifetimes[rng.random(num_requests) < 0.05] = np.inf
+
+            result = simulate(0, 16384, 16, 32, policy, sizes, lifetimes, arrivals)
+            addresses, occupancy, fragmentation = _run_allocator(policy, 16384, sizes, lifetimes, arrivals)
+            assert result.addresses.tolist() == addresses
+            assert result.occupancy.tolist() == occupancy
+            assert result.fragmentation.tolist() == pytest.approx(fragmentation)
+            assert result.out_of_memory_errors == addresses.count(-1) > 0
+
+
+def test_simulate_errors():
+    """Test the validation of the simulation parameters"""
+    with pytest.raises(ValueError):
+        simulate(0, 256, 16, 16, AllocationPolicy.TLSF, [16], [1])
+    with pytest.raises(AlignmentError):
+        simulate(0, 256, 16, 16, AllocationPolicy.FIRST_FIT, [8], [1])
+    with pytest.raises(ValueError):
+        simulate(0, 256, 16, 16, AllocationPolicy.FIRST_FIT, [0], [1])
+    with pytest.raises(ValueError):
+        simulate(0, 256, 16, 16, AllocationPolicy.FIRST_FIT, [16], [0])
+    with pytest.raises(ValueError):
+        simulate(0, 256, 16, 16, AllocationPolicy.FIRST_FIT, [16, 16], [1, 1], [1, 0])
+    with pytest.raises(ValueError):
+        simulate(0, 256, 16, 16, AllocationPolicy.FIRST_FIT, [16, 16], [1])
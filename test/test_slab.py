@@ -0,0 +1,69 @@
+import pytest
+
+from virtual_allocator import AllocationPolicy, Allocator, MemoryRegion, OutOfMemoryError, UnknownRegionError
+from virtual_allocator.slab import SlabCache
+
+
+def _allocator(size: int = 1024) -> Allocator:
+    return Allocator(address=0, size=size, block_size=16, alignment=32, allocation_policy=AllocationPolicy.FIRST_FIT)
+
+
+def test_allocate():
+    """Test allocation of objects from slabs"""
+    cache = SlabCache(_allocator(), object_sizes=[16, 64], objects_per_slab=4)
+
+    objects = [cache.allocate(16) for _ in range(5)]
+    assert objects == [MemoryRegion(address, 16, is_free=False, padding=16) for address in (0, 32, 64, 96, 128)]
+    assert cache.allocate(64) == MemoryRegion(256, 64, is_free=False)
+    # Sizes without a size class are passed through to the backing allocator
+    assert cache.allocate(32) == MemoryRegion(512, 32, is_free=False)
+
+    assert cache.allocator.regions == [
+        MemoryRegion(0, 128, is_free=False),
+        MemoryRegion(128, 128, is_free=False),
+        MemoryRegion(256, 256, is_free=False),
+        MemoryRegion(512, 32, is_free=False),
+        MemoryRegion(544, 480, is_free=True),
+    ]
+
+
+def test_free():
+    """Test that freed objects are reused and empty slabs are returned to the backing allocator"""
+    cache = SlabCache(_allocator(), object_sizes=[16], objects_per_slab=2, max_empty_slabs=1)
+    objects = [cache.allocate(16) for _ in range(6)]
+
+    cache.free(objects[2])
+    assert cache.allocate(16) == objects[2]
+
+    with pytest.raises(UnknownRegionError):
+        cache.free(MemoryRegion(objects[0].address, 16, is_free=False))
+
+    for region in objects[:4]:
+        cache.free(region)
+    # One empty slab is kept, the least recently emptied one is returned
+    assert cache.allocator.regions == [
+        MemoryRegion(0, 64, is_free=True),
+        MemoryRegion(64, 64, is_free=False),
+        MemoryRegion(128, 64, is_free=False),
+        MemoryRegion(192, 832, is_free=True),
+    ]
+    # The most recently freed object of the kept slab is reused first
+    assert cache.allocate(16) == MemoryRegion(96, 16, is_free=False, padding=16)
+
+    cache.free(MemoryRegion(96, 16, is_free=False, padding=16))
+    assert cache.reclaim() == 1
+    assert cache.allocator.regions[:2] == [MemoryRegion(0, 128, is_free=True), MemoryRegion(128, 64, is_free=False)]
+
+
+def test_resize():
+    """Test resizing objects within their slot"""
+    cache = SlabCache(_allocator(128), object_sizes=[16], objects_per_slab=2)
+    region = cache.allocate(16)
+    region = cache.resize(region, 32)
+    assert region == MemoryRegion(0, 32, is_free=False)
+    with pytest.raises(OutOfMemoryError):
+        cache.resize(region, 48)
+
+    cache.free(region)
+    # The slot is reused for the size class of the slab
+    assert cache.allocate(16) == MemoryRegion(0, 16, is_free=False, padding=16)
@@ -0,0 +1,122 @@
+import pytest
+
+from virtual_allocator import AllocationPolicy, Allocator, MemoryRegion, OutOfMemoryError, Placement
+from virtual_allocator.buddy import BuddyAllocator
+from virtual_allocator.trace import TraceRecorder, replay
+
+
+def _record(path) -> Allocator:
+    alloc = Allocator(0, 256, block_size=16, alignment=16, allocation_policy=AllocationPolicy.FIRST_FIT)
+    with TraceRecorder(alloc, path):
+        r1 = alloc.allocate(64)
+        r2 = alloc.allocate(32)
+        r3, _ = alloc.allocate_many([16, 64])
+        alloc.free(r1)
+        with pytest.raises(OutOfMemoryError):
+            alloc.allocate(256)
+        r5 = alloc.allocate(48)
+        alloc.resize(r2, 48)
+        alloc.free_many([r3, r5])
+    return alloc
+
+
+def test_record(tmp_path):
+    """Test recording the calls of an allocator"""
+    path = tmp_path / "allocator.trace"
+    alloc = _record(path)
+
+    lines = path.read_text().splitlines()
+    assert lines[0] == "virtual-allocator-trace 1 0 256 16 16 FIRST_FIT"
+    # Strip the durations
+    assert [line.rsplit(" ", 1)[0] for line in lines[1:]] == [
+        "a 0 64 0",
+        "a 1 32 64",
+        "A 2 16,64 96,112",
+        "f 0",
+        "a 4 256 -",
+        "a 5 48 0",
+        "r 1 48 48",
+        "F 2 5",
+    ]
+    # The methods of the allocator are restored
+    assert "allocate" not in vars(alloc)
+
+
+def test_replay(tmp_path, subtests):
+    """Test replaying a trace against different allocators"""
+    path = tmp_path / "allocator.trace"
+    _record(path)
+
+    with subtests.test("recorded policy"):
+        report = replay(path)
+        assert report.operations == 8
+        assert report.different_placements == 0
+        assert report.recorded_out_of_memory_errors == report.replayed_out_of_memory_errors == 1
+        assert report.recorded_peak_end_address == report.replayed_peak_end_address == 176
+
+    with subtests.test("buddy allocator"):
+        report = replay(path, allocator=BuddyAllocator(0, 256, 16))
+        assert report.operations == 8
+        assert report.replayed_out_of_memory_errors >= 1
+
+    with subtests.test("invalid"):
+        path.write_text("not a trace\n")
+        with pytest.raises(ValueError):
+            replay(path)
+
+
+def test_undo_resize(tmp_path, subtests):
+    """Test that resizes which failed in the recording are undone at the previous address"""
+    cases = {
+        # The region grows into the free region in front of it
+        "resize": (
+            ["a 0 64 0 0", "a 1 64 64 0", "a 2 128 128 0", "f 0 0", "r 1 128 - 0"],
+            [MemoryRegion(0, 64, True), MemoryRegion(64, 64, False), MemoryRegion(128, 128, False)],
+        ),
+        # The region is moved behind the following region
+        "reallocate": (
+            ["a 0 32 0 0", "a 1 32 32 0", "m 0 64 - 0"],
+            [MemoryRegion(0, 32, False), MemoryRegion(32, 32, False), MemoryRegion(64, 192, True)],
+        ),
+    }
+    for name, (lines, regions) in cases.items():
+        with subtests.test(name):
+            path = tmp_path / f"{name}.trace"
+            path.write_text("\n".join(["virtual-allocator-trace 1 0 256 16 16 FIRST_FIT", *lines, ""]))
+            alloc = Allocator(0, 256, block_size=16, alignment=16, allocation_policy=AllocationPolicy.FIRST_FIT)
+            assert replay(path, allocator=alloc).different_placements == 1
+            assert alloc.regions == regions
+
+
+def test_peak_padding(tmp_path):
+    """Test that the peak end addresses include the padding of the regions"""
+    path = tmp_path / "allocator.trace"
+    alloc = Allocator(0, 256, block_size=16, alignment=32, allocation_policy=AllocationPolicy.FIRST_FIT)
+    with TraceRecorder(alloc, path):
+        alloc.allocate(16)
+        alloc.allocate(48)
+
+    report = replay(path)
+    assert report.recorded_peak_end_address == report.replayed_peak_end_address == 96
+
+
+def test_allocation_options(tmp_path):
+    """Test recording and replaying the alignment and hint of allocations"""
+    path = tmp_path / "allocator.trace"
+    alloc = Allocator(0, 256, block_size=16, alignment=16, allocation_policy=AllocationPolicy.FIRST_FIT)
+    with TraceRecorder(alloc, path):
+        alloc.allocate(16)
+        alloc.allocate(16, alignment=64)
+        alloc.allocate(32, hint=Placement.HIGH)
+        alloc.allocate(16, hint=128)
+
+    lines = path.read_text().splitlines()
+    assert [line.rsplit(" ", 1)[0] for line in lines[1:]] == [
+        "a 0 16 0",
+        "a 1 16 64 alignment=64",
+        "a 2 32 224 hint=HIGH",
+        "a 3 16 128 hint=128",
+    ]
+    report = replay(path, allocation_policy=AllocationPolicy.BEST_FIT)
+    assert report.different_placements == 0
+    assert report.replayed_peak_end_address == 256
@@ -1,20 +1,35 @@
 from __future__ import annotations
 
+import abc
+import array
+import bisect
 import dataclasses
 import enum
+import functools
+import heapq
 import importlib.metadata
+import math
+import mmap
+import os
+import struct
+import time
 import typing as ty
 
 __version__ = importlib.metadata.version(__name__)
 
 
 __all__ = [
-    "UnknownRegionError",
+    "AlignmentError",
     "AllocationPolicy",
-    "OutOfMemoryError",
     "Allocator",
-    "AlignmentError",
+    "AllocatorStats",
+    "Histogram",
     "MemoryRegion",
+    "OperationStats",
+    "OutOfMemoryError",
+    "Placement",
+    "RegionStorage",
+    "UnknownRegionError",
 ]
 
 
@@ -45,174 +60,1671 @@ class AllocationPolicy(enum.Enum):
 
     FIRST_FIT = enum.auto()  # Allocate to the first fitting memory region
     BEST_FIT = enum.auto()  # Allocate to the memory region with the smallest size difference to the allocated block
+    TLSF = enum.auto()  # Allocate to a memory region of the smallest fitting size class, found by bitmap lookups
+    NEXT_FIT = enum.auto()  # Allocate to the first fitting memory region after the previously allocated region
+    WORST_FIT = enum.auto()  # Allocate to the largest free memory region
+
+
+class RegionStorage(enum.Enum):
+    """Storage backend for the regions of an allocator"""
+
+    LINKED_LIST = enum.auto()  # Store each region in a node object of a doubly linked list
+    ARRAY = enum.auto()  # Store the regions in parallel arrays, uses less memory for large numbers of regions
+
+
+class Placement(enum.Enum):
+    """Placement hint for a single allocation, overriding the allocation policy"""
+
+    LOW = enum.auto()  # Allocate at the lowest fitting address
+    HIGH = enum.auto()  # Allocate at the highest fitting address, at the end of the highest fitting free region
 
 
 class AlignmentError(ValueError):
     """Raised if the requested memory size is not a multiple of the block size"""
 
 
+@dataclasses.dataclass(frozen=True)
+class Histogram:
+    """Histogram of non-negative integer values with power-of-two buckets
+
+    Bucket `i` counts the values with a bit length of `i`, which are the values from `2**(i - 1)` to `2**i - 1`. Bucket
+    0 counts the value 0.
+    """
+
+    buckets: tuple[int, ...] = ()  # Number of values in each bucket, trailing empty buckets are omitted
+
+    @property
+    def count(self) -> int:
+        return sum(self.buckets)
+
+    def quantile(self, q: float) -> int:
+        """Get an upper bound of the `q` quantile of the values
+
+        :param q: Quantile between 0 and 1
+        :type q: float
+        :return: Largest value of the bucket containing the quantile, 0 if the histogram is empty
+        :rtype: int
+        """
+        threshold = q * self.count
+        count = 0
+        for idx, bucket in enumerate(self.buckets):
+            count += bucket
+            if bucket and count >= threshold:
+                return (1 << idx) - 1
+        return 0
+
+
+@dataclasses.dataclass(frozen=True)
+class OperationStats:
+    """Statistics of the calls of one operation of an allocator"""
+
+    out_of_memory_errors: int  # Number of calls which raised OutOfMemoryError
+    latency_ns: Histogram  # Duration of the calls in nanoseconds
+
+    @property
+    def calls(self) -> int:
+        return self.latency_ns.count
+
+
+@dataclasses.dataclass(frozen=True)
+class AllocatorStats:
+    """Snapshot of the statistics of an allocator"""
+
+    free_size: int  # Total size of the free memory regions
+    largest_free_size: int  # Total size of the largest free memory region
+    # Statistics per instrumented method name, empty if the allocator is not instrumented
+    operations: dict[str, OperationStats]
+    scan_lengths: Histogram  # Number of regions visited by each scan for a free region
+
+    @property
+    def fragmentation(self) -> float:
+        """Get the share of the free memory which is not part of the largest free region, between 0 and 1"""
+        if not self.free_size:
+            return 0.0
+        return 1 - self.largest_free_size / self.free_size
+
+
+class _FreeIndex(abc.ABC):
+    """Index of the free memory regions of an allocator"""
+
+    total_size = 0  # Sum of the sizes of the indexed regions
+    num_regions = 0  # Number of indexed regions
+
+    @abc.abstractmethod
+    def add(self, address: int, size: int) -> None:
+        """Add a free region to the index"""
+
+    @abc.abstractmethod
+    def remove(self, address: int, size: int) -> None:
+        """Remove a free region from the index"""
+
+    @abc.abstractmethod
+    def find(self, size: int) -> tuple[int, int] | None:
+        """Find a region with at least `size`
+
+        :param size: Minimum total size of the region
+        :type size: int
+        :return: 2-tuple of (address, total_size) of the region or `None` if no region fits
+        :rtype: tuple[int, int] | None
+        """
+
+    @abc.abstractmethod
+    def largest(self) -> int:
+        """Get the size of the largest indexed region, 0 if the index is empty"""
+
+
+class _FreeSizeIndex(_FreeIndex):
+    """Index of the free memory regions of an allocator, ordered by their total size
+
+    Regions are kept in buckets of equal size, the bucket sizes are kept in a sorted list. This allows looking up the
+    smallest region fitting a size in O(log n) without scanning all regions.
+    """
+
+    def __init__(self) -> None:
+        self._sizes: list[int] = []  # Sorted list of the distinct sizes of the indexed regions
+        self._buckets: dict[int, list[int]] = {}  # Sorted start addresses of the indexed regions per size
+
+    def add(self, address: int, size: int) -> None:
+        self.total_size += size
+        self.num_regions += 1
+        bucket = self._buckets.get(size)
+        if bucket is None:
+            bisect.insort(self._sizes, size)
+            self._buckets[size] = [address]
+        else:
+            bisect.insort(bucket, address)
+
+    def remove(self, address: int, size: int) -> None:
+        self.total_size -= size
+        self.num_regions -= 1
+        bucket = self._buckets[size]
+        del bucket[bisect.bisect_left(bucket, address)]
+        if not bucket:
+            del self._buckets[size]
+            del self._sizes[bisect.bisect_left(self._sizes, size)]
+
+    def find(self, size: int) -> tuple[int, int] | None:
+        """Find the smallest region with at least `size`, ties are broken by the lowest address"""
+        idx = bisect.bisect_left(self._sizes, size)
+        if idx == len(self._sizes):
+            return None
+        bucket_size = self._sizes[idx]
+        return self._buckets[bucket_size][0], bucket_size
+
+    def largest(self) -> int:
+        return self._sizes[-1] if self._sizes else 0
+
+
+class _MaxHeapFreeIndex(_FreeIndex):
+    """Index of the free memory regions of an allocator in a max-heap of their total size
+
+    Removed regions are only marked as removed and are dropped from the heap once they reach the top, so adding and
+    removing regions takes O(log n) without searching the heap. The heap is rebuilt once more than half of its entries
+    are removed regions.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[int, int]] = []  # Entries of (-size, address), the largest region is at the top
+        self._counts: dict[tuple[int, int], int] = {}  # Number of indexed regions per entry, empty regions can repeat
+
+    def add(self, address: int, size: int) -> None:
+        self.total_size += size
+        self.num_regions += 1
+        entry = (-size, address)
+        self._counts[entry] = self._counts.get(entry, 0) + 1
+        heapq.heappush(self._heap, entry)
+
+    def remove(self, address: int, size: int) -> None:
+        self.total_size -= size
+        self.num_regions -= 1
+        entry = (-size, address)
+        count = self._counts[entry] - 1
+        if count:
+            self._counts[entry] = count
+        else:
+            del self._counts[entry]
+        if len(self._heap) > 2 * self.num_regions + 64:
+            self._heap = [indexed for indexed, indexed_count in self._counts.items() for _ in range(indexed_count)]
+            heapq.heapify(self._heap)
+
+    def find(self, size: int) -> tuple[int, int] | None:
+        """Find the largest region if it has at least `size`, ties are broken by the lowest address"""
+        largest = self.largest()
+        if not self._heap or largest < size:
+            return None
+        return self._heap[0][1], largest
+
+    def largest(self) -> int:
+        heap = self._heap
+        # Drop removed regions from the top of the heap
+        while heap and heap[0] not in self._counts:
+            heapq.heappop(heap)
+        return -heap[0][0] if heap else 0
+
+
+_H = ty.TypeVar("_H")
+
+
+class _SegregatedFreeIndex(_FreeIndex):
+    """Two-level segregated fit (TLSF) index of the free memory regions of an allocator
+
+    Free regions are sorted into size classes. The first level splits the sizes into powers of two, the second level
+    splits each power of two linearly into `2**SL_BITS` classes. A bitmap per level tracks the non-empty classes, so a
+    fitting class is found with a constant number of bit operations. The requested size is rounded up to the next class
+    boundary, any region of the class found this way fits without searching the class.
+
+    Only if no class above the rounded size is populated, the class of the size itself is searched for a fitting region,
+    and :meth:`largest` searches the highest populated class. Both take time linear in the number of regions of the
+    class.
+    """
+
+    SL_BITS = 4  # Number of bits of the second level index
+    _SL_COUNT = 1 << SL_BITS
+
+    def __init__(self) -> None:
+        self._fl_bitmap = 0  # Bit i is set if any class of first level i is non-empty
+        self._sl_bitmaps: list[int] = []  # Bit j of entry i is set if class (i, j) is non-empty
+        # Start address to the sizes of the regions in each class, empty regions can share the start address
+        self._classes: list[dict[int, list[int]]] = []
+
+    def _mapping(self, size: int) -> tuple[int, int]:
+        """Get the (first level, second level) class of `size`"""
+        if size < self._SL_COUNT:
+            # Small sizes are mapped linearly into the first level
+            return 0, size
+        shift = size.bit_length() - 1 - self.SL_BITS
+        return shift + 1, (size >> shift) - self._SL_COUNT
+
+    def add(self, address: int, size: int) -> None:
+        self.total_size += size
+        self.num_regions += 1
+        fl, sl = self._mapping(size)
+        while len(self._sl_bitmaps) <= fl:
+            self._sl_bitmaps.append(0)
+            self._classes.extend({} for _ in range(self._SL_COUNT))
+        self._classes[fl * self._SL_COUNT + sl].setdefault(address, []).append(size)
+        self._sl_bitmaps[fl] |= 1 << sl
+        self._fl_bitmap |= 1 << fl
+
+    def remove(self, address: int, size: int) -> None:
+        self.total_size -= size
+        self.num_regions -= 1
+        fl, sl = self._mapping(size)
+        size_class = self._classes[fl * self._SL_COUNT + sl]
+        sizes = size_class[address]
+        sizes.remove(size)
+        if not sizes:
+            del size_class[address]
+        if not size_class:
+            self._sl_bitmaps[fl] &= ~(1 << sl)
+            if not self._sl_bitmaps[fl]:
+                self._fl_bitmap &= ~(1 << fl)
+
+    def find(self, size: int) -> tuple[int, int] | None:
+        if size >= self._SL_COUNT:
+            # Round up to the next class boundary, so all regions of the class found fit the size
+            rounded_size = size + (1 << (size.bit_length() - 1 - self.SL_BITS)) - 1
+        else:
+            rounded_size = size
+        fl, sl = self._mapping(rounded_size)
+
+        sl_bitmap = self._sl_bitmaps[fl] & (-1 << sl) if fl < len(self._sl_bitmaps) else 0
+        if not sl_bitmap:
+            fl_bitmap = self._fl_bitmap & (-1 << (fl + 1))
+            if fl_bitmap:
+                fl = _lowest_bit(fl_bitmap)
+                sl_bitmap = self._sl_bitmaps[fl]
+        if sl_bitmap:
+            size_class = self._classes[fl * self._SL_COUNT + _lowest_bit(sl_bitmap)]
+            address, sizes = next(iter(size_class.items()))
+            return address, sizes[0]
+
+        # No class above the rounded size is populated, the class of the size can still contain a fitting region
+        fl, sl = self._mapping(size)
+        if fl < len(self._sl_bitmaps):
+            for address, sizes in self._classes[fl * self._SL_COUNT + sl].items():
+                for region_size in sizes:
+                    if region_size >= size:
+                        return address, region_size
+        return None
+
+    def largest(self) -> int:
+        if not self._fl_bitmap:
+            return 0
+        fl = self._fl_bitmap.bit_length() - 1
+        sl = self._sl_bitmaps[fl].bit_length() - 1
+        return max(max(sizes) for sizes in self._classes[fl * self._SL_COUNT + sl].values())
+
+
+def _lowest_bit(value: int) -> int:
+    """Get the index of the lowest set bit of `value`"""
+    return (value & -value).bit_length() - 1
+
+
+class _AddressIndex(ty.Protocol[_H]):
+    """Mapping from the start address of a region to its handle"""
+
+    def __len__(self) -> int: ...
+
+    def get(self, address: int) -> _H | None: ...
+
+    def __setitem__(self, address: int, handle: _H) -> None: ...
+
+    def __delitem__(self, address: int) -> None: ...
+
+
+class _AddressMap:
+    """Hash map from addresses to row numbers stored in two arrays
+
+    Uses open addressing with linear probing and backward shift deletion, so no per-entry objects are allocated.
+    """
+
+    _EMPTY = -1
+    _HASH_FACTOR = 0x9E3779B97F4A7C15  # 2**64 divided by the golden ratio, for Fibonacci hashing
+
+    def __init__(self) -> None:
+        self._len = 0
+        self._allocate(3)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _allocate(self, bits: int) -> None:
+        """Allocate empty slots for a capacity of 2**bits"""
+        self._bits = bits
+        self._mask = (1 << bits) - 1
+        self._keys = array.array("Q", bytes(8 << bits))
+        self._rows = array.array("q", [self._EMPTY]) * (1 << bits)
+
+    def _slot(self, address: int) -> int:
+        """Get the preferred slot of an address"""
+        return ((address * self._HASH_FACTOR) & 0xFFFFFFFFFFFFFFFF) >> (64 - self._bits)
+
+    def _find_slot(self, address: int) -> int:
+        """Get the slot of `address` or the empty slot where it would be inserted"""
+        keys = self._keys
+        rows = self._rows
+        mask = self._mask
+        slot = self._slot(address)
+        while rows[slot] != self._EMPTY and keys[slot] != address:
+            slot = (slot + 1) & mask
+        return slot
+
+    def get(self, address: int) -> int | None:
+        slot = self._find_slot(address)
+        row = self._rows[slot]
+        return None if row == self._EMPTY else row
+
+    def __setitem__(self, address: int, row: int) -> None:
+        slot = self._find_slot(address)
+        if self._rows[slot] == self._EMPTY:
+            if (self._len + 1) * 2 > len(self._rows):
+                self._grow()
+                slot = self._find_slot(address)
+            self._len += 1
+            self._keys[slot] = address
+        self._rows[slot] = row
+
+    def __delitem__(self, address: int) -> None:
+        keys = self._keys
+        rows = self._rows
+        mask = self._mask
+        slot = self._find_slot(address)
+        if rows[slot] == self._EMPTY:
+            raise KeyError(address)
+        self._len -= 1
+        # Shift following entries of the probe sequence back, so lookups do not stop at the emptied slot
+        next_slot = (slot + 1) & mask
+        while rows[next_slot] != self._EMPTY:
+            preferred_slot = self._slot(keys[next_slot])
+            if (next_slot - preferred_slot) & mask >= (next_slot - slot) & mask:
+                keys[slot] = keys[next_slot]
+                rows[slot] = rows[next_slot]
+                slot = next_slot
+            next_slot = (next_slot + 1) & mask
+        rows[slot] = self._EMPTY
+
+    def _grow(self) -> None:
+        """Double the capacity and re-insert all entries"""
+        keys = self._keys
+        rows = self._rows
+        self._allocate(self._bits + 1)
+        self._len = 0
+        for address, row in zip(keys, rows):
+            if row != self._EMPTY:
+                self[address] = row
+
+
+class _SortedAddresses:
+    """Sorted set of addresses stored in chunks of bounded size
+
+    Adding and removing an address only shifts the entries of a single chunk instead of all entries of one sorted list,
+    the chunk of an address is found by bisecting the maximum addresses of the chunks.
+    """
+
+    _CHUNK_SIZE = 1024  # Chunks are split in half once they grow beyond this size
+
+    def __init__(self, addresses: ty.Iterable[int]) -> None:
+        # The addresses have to be sorted, the chunks start half full
+        sorted_addresses = list(addresses)
+        step = self._CHUNK_SIZE // 2
+        self._chunks = [sorted_addresses[idx : idx + step] for idx in range(0, len(sorted_addresses), step)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+
+    def __iter__(self) -> ty.Iterator[int]:
+        for chunk in self._chunks:
+            yield from chunk
+
+    def add(self, address: int) -> None:
+        if not self._chunks:
+            self._chunks.append([address])
+            self._maxes.append(address)
+            return
+
+        idx = min(bisect.bisect_left(self._maxes, address), len(self._chunks) - 1)
+        chunk = self._chunks[idx]
+        bisect.insort(chunk, address)
+        self._maxes[idx] = chunk[-1]
+        if len(chunk) > self._CHUNK_SIZE:
+            upper_half = chunk[len(chunk) // 2 :]
+            del chunk[len(chunk) // 2 :]
+            self._chunks.insert(idx + 1, upper_half)
+            self._maxes[idx] = chunk[-1]
+            self._maxes.insert(idx + 1, upper_half[-1])
+
+    def remove(self, address: int) -> None:
+        idx = bisect.bisect_left(self._maxes, address)
+        chunk = self._chunks[idx]
+        del chunk[bisect.bisect_left(chunk, address)]
+        if chunk:
+            self._maxes[idx] = chunk[-1]
+        else:
+            del self._chunks[idx]
+            del self._maxes[idx]
+
+    def floor(self, address: int) -> int | None:
+        """Get the greatest address less than or equal to `address`, `None` if there is none"""
+        idx = bisect.bisect_right(self._maxes, address)
+        if idx < len(self._chunks):
+            # The chunk contains the first address greater than `address`, smaller addresses can precede it
+            chunk = self._chunks[idx]
+            pos = bisect.bisect_right(chunk, address)
+            if pos:
+                return chunk[pos - 1]
+        return self._maxes[idx - 1] if idx else None
+
+
+class _RegionTable(abc.ABC, ty.Generic[_H]):
+    """Table of memory regions ordered by address
+
+    The regions are linked to a doubly linked list and indexed by their start address, so looking up a region and its
+    neighbours as well as inserting and removing regions is O(1). Regions are referred to by handles, the type of the
+    handle depends on the implementation. Only empty regions can share the start address with another region, the
+    index always points to the first region starting at an address.
+    """
+
+    def __init__(self) -> None:
+        self._handles: _AddressIndex[_H] = {}  # First handle starting at each address
+        # Sorted start addresses for lookups by arbitrary addresses, only built on the first lookup
+        self._sorted_addresses: _SortedAddresses | None = None
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> ty.Iterator[_H]:
+        handle = self.first()
+        while handle is not None:
+            yield handle
+            handle = self.next(handle)
+
+    def iter_from(self, start: _H) -> ty.Iterator[_H]:
+        """Iterate over all regions beginning at `start`, wrapping around from the last to the first region"""
+        handle: _H | None = start
+        while handle is not None:
+            yield handle
+            handle = self.next(handle)
+        handle = self.first()
+        while handle is not None and handle != start:
+            yield handle
+            handle = self.next(handle)
+
+    @abc.abstractmethod
+    def first(self) -> _H | None:
+        """Get the handle of the region with the lowest address"""
+
+    @abc.abstractmethod
+    def next(self, handle: _H) -> _H | None:
+        """Get the handle of the region following `handle`"""
+
+    @abc.abstractmethod
+    def prev(self, handle: _H) -> _H | None:
+        """Get the handle of the region preceding `handle`"""
+
+    @abc.abstractmethod
+    def address(self, handle: _H) -> int: ...
+
+    @abc.abstractmethod
+    def size(self, handle: _H) -> int: ...
+
+    @abc.abstractmethod
+    def padding(self, handle: _H) -> int: ...
+
+    @abc.abstractmethod
+    def is_free(self, handle: _H) -> bool: ...
+
+    @abc.abstractmethod
+    def alignment(self, handle: _H) -> int:
+        """Get the alignment requested for the region of `handle`, 0 if it only has the alignment of the allocator"""
+
+    @abc.abstractmethod
+    def set_alignment(self, handle: _H, alignment: int) -> None:
+        """Set the alignment requested for the allocated region of `handle`"""
+
+    def total_size(self, handle: _H) -> int:
+        return self.size(handle) + self.padding(handle)
+
+    def region(self, handle: _H) -> MemoryRegion:
+        """Create a :class:`MemoryRegion` describing the region of `handle`"""
+        return MemoryRegion(self.address(handle), self.size(handle), self.is_free(handle), self.padding(handle))
+
+    def floor(self, address: int) -> _H | None:
+        """Find the handle of the first region with the greatest start address less than or equal to `address`
+
+        :return: Handle of the region or `None` if all regions start after `address`
+        :rtype: _H | None
+        """
+        if self._sorted_addresses is None:
+            self._sorted_addresses = _SortedAddresses(
+                self.address(handle) for handle in self if self._handles.get(self.address(handle)) == handle
+            )
+        start = self._sorted_addresses.floor(address)
+        return None if start is None else self._handles.get(start)
+
+    def find(self, address: int, size: int, padding: int, is_free: bool) -> _H | None:
+        """Find the handle of the region matching all fields
+
+        :return: Handle of the matching region or `None` if no such region exists
+        :rtype: _H | None
+        """
+        handle = self._handles.get(address)
+        while handle is not None and self.address(handle) == address:
+            if self.size(handle) == size and self.padding(handle) == padding and self.is_free(handle) == is_free:
+                return handle
+            handle = self.next(handle)
+        return None
+
+    @abc.abstractmethod
+    def insert_before(self, handle: _H | None, address: int, size: int, padding: int, is_free: bool) -> _H:
+        """Insert a new region in front of `handle`, if `handle` is `None` the new region is inserted first"""
+
+    @abc.abstractmethod
+    def insert_after(self, handle: _H, address: int, size: int, padding: int, is_free: bool) -> _H:
+        """Insert a new region after `handle`"""
+
+    @abc.abstractmethod
+    def update(self, handle: _H, address: int, size: int, padding: int, is_free: bool) -> None:
+        """Update all fields of the region of `handle`, the requested alignment is reset if the region is free"""
+
+    @abc.abstractmethod
+    def remove(self, handle: _H) -> None:
+        """Remove the region of `handle` from the table"""
+
+    def validate(self) -> None:
+        """Check that the regions are linked in both directions and that the address indexes match the regions
+
+        :raises AssertionError: Raised with a description of the first violated invariant
+        """
+        addresses: list[int] = []  # Distinct start addresses in order
+        num_regions = 0
+        previous_handle = None
+        for handle in self:
+            address = self.address(handle)
+            if self.prev(handle) != previous_handle:
+                raise AssertionError(f"Region {self.region(handle)} is not linked to the previous region")
+            if not addresses or addresses[-1] != address:
+                if self._handles.get(address) != handle:
+                    raise AssertionError(f"Region {self.region(handle)} is not the first region indexed at its address")
+                addresses.append(address)
+            num_regions += 1
+            previous_handle = handle
+
+        if num_regions != len(self) or len(addresses) != len(self._handles):
+            raise AssertionError("Region table counts do not match the regions")
+        if self._sorted_addresses is not None and list(self._sorted_addresses) != addresses:
+            raise AssertionError("Sorted address index does not match the regions")
+
+    def _index(self, handle: _H, address: int) -> None:
+        """Add `handle` to the address index, the index has to point to the first region at an address"""
+        indexed = self._handles.get(address)
+        if indexed is None or indexed == self.next(handle):
+            self._handles[address] = handle
+        if indexed is None and self._sorted_addresses is not None:
+            self._sorted_addresses.add(address)
+
+    def _unindex(self, handle: _H, address: int) -> None:
+        """Remove `handle` from the address index, the following region at the same address takes its place"""
+        if self._handles.get(address) != handle:
+            return
+        next_handle = self.next(handle)
+        if next_handle is not None and self.address(next_handle) == address:
+            self._handles[address] = next_handle
+        else:
+            del self._handles[address]
+            if self._sorted_addresses is not None:
+                self._sorted_addresses.remove(address)
+
+
+class _RegionNode:
+    """Node in the doubly linked list of memory regions"""
+
+    __slots__ = ("address", "alignment", "is_free", "next", "padding", "prev", "size")
+
+    def __init__(self, address: int, size: int, padding: int, is_free: bool) -> None:
+        self.address = address
+        self.size = size
+        self.padding = padding
+        self.is_free = is_free
+        self.alignment = 0
+        self.prev: _RegionNode | None = None
+        self.next: _RegionNode | None = None
+
+
+class _RegionList(_RegionTable[_RegionNode]):
+    """Region table storing each region in a node object"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._head: _RegionNode | None = None
+
+    def first(self) -> _RegionNode | None:
+        return self._head
+
+    def next(self, handle: _RegionNode) -> _RegionNode | None:
+        return handle.next
+
+    def prev(self, handle: _RegionNode) -> _RegionNode | None:
+        return handle.prev
+
+    def address(self, handle: _RegionNode) -> int:
+        return handle.address
+
+    def size(self, handle: _RegionNode) -> int:
+        return handle.size
+
+    def padding(self, handle: _RegionNode) -> int:
+        return handle.padding
+
+    def total_size(self, handle: _RegionNode) -> int:
+        return handle.size + handle.padding
+
+    def is_free(self, handle: _RegionNode) -> bool:
+        return handle.is_free
+
+    def alignment(self, handle: _RegionNode) -> int:
+        return handle.alignment
+
+    def set_alignment(self, handle: _RegionNode, alignment: int) -> None:
+        handle.alignment = alignment
+
+    def insert_before(
+        self, handle: _RegionNode | None, address: int, size: int, padding: int, is_free: bool
+    ) -> _RegionNode:
+        node = _RegionNode(address, size, padding, is_free)
+        if handle is None:
+            node.next = self._head
+            if self._head is not None:
+                self._head.prev = node
+            self._head = node
+        else:
+            node.prev = handle.prev
+            node.next = handle
+            if handle.prev is None:
+                self._head = node
+            else:
+                handle.prev.next = node
+            handle.prev = node
+        self._index(node, address)
+        self._len += 1
+        return node
+
+    def insert_after(self, handle: _RegionNode, address: int, size: int, padding: int, is_free: bool) -> _RegionNode:
+        node = _RegionNode(address, size, padding, is_free)
+        node.prev = handle
+        node.next = handle.next
+        if handle.next is not None:
+            handle.next.prev = node
+        handle.next = node
+        self._index(node, address)
+        self._len += 1
+        return node
+
+    def update(self, handle: _RegionNode, address: int, size: int, padding: int, is_free: bool) -> None:
+        if address != handle.address:
+            self._unindex(handle, handle.address)
+            handle.address = address
+            self._index(handle, address)
+        handle.size = size
+        handle.padding = padding
+        handle.is_free = is_free
+        if is_free:
+            handle.alignment = 0
+
+    def remove(self, handle: _RegionNode) -> None:
+        self._unindex(handle, handle.address)
+        if handle.prev is None:
+            self._head = handle.next
+        else:
+            handle.prev.next = handle.next
+        if handle.next is not None:
+            handle.next.prev = handle.prev
+        handle.prev = handle.next = None
+        self._len -= 1
+
+
+class _ArrayRegionTable(_RegionTable[int]):
+    """Region table storing the regions in parallel arrays
+
+    Each region is a row in the columns, the handle of a region is its row number. The rows are linked via the `prev`
+    and `next` columns, rows of removed regions are reused for new regions. This avoids one object per region, which
+    reduces the memory footprint and the garbage collector load for large numbers of regions.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._handles = _AddressMap()
+        self._head = -1
+        self._addresses = array.array("Q")
+        self._sizes = array.array("Q")
+        self._paddings = array.array("Q")
+        self._alignments = array.array("Q")
+        self._free_flags = bytearray()
+        self._prev = array.array("q")  # Row of the previous region, -1 for the first region
+        self._next = array.array("q")  # Row of the next region, -1 for the last region
+        self._unused_rows = array.array("q")
+
+    def first(self) -> int | None:
+        return None if self._head < 0 else self._head
+
+    def next(self, handle: int) -> int | None:
+        row = self._next[handle]
+        return None if row < 0 else row
+
+    def prev(self, handle: int) -> int | None:
+        row = self._prev[handle]
+        return None if row < 0 else row
+
+    def address(self, handle: int) -> int:
+        return self._addresses[handle]
+
+    def size(self, handle: int) -> int:
+        return self._sizes[handle]
+
+    def padding(self, handle: int) -> int:
+        return self._paddings[handle]
+
+    def total_size(self, handle: int) -> int:
+        return self._sizes[handle] + self._paddings[handle]
+
+    def is_free(self, handle: int) -> bool:
+        return bool(self._free_flags[handle])
+
+    def alignment(self, handle: int) -> int:
+        return self._alignments[handle]
+
+    def set_alignment(self, handle: int, alignment: int) -> None:
+        self._alignments[handle] = alignment
+
+    def insert_before(self, handle: int | None, address: int, size: int, padding: int, is_free: bool) -> int:
+        if handle is None:
+            row = self._new_row(address, size, padding, is_free, -1, self._head)
+            if self._head >= 0:
+                self._prev[self._head] = row
+            self._head = row
+        else:
+            prev_row = self._prev[handle]
+            row = self._new_row(address, size, padding, is_free, prev_row, handle)
+            if prev_row < 0:
+                self._head = row
+            else:
+                self._next[prev_row] = row
+            self._prev[handle] = row
+        self._index(row, address)
+        self._len += 1
+        return row
+
+    def insert_after(self, handle: int, address: int, size: int, padding: int, is_free: bool) -> int:
+        next_row = self._next[handle]
+        row = self._new_row(address, size, padding, is_free, handle, next_row)
+        if next_row >= 0:
+            self._prev[next_row] = row
+        self._next[handle] = row
+        self._index(row, address)
+        self._len += 1
+        return row
+
+    def update(self, handle: int, address: int, size: int, padding: int, is_free: bool) -> None:
+        old_address = self._addresses[handle]
+        if address != old_address:
+            self._unindex(handle, old_address)
+            self._addresses[handle] = address
+            self._index(handle, address)
+        self._sizes[handle] = size
+        self._paddings[handle] = padding
+        self._free_flags[handle] = is_free
+        if is_free:
+            self._alignments[handle] = 0
+
+    def remove(self, handle: int) -> None:
+        self._unindex(handle, self._addresses[handle])
+        prev_row = self._prev[handle]
+        next_row = self._next[handle]
+        if prev_row < 0:
+            self._head = next_row
+        else:
+            self._next[prev_row] = next_row
+        if next_row >= 0:
+            self._prev[next_row] = prev_row
+        self._unused_rows.append(handle)
+        self._len -= 1
+
+    def _new_row(self, address: int, size: int, padding: int, is_free: bool, prev_row: int, next_row: int) -> int:
+        """Write a region into an unused row or append a new row to the columns"""
+        if self._unused_rows:
+            row = self._unused_rows.pop()
+            self._addresses[row] = address
+            self._sizes[row] = size
+            self._paddings[row] = padding
+            self._alignments[row] = 0
+            self._free_flags[row] = is_free
+            self._prev[row] = prev_row
+            self._next[row] = next_row
+            return row
+        self._addresses.append(address)
+        self._sizes.append(size)
+        self._paddings.append(padding)
+        self._alignments.append(0)
+        self._free_flags.append(is_free)
+        self._prev.append(prev_row)
+        self._next.append(next_row)
+        return len(self._addresses) - 1
+
+
+# Handle of a region in the region table of an allocator, the type depends on the region storage
+_Handle: ty.TypeAlias = ty.Any
+
+# Snapshot layout, all fields are little-endian unsigned integers:
+# Header: magic, version, allocation policy, address, size, block size, alignment, number of regions
+# Followed by one record per region in address order: size, padding << 1 | is_free, requested alignment. The start
+# address of a region is the end address of the previous region, so it is not stored. Version 1 records have no
+# requested alignment.
+_SNAPSHOT_MAGIC = b"VALC"
+_SNAPSHOT_VERSION = 2
+_SNAPSHOT_HEADER = struct.Struct("<4sHHQQQQQ")
+_SNAPSHOT_RECORDS = {1: struct.Struct("<QQ"), _SNAPSHOT_VERSION: struct.Struct("<QQQ")}
+
+
+class _HistogramCounter:
+    """Mutable counterpart of :class:`Histogram`"""
+
+    __slots__ = ("buckets",)
+
+    def __init__(self) -> None:
+        self.buckets = [0] * 65
+
+    def add(self, value: int) -> None:
+        self.buckets[min(value.bit_length(), 64)] += 1
+
+    def snapshot(self) -> Histogram:
+        buckets = self.buckets
+        length = len(buckets)
+        while length and not buckets[length - 1]:
+            length -= 1
+        return Histogram(tuple(buckets[:length]))
+
+
+class _OperationCounters:
+    """Mutable counterpart of :class:`OperationStats`"""
+
+    __slots__ = ("latency_ns", "out_of_memory_errors")
+
+    def __init__(self) -> None:
+        self.out_of_memory_errors = 0
+        self.latency_ns = _HistogramCounter()
+
+    def snapshot(self) -> OperationStats:
+        return OperationStats(self.out_of_memory_errors, self.latency_ns.snapshot())
+
+
 class Allocator:
     """Linked-list allocator"""
 
-    def __init__(self, address: int, size: int, block_size: int, alignment: int, allocation_policy: AllocationPolicy):
+    # Public methods wrapped by the instrumentation, they must not call each other, so every call is only counted once
+    _INSTRUMENTED_OPERATIONS = ("allocate", "allocate_many", "resize", "reallocate", "free", "free_many")
+
+    def __init__(
+        self,
+        address: int,
+        size: int,
+        block_size: int,
+        alignment: int,
+        allocation_policy: AllocationPolicy,
+        region_storage: RegionStorage = RegionStorage.LINKED_LIST,
+        instrumented: bool = False,
+        max_deferred_frees: int = 0,
+    ):
         self._address = address
         self._size = size
         self._allocation_policy = allocation_policy
         self._block_size = block_size
         self._alignment = alignment
 
-        self._regions: list[MemoryRegion] = [MemoryRegion(self._address, size, is_free=True)]
+        self._regions: _RegionTable[_Handle] = (
+            _ArrayRegionTable() if region_storage == RegionStorage.ARRAY else _RegionList()
+        )
+        # Size-ordered index of the free regions, only maintained for policies which look up regions by size
+        self._free_index: _FreeIndex | None = None
+        if allocation_policy == AllocationPolicy.BEST_FIT:
+            self._free_index = _FreeSizeIndex()
+        elif allocation_policy == AllocationPolicy.TLSF:
+            self._free_index = _SegregatedFreeIndex()
+        elif allocation_policy == AllocationPolicy.WORST_FIT:
+            self._free_index = _MaxHeapFreeIndex()
+        # Handle of the most recently allocated region, the next fit policy resumes scanning there
+        self._cursor: _Handle | None = None
+        self._insert_before(None, self._address, size, 0, True)
+
+        # Freed regions stay allocated in quick lists per size for reuse by allocations of the same size, they are only
+        # merged into the free regions once `max_deferred_frees` regions are deferred or an allocation does not fit
+        self._max_deferred_frees = max_deferred_frees
+        self._quick_lists: dict[int, list[_Handle]] = {}
+        self._deferred: set[_Handle] = set()
+
+        # With instrumentation disabled the public methods are not wrapped at all, so they run without any overhead
+        self._operations: dict[str, _OperationCounters] = {}
+        self._scan_lengths: _HistogramCounter | None = None
+        if instrumented:
+            self._scan_lengths = _HistogramCounter()
+            for name in self._INSTRUMENTED_OPERATIONS:
+                self._instrument(name)
+
+    @property
+    def address(self) -> int:
+        """Get the start address of the memory range of the allocator"""
+        return self._address
+
+    @property
+    def size(self) -> int:
+        """Get the size of the memory range of the allocator"""
+        return self._size
+
+    @property
+    def block_size(self) -> int:
+        """Get the block size all region sizes are a multiple of"""
+        return self._block_size
+
+    @property
+    def alignment(self) -> int:
+        """Get the alignment of all regions"""
+        return self._alignment
+
+    @property
+    def allocation_policy(self) -> AllocationPolicy:
+        """Get the policy placing new regions"""
+        return self._allocation_policy
 
     @property
     def regions(self) -> list[MemoryRegion]:
-        """Get all regions currently in the allocator"""
-        return self._regions
+        """Get all regions currently in the allocator, deferred regions are merged first"""
+        self._coalesce()
+        return [self._regions.region(handle) for handle in self._regions]
+
+    def region_at(self, address: int) -> MemoryRegion:
+        """Get the region containing `address`
+
+        The regions are looked up in a sorted index of their start addresses, which is built on the first lookup and
+        kept up to date by all later operations. A region contains the addresses of its padding as well, empty regions
+        contain no address. Regions deferred by the deferred free mode are reported as part of the free region they are
+        merged into later, without merging them.
+
+        :param address: Address to look up
+        :type address: int
+        :raises UnknownRegionError: Raised if the address is outside the memory range of the allocator
+        :return: Free or allocated region containing the address
+        :rtype: MemoryRegion
+        """
+        regions = self._regions
+        handle = regions.floor(address)
+        if handle is not None:
+            start = regions.address(handle)
+            # Empty regions can share the start address with the region containing the address
+            while handle is not None and regions.address(handle) == start:
+                if address < start + regions.total_size(handle):
+                    if handle in self._deferred or regions.is_free(handle):
+                        return self._free_run(handle)[0]
+                    return regions.region(handle)
+                handle = regions.next(handle)
+        raise UnknownRegionError(f"No memory region at address {address:#x}")
+
+    def regions_in(self, start: int, end: int) -> list[MemoryRegion]:
+        """Get all regions overlapping the address range from `start` to `end`, excluding `end`
+
+        The first region is looked up like with :meth:`region_at`, the following regions are visited in address order.
+        Empty regions are included if their address is within the range. Deferred regions are reported like with
+        :meth:`region_at`.
+
+        :param start: Start address of the range
+        :type start: int
+        :param end: End address of the range, exclusive
+        :type end: int
+        :return: Free and allocated regions overlapping the range in address order
+        :rtype: list[MemoryRegion]
+        """
+        if end <= start:
+            return []
+
+        regions = self._regions
+        handle = regions.floor(start)
+        if handle is None:
+            handle = regions.first()
+        # Skip the regions at the same start address which end before the range
+        while handle is not None and regions.address(handle) + max(regions.total_size(handle), 1) <= start:
+            handle = regions.next(handle)
+
+        overlapping = []
+        while handle is not None and regions.address(handle) < end:
+            if handle in self._deferred or regions.is_free(handle):
+                free_region, handle = self._free_run(handle)
+                overlapping.append(free_region)
+            else:
+                overlapping.append(regions.region(handle))
+                handle = regions.next(handle)
+        return overlapping
+
+    def check_size(self, size: int) -> None:
+        """Check that `size` is a valid size for a memory region
+
+        :param size: Size of the memory region in bytes
+        :type size: int
+        :raises ValueError: Raised if the size is negative
+        :raises AlignmentError: Raised if the size is not a multiple of the block size
+        """
+        if size < 0:
+            raise ValueError(f"Invalid size {size}")
+
+        if size % self._block_size != 0:
+            raise AlignmentError(f"Size {size} is not a multiple of block size {self._block_size}")
+
+    def get_padding(self, size: int) -> int:
+        """Get the padding of a region of `size`, which aligns the end of the region to the alignment of the allocator
 
-    def allocate(self, size: int) -> MemoryRegion:
+        :param size: Size of the memory region in bytes
+        :type size: int
+        :return: Padding in bytes
+        :rtype: int
+        """
+        leftover = size % self._alignment
+        if leftover == 0:
+            return leftover
+        return self._alignment - leftover
+
+    def stats(self) -> AllocatorStats:
+        """Get a snapshot of the statistics of the allocator without modifying its regions
+
+        The free memory is tracked by the free region index of the best fit, TLSF and worst fit policies. For the first
+        and next fit policies the regions are scanned for it, which takes O(n) time. Regions deferred by the deferred
+        free mode count as free memory, but they are not merged for the statistics, so the largest free region does not
+        include them.
+
+        :return: Statistics of the allocator, the operation and scan statistics are only recorded if the allocator was
+                 created with `instrumented=True`
+        :rtype: AllocatorStats
+        """
+        regions = self._regions
+        if self._free_index is not None:
+            free_size = self._free_index.total_size
+            largest_free_size = self._free_index.largest()
+        else:
+            free_sizes = [regions.total_size(handle) for handle in regions if regions.is_free(handle)]
+            free_size = sum(free_sizes)
+            largest_free_size = max(free_sizes, default=0)
+        free_size += sum(regions.total_size(handle) for handle in self._deferred)
+        return AllocatorStats(
+            free_size,
+            largest_free_size,
+            {name: counters.snapshot() for name, counters in self._operations.items()},
+            Histogram() if self._scan_lengths is None else self._scan_lengths.snapshot(),
+        )
+
+    def validate(self) -> None:
+        """Check the invariants of the regions and of the indexes kept for them
+
+        The regions have to cover the memory range without gaps or overlaps and start at aligned addresses, adjacent
+        free regions have to be merged, free regions must not be padded and the padding of every allocated region has to
+        be the padding for its size.
+        Freeing an empty region between allocated regions leaves an empty free region, which is valid. The free region
+        index, the address indexes and the deferred regions have to match the regions. Takes two passes over the
+        regions, one of the region table for its links and address indexes and one for the other invariants.
+
+        :raises AssertionError: Raised with a description of the first violated invariant
+        """
+        regions = self._regions
+        regions.validate()
+        address = self._address
+        free_sizes: list[int] = []
+        previous_handle = None
+        for handle in regions:
+            region = regions.region(handle)
+            if region.address != address:
+                raise AssertionError(f"Region {region} does not start at the end {address:#x} of the previous region")
+            if (region.address - self._address) % self._alignment:
+                raise AssertionError(f"Region {region} is not aligned to {self._alignment}")
+            if region.size % self._block_size:
+                raise AssertionError(f"Size of region {region} is not a multiple of block size {self._block_size}")
+            if region.is_free:
+                if region.padding:
+                    raise AssertionError(f"Free region {region} is padded")
+                if previous_handle is not None and regions.is_free(previous_handle):
+                    raise AssertionError(f"Free region {region} is not merged with the previous free region")
+                if regions.alignment(handle):
+                    raise AssertionError(f"Free region {region} has a requested alignment")
+                free_sizes.append(region.size)
+            elif region.padding != self.get_padding(region.size):
+                raise AssertionError(f"Padding of region {region} does not align it to {self._alignment}")
+            elif regions.alignment(handle) and region.address % regions.alignment(handle):
+                raise AssertionError(f"Region {region} is not aligned to {regions.alignment(handle)}")
+            address += region.total_size
+            previous_handle = handle
+
+        if address != self._address + self._size:
+            raise AssertionError(f"Regions end at {address:#x} instead of {self._address + self._size:#x}")
+        free_index = self._free_index
+        if free_index is not None and (free_index.num_regions, free_index.total_size, free_index.largest()) != (
+            len(free_sizes),
+            sum(free_sizes),
+            max(free_sizes, default=0),
+        ):
+            raise AssertionError("Free region index does not match the free regions")
+        quick_list_handles = [handle for quick_list in self._quick_lists.values() for handle in quick_list]
+        if len(quick_list_handles) != len(self._deferred) or not self._deferred.issuperset(quick_list_handles):
+            raise AssertionError("Quick lists do not match the deferred regions")
+        if any(regions.is_free(handle) for handle in self._deferred):
+            raise AssertionError("Deferred region is free")
+
+    def allocate(self, size: int, alignment: int | None = None, hint: int | Placement | None = None) -> MemoryRegion:
         """Allocate memory of `size` in the range of the allocator
 
+        An `alignment` larger than the alignment of the allocator only applies to this region. The search skips free
+        regions without a suitably aligned address for the size, the memory in front of the aligned address stays free.
+        The padding of the region is still based on the alignment of the allocator, so small regions do not waste the
+        padding of the largest alignment. The region keeps the alignment when it grows with :meth:`resize` or moves with
+        :meth:`reallocate`.
+
+        A `hint` overrides the allocation policy for this region. With an address the region is placed at that address
+        if the memory there is free, otherwise the allocation policy places the region. With :attr:`Placement.LOW` or
+        :attr:`Placement.HIGH` the region is placed at the lowest or highest fitting address.
+
         :param size: Size of the memory region in bytes
         :type size: int
+        :param alignment: Alignment of the start address of the region, a multiple of the alignment of the allocator.
+                          Uses the alignment of the allocator if `None`.
+        :type alignment: int | None
+        :param hint: Preferred start address or placement of the region, `None` to place it by the allocation policy
+        :type hint: int | Placement | None
         :raises ValueError: Raised if an invalid size is passed in
+        :raises AlignmentError: Raised if the size is not a multiple of the block size, the alignment is not a multiple
+                                of the alignment of the allocator or the hinted address is not aligned
         :raises OutOfMemoryError: Raised if no fitting free memory region could be found
         :return: Allocated memory region
         :rtype: MemoryRegion
         """
-
-        if size < 0:
-            raise ValueError(f"Invalid size {size}")
-
-        free_region = self.find_free_memory_region(size)
-        free_region_idx = self._get_region_idx(free_region)
-
-        # Create the region with size 0 and insert it into the regions, use resize functionality to implement the
-        # resizing of the regions
-        allocated_region = MemoryRegion(free_region.address, size=0, is_free=False)
-        self._regions.insert(free_region_idx, allocated_region)
-        try:
-            return self.resize(allocated_region, size)
-        except AlignmentError:
-            # Alignment error during resize, remove the empty allocated region from the list of regions
-            self._regions.pop(free_region_idx)
-            raise
+        self.check_size(size)
+        if alignment is not None or hint is not None:
+            self._check_alignment(alignment, hint)
+            # Deferred regions in the quick lists are not placed by the alignment or the hint, they are not reused
+            return self._regions.region(self._allocate_placed(size, alignment, hint))
+        if self._deferred:
+            quick_list = self._quick_lists.get(size)
+            if quick_list:
+                # Reuse a deferred region of the same size as it is
+                handle = quick_list.pop()
+                self._deferred.remove(handle)
+                self._regions.set_alignment(handle, 0)
+                return self._regions.region(handle)
+        handle = self._find_free_handle_coalescing(size)
+        return self._regions.region(self._allocate_from(handle, size))
 
     def resize(self, region: MemoryRegion, size: int) -> MemoryRegion:
-        """Resize a memory region. The memory region can only be grown if no region is allocated after it.
+        """Resize a memory region in place. The memory region can only be grown into adjacent free memory.
+
+        The region is grown into the following free region first. Only if that is not sufficient, the region is grown
+        into the previous free region as well, which moves the start address of the region towards lower addresses. The
+        data of the region has to be moved accordingly in this case.
 
         :param region_id: ID of the region to resize
         :type region_id: RegionID
         :param size: New size of the region
         :type size: int
         """
-        if size < 0:
-            raise ValueError(f"Invalid size {size}")
+        return self._resize(region, size)
 
-        if size % self._block_size != 0:
-            raise AlignmentError(f"Size {size} is not a multiple of block size {self._block_size}")
+    def _resize(self, region: MemoryRegion, size: int) -> MemoryRegion:
+        """Resize a memory region in place, see :meth:`resize`"""
+        self.check_size(size)
+        handle = self._get_region_handle(region)
 
         if size == region.size:
             return region
         if size > region.size:
-            return self._increase_region_size(region, size)
-        return self._decrease_region_size(region, size)
+            try:
+                return self._increase_region_size(handle, size)
+            except OutOfMemoryError:
+                # A deferred neighbour can make room once it is merged
+                if not self._deferred:
+                    raise
+            self._coalesce()
+            return self._increase_region_size(handle, size)
+        return self._decrease_region_size(handle, size)
+
+    def reallocate(self, region: MemoryRegion, size: int) -> tuple[MemoryRegion, bool]:
+        """Resize a memory region, move it to another free memory region if it cannot be resized in place
+
+        The memory region is resized in place with :meth:`resize` if possible. Otherwise a free memory region for `size`
+        is allocated according to the allocation policy and the region is freed. The new region never overlaps the
+        previous region in this case.
+
+        :param region: Region to reallocate
+        :type region: MemoryRegion
+        :param size: New size of the region
+        :type size: int
+        :raises UnknownRegionError: Raised if the region does not exist in the allocator
+        :raises OutOfMemoryError: Raised if the region can neither be resized nor moved, the region is unchanged then
+        :return: 2-tuple of (reallocated region, whether the start address changed and the data has to be moved)
+        :rtype: tuple[MemoryRegion, bool]
+        """
+        try:
+            resized_region = self._resize(region, size)
+        except OutOfMemoryError:
+            pass
+        else:
+            return resized_region, resized_region.address != region.address
+
+        handle = self._get_region_handle(region)
+        alignment = self._regions.alignment(handle)
+        if alignment:
+            # The moved region keeps the alignment requested for it
+            new_handle = self._allocate_placed(size, alignment, None)
+        else:
+            new_handle = self._allocate_from(self._find_free_handle_coalescing(size), size)
+        self._free_handles([handle])
+        return self._regions.region(new_handle), True
+
+    def allocate_many(self, sizes: ty.Iterable[int]) -> list[MemoryRegion]:
+        """Allocate memory regions for multiple sizes at once
+
+        The regions are placed in the free regions as if :meth:`allocate` was called for each size in order. With the
+        first fit policy all regions are placed in a single pass over the regions. Either all regions get allocated or
+        none of them. In the deferred free mode the regions in the quick lists are not reused, unlike with
+        :meth:`allocate`, the deferred regions are only merged if the sizes do not fit into the free regions.
+
+        :param sizes: Sizes of the memory regions in bytes
+        :type sizes: ty.Iterable[int]
+        :raises ValueError: Raised if an invalid size is passed in
+        :raises AlignmentError: Raised if a size is not a multiple of the block size
+        :raises OutOfMemoryError: Raised if not all regions fit into the allocator, no region is allocated in this case
+        :return: Allocated memory regions in the order of the sizes
+        :rtype: list[MemoryRegion]
+        """
+        sizes = list(sizes)
+        for size in sizes:
+            self.check_size(size)
+
+        if self._allocation_policy == AllocationPolicy.FIRST_FIT:
+            try:
+                handles = self._allocate_many_first_fit(sizes)
+            except OutOfMemoryError:
+                # The planner does not modify the regions if the batch does not fit
+                if not self._deferred:
+                    raise
+                self._coalesce()
+                handles = self._allocate_many_first_fit(sizes)
+        else:
+            handles = []
+            try:
+                for size in sizes:
+                    handles.append(self._allocate_from(self._find_free_handle_coalescing(size), size))
+            except OutOfMemoryError:
+                # Free regions are always merged, freeing the allocated regions restores the previous state
+                self._free_handles(handles)
+                raise
+        return [self._regions.region(handle) for handle in handles]
+
+    def free_many(self, regions: ty.Iterable[MemoryRegion]) -> None:
+        """Free multiple memory regions at once
+
+        All regions are released first, adjacent free regions are merged afterwards, so each run of free regions is
+        only merged once. In the deferred free mode the regions are deferred like with :meth:`free`.
+
+        :param regions: Regions to free
+        :type regions: ty.Iterable[MemoryRegion]
+        :raises UnknownRegionError: Raised if a region does not exist in the allocator, no region is freed in this case
+        """
+        handles: dict[_Handle, None] = {}
+        for region in regions:
+            handle: _Handle | None = self._get_region_handle(region)
+            while handle is not None and (handle in handles or handle in self._deferred):
+                # Equal empty regions can be allocated multiple times, a repeated region frees the next equal region if
+                # there is one, like calling free() for each region
+                handle = self._regions.next(handle)
+                if handle is not None and self._regions.region(handle) != region:
+                    handle = None
+            if handle is not None:
+                handles[handle] = None
+
+        if self._max_deferred_frees:
+            for handle in handles:
+                if not self._regions.is_free(handle):
+                    self._defer_free(handle)
+            return
+        self._free_handles(list(handles))
 
     def free(self, region: MemoryRegion) -> None:
         """Free a memory region
 
-        If the surrounding memory regions are free as well, the regions will be merged
+        If the surrounding memory regions are free as well, the regions will be merged. In the deferred free mode the
+        region is kept in a quick list for allocations of the same size instead, see :meth:`coalesce`.
 
         :param region: Region to free
         :type region: MemoryRegion
         :raises UnknownRegionError: Raised if the region does not exist in the allocator
         """
-        region_idx = self._get_region_idx(region)
-        if region.is_free:
+        regions = self._regions
+        handle = self._get_region_handle(region)
+        if regions.is_free(handle):
+            return
+        if self._max_deferred_frees:
+            self._defer_free(handle)
             return
 
-        previous_region, next_region = self._get_surrounding_regions(region)
-        if previous_region and previous_region.is_free and next_region and next_region.is_free:
-            # The surrounding regions are not allocated, merge with both of them
-            self._regions[region_idx - 1] = dataclasses.replace(
-                previous_region, size=previous_region.size + region.total_size + next_region.size
-            )
-            self._regions.remove(region)
-            self._regions.remove(next_region)
-
-        elif previous_region and previous_region.is_free:
+        address = regions.address(handle)
+        size = regions.total_size(handle)
+        previous_handle = regions.prev(handle)
+        next_handle = regions.next(handle)
+        if previous_handle is not None and regions.is_free(previous_handle):
             # The previous region is not allocated, merge with previous region
-            self._regions[region_idx - 1] = dataclasses.replace(
-                previous_region, size=previous_region.size + region.total_size
-            )
-            self._regions.remove(region)
-
-        elif next_region and next_region.is_free:
+            address = regions.address(previous_handle)
+            size += regions.total_size(previous_handle)
+            self._remove(previous_handle)
+        if next_handle is not None and regions.is_free(next_handle):
             # The next region is not allocated, merge with next region
-            self._regions[region_idx] = dataclasses.replace(
-                region, is_free=True, size=region.total_size + next_region.size
-            )
-            self._regions.remove(next_region)
-        else:
-            # The surrounding regions are allocated, just free this region
-            self._regions[region_idx] = dataclasses.replace(region, size=region.total_size, padding=0, is_free=True)
+            size += regions.total_size(next_handle)
+            self._remove(next_handle)
+        self._update(handle, address, size, 0, True)
 
-    def _get_region_idx(self, region: MemoryRegion) -> int:
-        """Get the index of a region in the current region list"""
-        try:
-            return self._regions.index(region)
-        except ValueError:
-            raise UnknownRegionError(f"Memory region {region} is unknown")
+    def coalesce(self) -> None:
+        """Merge all regions deferred by the deferred free mode into the free regions
 
-    def _get_padding(self, size: int) -> int:
-        """Get the padding required for `size`"""
-        leftover = size % self._alignment
-        if leftover == 0:
-            return leftover
-        return self._alignment - leftover
+        Allocators created with `max_deferred_frees` keep freed regions allocated in quick lists per size, so
+        allocations of the same size reuse them without splitting and merging free regions. The deferred regions are
+        merged once `max_deferred_frees` regions are deferred, when an allocation does not fit otherwise, and before
+        the regions are inspected. Call this method to merge them at any other time, e.g. while the application is idle.
+        """
+        self._coalesce()
+
+    def compact(self) -> dict[int, int]:
+        """Move all allocated regions towards the start address of the allocator and merge the free memory
+
+        The allocated regions keep their order, size and padding. Regions allocated with a larger `alignment` than the
+        alignment of the allocator are moved to the next address with that alignment, the memory in front of them stays
+        free. Afterwards all other free memory is a single region at the end of the memory range. Empty regions sharing
+        the start address with other regions stay at the same address as them.
+
+        :return: Relocation map from the old to the new start address of every moved region, the data of the regions
+                 has to be moved accordingly. Regions are only moved towards lower addresses, so copying the data in
+                 ascending address order does not overwrite data which was not moved yet.
+        :rtype: dict[int, int]
+        """
+        self._coalesce()
+        regions = self._regions
+        for handle in [handle for handle in regions if regions.is_free(handle)]:
+            self._remove(handle)
+
+        relocations: dict[int, int] = {}
+        address = self._address
+        last_handle = None
+        handle = regions.first()
+        while handle is not None:
+            # Empty regions can share the start address with the following regions, all of them are moved to the same
+            # address, so the relocation map has a single entry for them
+            old_address = regions.address(handle)
+            group = [handle]
+            handle = regions.next(handle)
+            while handle is not None and regions.address(handle) == old_address:
+                group.append(handle)
+                handle = regions.next(handle)
+
+            gap = -address % math.lcm(*(regions.alignment(member) or 1 for member in group))
+            if gap:
+                self._insert_before(group[0], address, gap, 0, True)
+                address += gap
+            if old_address != address:
+                relocations[old_address] = address
+                for member in group:
+                    self._update(member, address, regions.size(member), regions.padding(member), False)
+            last_handle = group[-1]
+            address += regions.total_size(last_handle)
+
+        free_size = self._address + self._size - address
+        if free_size:
+            if last_handle is None:
+                self._insert_before(None, address, free_size, 0, True)
+            else:
+                self._insert_after(last_handle, address, free_size, 0, True)
+        return relocations
+
+    def snapshot(self, path: str | os.PathLike[str]) -> None:
+        """Write the state of the allocator to a file in a compact binary format
 
-    def _gen_free_regions(self, size: int) -> ty.Generator[MemoryRegion, None, None]:
-        """Return a generator that yields all free memory regions with the minimum size.
+        The file contains a fixed-size header with the configuration of the allocator followed by a fixed-size record
+        for each region. Use :meth:`restore` to create an allocator from the file.
+
+        :param path: Path of the snapshot file, an existing file is overwritten
+        :type path: str | os.PathLike[str]
+        """
+        self._coalesce()
+        regions = self._regions
+        pack_record = _SNAPSHOT_RECORDS[_SNAPSHOT_VERSION].pack
+        with open(path, "wb") as f:
+            f.write(
+                _SNAPSHOT_HEADER.pack(
+                    _SNAPSHOT_MAGIC,
+                    _SNAPSHOT_VERSION,
+                    self._allocation_policy.value,
+                    self._address,
+                    self._size,
+                    self._block_size,
+                    self._alignment,
+                    len(regions),
+                )
+            )
+            f.writelines(
+                pack_record(
+                    regions.size(handle),
+                    regions.padding(handle) << 1 | regions.is_free(handle),
+                    regions.alignment(handle),
+                )
+                for handle in regions
+            )
+
+    @classmethod
+    def restore(
+        cls, path: str | os.PathLike[str], region_storage: RegionStorage = RegionStorage.LINKED_LIST
+    ) -> Allocator:
+        """Create an allocator from a snapshot file written by :meth:`snapshot`
+
+        The file is memory-mapped and the region records are decoded one at a time straight into the region table, no
+        :class:`MemoryRegion` objects are created and the file is never read into memory as a whole. All records are
+        decoded before the allocator is returned, so later operations do not depend on the file.
+
+        :param path: Path of the snapshot file
+        :type path: str | os.PathLike[str]
+        :param region_storage: Storage backend for the regions of the restored allocator
+        :type region_storage: RegionStorage
+        :raises ValueError: Raised if the file is not a valid snapshot
+        :return: Allocator with the state of the snapshot
+        :rtype: Allocator
+        """
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < _SNAPSHOT_HEADER.size:
+                raise ValueError(f"{path} is not an allocator snapshot")
+            magic, version, policy, address, size, block_size, alignment, num_regions = _SNAPSHOT_HEADER.unpack_from(mm)
+            if magic != _SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not an allocator snapshot")
+            record = _SNAPSHOT_RECORDS.get(version)
+            if record is None:
+                raise ValueError(f"Unsupported snapshot version {version}")
+            if len(mm) != _SNAPSHOT_HEADER.size + num_regions * record.size:
+                raise ValueError(f"Snapshot {path} is truncated")
+
+            alloc = cls(address, size, block_size, alignment, AllocationPolicy(policy), region_storage)
+            # Replace the initial free region by the regions of the snapshot
+            alloc._remove(alloc._regions.first())
+            handle = None
+            region_address = address
+            with memoryview(mm) as records:
+                for region_size, flags, *region_alignment in record.iter_unpack(records[_SNAPSHOT_HEADER.size :]):
+                    padding = flags >> 1
+                    if handle is None:
+                        handle = alloc._insert_before(None, region_address, region_size, padding, bool(flags & 1))
+                    else:
+                        handle = alloc._insert_after(handle, region_address, region_size, padding, bool(flags & 1))
+                    if region_alignment and region_alignment[0]:
+                        alloc._regions.set_alignment(handle, region_alignment[0])
+                    region_address += region_size + padding
+            if region_address != address + size:
+                raise ValueError(f"Regions in snapshot {path} do not cover the memory range")
+        return alloc
+
+    def _instrument(self, name: str) -> None:
+        """Replace the public method `name` of this instance by a wrapper recording its calls"""
+        method = getattr(self, name)
+        counters = self._operations[name] = _OperationCounters()
+        record_latency = counters.latency_ns.add
+        perf_counter_ns = time.perf_counter_ns
+
+        @functools.wraps(method)
+        def instrumented(*args: ty.Any, **kwargs: ty.Any) -> ty.Any:
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            except OutOfMemoryError:
+                counters.out_of_memory_errors += 1
+                raise
+            finally:
+                record_latency(perf_counter_ns() - start)
+
+        setattr(self, name, instrumented)
+
+    def _check_alignment(self, alignment: int | None, hint: int | Placement | None) -> None:
+        """Check the alignment and the hinted address of an allocation
+
+        :raises AlignmentError: Raised if the alignment is not a multiple of the alignment of the allocator or the
+                                hinted address is not aligned
+        """
+        if alignment is not None:
+            if alignment <= 0 or alignment % self._alignment:
+                raise AlignmentError(f"Alignment {alignment} is not a multiple of alignment {self._alignment}")
+            # Otherwise the memory in front of an aligned address would not be a multiple of the allocator alignment
+            if self._address % self._alignment:
+                raise AlignmentError(f"Start address {self._address:#x} is not aligned to {self._alignment}")
+        if isinstance(hint, int) and (
+            (hint - self._address) % self._alignment or (alignment is not None and hint % alignment)
+        ):
+            raise AlignmentError(f"Address {hint:#x} is not aligned")
+
+    def _get_region_handle(self, region: MemoryRegion) -> _Handle:
+        """Get the handle of a region in the region list"""
+        handle = self._regions.find(region.address, region.size, region.padding, region.is_free)
+        while handle is not None and handle in self._deferred:
+            # Deferred regions count as freed, only equal empty regions can follow at the same address
+            handle = self._regions.next(handle)
+            if handle is not None and self._regions.region(handle) != region:
+                handle = None
+        if handle is None:
+            raise UnknownRegionError(f"Memory region {region} is unknown")
+        return handle
+
+    def _defer_free(self, handle: _Handle) -> None:
+        """Keep an allocated region in the quick list of its size instead of freeing it"""
+        self._deferred.add(handle)
+        self._quick_lists.setdefault(self._regions.size(handle), []).append(handle)
+        if len(self._deferred) >= self._max_deferred_frees:
+            self._coalesce()
+
+    def _coalesce(self) -> None:
+        """Free all deferred regions and merge them with the adjacent free regions"""
+        if not self._deferred:
+            return
+        handles = list(self._deferred)
+        self._deferred.clear()
+        self._quick_lists.clear()
+        self._free_handles(handles)
+
+    def _free_run(self, handle: _Handle) -> tuple[MemoryRegion, _Handle | None]:
+        """Get the free region a free or deferred region is part of once the deferred regions are merged
+
+        :param handle: Handle of a free or deferred region
+        :type handle: _Handle
+        :return: Free region spanning the run of adjacent free and deferred regions and the handle following the run
+        :rtype: tuple[MemoryRegion, _Handle | None]
+        """
+        regions = self._regions
+        first_handle = handle
+        previous_handle = regions.prev(first_handle)
+        while previous_handle is not None and (previous_handle in self._deferred or regions.is_free(previous_handle)):
+            first_handle = previous_handle
+            previous_handle = regions.prev(first_handle)
+
+        size = 0
+        current_handle: _Handle | None = first_handle
+        while current_handle is not None and (current_handle in self._deferred or regions.is_free(current_handle)):
+            size += regions.total_size(current_handle)
+            current_handle = regions.next(current_handle)
+        return MemoryRegion(regions.address(first_handle), size, True), current_handle
+
+    def _insert_before(self, handle: _Handle | None, address: int, size: int, padding: int, is_free: bool) -> _Handle:
+        """Insert a region into the region list and keep the free region index up to date"""
+        new_handle = self._regions.insert_before(handle, address, size, padding, is_free)
+        if is_free and self._free_index is not None:
+            self._free_index.add(address, size + padding)
+        return new_handle
+
+    def _insert_after(self, handle: _Handle, address: int, size: int, padding: int, is_free: bool) -> _Handle:
+        """Insert a region into the region list and keep the free region index up to date"""
+        new_handle = self._regions.insert_after(handle, address, size, padding, is_free)
+        if is_free and self._free_index is not None:
+            self._free_index.add(address, size + padding)
+        return new_handle
+
+    def _remove(self, handle: _Handle) -> None:
+        """Remove a region from the region list and keep the free region index up to date"""
+        regions = self._regions
+        if regions.is_free(handle) and self._free_index is not None:
+            self._free_index.remove(regions.address(handle), regions.total_size(handle))
+        if handle == self._cursor:
+            # Move the cursor to the previous region, which a merged region is merged into. The first region has no
+            # previous region, the cursor moves to the next region then
+            previous_handle = regions.prev(handle)
+            self._cursor = regions.next(handle) if previous_handle is None else previous_handle
+        regions.remove(handle)
+
+    def _update(self, handle: _Handle, address: int, size: int, padding: int, is_free: bool) -> None:
+        """Update a region in the region list and keep the free region index up to date"""
+        regions = self._regions
+        if self._free_index is not None:
+            if regions.is_free(handle):
+                self._free_index.remove(regions.address(handle), regions.total_size(handle))
+            if is_free:
+                self._free_index.add(address, size + padding)
+        regions.update(handle, address, size, padding, is_free)
+
+    def _gen_free_regions(self, size: int, start: _Handle | None = None) -> ty.Generator[_Handle, None, None]:
+        """Return a generator that yields the handles of all free memory regions with the minimum size.
 
         The minimum size is `size` plus the padding to align the following region according to the alignment configured
         for the allocator.
 
         :param size: Minimum Size of the Memory region
         :type size: int
+        :param start: Handle of the region to start at, the scan wraps around to the first region after the last region.
+                      Starts at the first region if `None`.
+        :type start: _Handle | None
         :return: Generator yielding all free regions
-        :rtype: ty.Generator[MemoryRegion, None, None]
-        :yield: Free memory region with matching the minimum size
-        :rtype: Iterator[ty.Generator[MemoryRegion, None, None]]
+        :rtype: ty.Generator[_Handle, None, None]
+        :yield: Handle of a free memory region with matching the minimum size
+        :rtype: Iterator[ty.Generator[_Handle, None, None]]
         """
 
-        padding = self._get_padding(size)
+        padding = self.get_padding(size)
         total_size = size + padding
-        for region in self._regions:
-            if region.is_free:
-                if region.total_size >= total_size:
-                    yield region
-
-    def _get_surrounding_regions(self, region: MemoryRegion) -> tuple[MemoryRegion | None, MemoryRegion | None]:
-        """Get a 2-tuple of the regions surrounding a memory region.
-
-        If the region is at the start or the end of the regions, the respective surrounding region will be set to `None`
+        regions = self._regions
+        handles = regions if start is None else regions.iter_from(start)
+        scan_lengths = self._scan_lengths
+        if scan_lengths is None:
+            for handle in handles:
+                if regions.is_free(handle) and regions.total_size(handle) >= total_size:
+                    yield handle
+            return
 
-        :param region: Region to get the surrounding regions of
-        :type region: MemoryRegion
-        :return: 2-tuple of (previous_region, next_region), if the region is at the start or the end of the regions,
-                 the respective surrounding region will be set to `None`
-        :rtype: tuple[MemoryRegion | None, MemoryRegion | None]
-        """
-        region_idx = self._get_region_idx(region)
+        scan_length = 0
         try:
-            next_region = self._regions[region_idx + 1]
-        except IndexError:
-            next_region = None
-        try:
-            if region_idx == 0:
-                raise IndexError()
-            previous_region = self._regions[region_idx - 1]
-        except IndexError:
-            previous_region = None
-        return previous_region, next_region
+            for handle in handles:
+                scan_length += 1
+                if regions.is_free(handle) and regions.total_size(handle) >= total_size:
+                    yield handle
+        finally:
+            # Also runs if the consumer closes the generator after the first match
+            scan_lengths.add(scan_length)
 
     def find_free_memory_region(self, size: int) -> MemoryRegion:
         """Find a free memory region according to the allocation policy
@@ -223,14 +1735,7 @@ class Allocator:
         :return: First free memory region that fits the required size
         :rtype: MemoryRegion
         """
-
-        # Find free space
-        if self._allocation_policy == AllocationPolicy.FIRST_FIT:
-            return self.find_first_free_memory_region(size)
-        elif self._allocation_policy == AllocationPolicy.BEST_FIT:
-            return self.find_best_free_memory_region(size)
-
-        raise ValueError(f"Invalid allocation policy: {self._allocation_policy}")  # pragma: no cover
+        return self._regions.region(self._find_free_handle(size))
 
     def find_first_free_memory_region(self, size: int) -> MemoryRegion:
         """Find the first free memory region that fits the required size
@@ -241,13 +1746,7 @@ class Allocator:
         :return: First free memory region that fits the required size
         :rtype: MemoryRegion
         """
-        gen = self._gen_free_regions(size=size)
-        try:
-            free_region = next(gen)
-            gen.close()
-            return free_region
-        except StopIteration:
-            raise OutOfMemoryError(f"No memory region for size {size} found")
+        return self._regions.region(self._find_first_free_handle(size))
 
     def find_best_free_memory_region(self, size: int) -> MemoryRegion:
         """Find the best free memory region that fits the required size
@@ -258,18 +1757,298 @@ class Allocator:
         :return: Best free memory region that fits the required size
         :rtype: MemoryRegion
         """
+        return self._regions.region(self._find_best_free_handle(size))
+
+    def _find_free_handle(self, size: int) -> _Handle:
+        """Find the handle of a free memory region according to the allocation policy"""
+        if self._allocation_policy == AllocationPolicy.FIRST_FIT:
+            return self._find_first_free_handle(size)
+        elif self._allocation_policy == AllocationPolicy.NEXT_FIT:
+            return self._find_next_free_handle(size)
+        elif self._allocation_policy in (AllocationPolicy.BEST_FIT, AllocationPolicy.TLSF, AllocationPolicy.WORST_FIT):
+            return self._find_indexed_free_handle(size)
+
+        raise ValueError(f"Invalid allocation policy: {self._allocation_policy}")  # pragma: no cover
 
-        fitting_regions = sorted(list(self._gen_free_regions(size=size)), key=lambda region: region.size)
+    def _find_free_handle_coalescing(self, size: int) -> _Handle:
+        """Find the handle of a free memory region, merge the deferred regions if no region fits the size"""
+        try:
+            return self._find_free_handle(size)
+        except OutOfMemoryError:
+            if not self._deferred:
+                raise
+        self._coalesce()
+        return self._find_free_handle(size)
+
+    def _find_first_free_handle(self, size: int) -> _Handle:
+        """Find the handle of the first free memory region that fits the required size"""
+        gen = self._gen_free_regions(size=size)
         try:
-            return fitting_regions[0]
-        except IndexError:
+            free_handle = next(gen)
+            gen.close()
+            return free_handle
+        except StopIteration:
+            raise OutOfMemoryError(f"No memory region for size {size} found")
+
+    def _find_next_free_handle(self, size: int) -> _Handle:
+        """Find the handle of the first free memory region that fits the required size after the cursor"""
+        gen = self._gen_free_regions(size=size, start=self._cursor)
+        try:
+            free_handle = next(gen)
+            gen.close()
+            return free_handle
+        except StopIteration:
+            raise OutOfMemoryError(f"No memory region for size {size} found")
+
+    def _find_best_free_handle(self, size: int) -> _Handle:
+        """Find the handle of the best free memory region that fits the required size"""
+        if self._allocation_policy == AllocationPolicy.BEST_FIT:
+            return self._find_indexed_free_handle(size)
+
+        regions = self._regions
+        try:
+            return min(self._gen_free_regions(size=size), key=regions.size)
+        except ValueError:
+            raise OutOfMemoryError(f"No memory region for size {size} found")
+
+    def _find_indexed_free_handle(self, size: int, gap: int = 0) -> _Handle:
+        """Find the handle of a free memory region that fits the required size in the free region index
+
+        `gap` is the memory required in addition to the size and its padding, e.g. to align the start address.
+        """
+        if self._free_index is None:
+            raise AssertionError(f"No free region index for allocation policy {self._allocation_policy}")
+
+        match = self._free_index.find(size + self.get_padding(size) + gap)
+        if match is None:
             raise OutOfMemoryError(f"No memory region for size {size} found")
+        address, total_size = match
+        handle = self._regions.find(address, total_size, 0, True)
+        if handle is None:
+            raise AssertionError(f"Free region at {address} with size {total_size} is not in the region list")
+        return handle
 
-    def _increase_region_size(self, region: MemoryRegion, size: int) -> MemoryRegion:
+    def _find_placement(self, size: int, alignment: int | None, hint: int | Placement | None) -> tuple[_Handle, int]:
+        """Find a free region and the start address in it for a region of `size`, see :meth:`allocate`
+
+        :raises OutOfMemoryError: Raised if no fitting free memory region could be found
+        :return: 2-tuple of (handle of the free region, start address of the region)
+        :rtype: tuple[_Handle, int]
+        """
+        if isinstance(hint, Placement):
+            return self._scan_placement(size, alignment, hint == Placement.HIGH)
+        if hint is not None:
+            placement = self._place_at(hint, size + self.get_padding(size))
+            if placement is not None:
+                return placement
+
+        if alignment is None:
+            handle = self._find_free_handle(size)
+            return handle, self._regions.address(handle)
+        if self._allocation_policy == AllocationPolicy.NEXT_FIT:
+            return self._scan_placement(size, alignment, False, self._cursor)
+        if self._free_index is not None:
+            # Any free region with room for the largest possible gap in front of the aligned address fits
+            try:
+                handle = self._find_indexed_free_handle(size, alignment - self._alignment)
+            except OutOfMemoryError:
+                # A smaller free region can still fit the size at an aligned address
+                pass
+            else:
+                address = self._place(handle, size + self.get_padding(size), alignment, False)
+                if address is None:
+                    raise AssertionError(f"Region {self._regions.region(handle)} does not fit size {size}")
+                return handle, address
+        return self._scan_placement(size, alignment, False)
+
+    def _scan_placement(
+        self, size: int, alignment: int | None, high: bool, start: _Handle | None = None
+    ) -> tuple[_Handle, int]:
+        """Scan the free regions in address order for the lowest or highest aligned address fitting `size`
+
+        :raises OutOfMemoryError: Raised if no fitting free memory region could be found
+        :return: 2-tuple of (handle of the free region, start address of the region)
+        :rtype: tuple[_Handle, int]
+        """
+        total_size = size + self.get_padding(size)
+        placement = None
+        gen = self._gen_free_regions(size=size, start=start)
+        try:
+            for handle in gen:
+                address = self._place(handle, total_size, alignment, high)
+                if address is not None:
+                    placement = handle, address
+                    if not high:
+                        break
+        finally:
+            gen.close()
+        if placement is None:
+            raise OutOfMemoryError(f"No memory region for size {size} found")
+        return placement
+
+    def _place(self, handle: _Handle, total_size: int, alignment: int | None, high: bool) -> int | None:
+        """Get the lowest or highest aligned address for `total_size` in the free region `handle`, `None` if none fits"""
+        regions = self._regions
+        start = regions.address(handle)
+        end = start + regions.total_size(handle)
+        if high:
+            # The end of the free region is not aligned if it is the end of the memory range
+            address = end - total_size
+            address -= (address - self._address) % self._alignment
+            if alignment is not None:
+                address -= address % alignment
+        else:
+            address = start if alignment is None else start + -start % alignment
+        return address if start <= address and address + total_size <= end else None
+
+    def _place_at(self, address: int, total_size: int) -> tuple[_Handle, int] | None:
+        """Get the free region containing the memory for `total_size` at `address`, `None` if it is not free"""
+        regions = self._regions
+        handle = regions.floor(address)
+        # Empty regions can share the start address with the region containing the address
+        while handle is not None and not regions.total_size(handle):
+            handle = regions.next(handle)
+        if (
+            handle is None
+            or not regions.is_free(handle)
+            or address + total_size > regions.address(handle) + regions.total_size(handle)
+        ):
+            return None
+        return handle, address
+
+    def _allocate_placed(self, size: int, alignment: int | None, hint: int | Placement | None) -> _Handle:
+        """Allocate a region of `size` with an alignment or a hint, merge the deferred regions if it does not fit"""
+        try:
+            handle, address = self._find_placement(size, alignment, hint)
+        except OutOfMemoryError:
+            if not self._deferred:
+                raise
+            self._coalesce()
+            handle, address = self._find_placement(size, alignment, hint)
+        allocated_handle = self._allocate_from(handle, size, address)
+        if alignment is not None and alignment != self._alignment:
+            # Keep the alignment, so compact() moves the region to an address with the same alignment
+            self._regions.set_alignment(allocated_handle, alignment)
+        return allocated_handle
+
+    def _allocate_from(self, handle: _Handle, size: int, address: int | None = None) -> _Handle:
+        """Allocate a region of `size` at `address` in the free region `handle`
+
+        :param handle: Handle of the free region to allocate from, it has to fit `size` including the padding
+        :type handle: _Handle
+        :param size: Size of the allocated region
+        :type size: int
+        :param address: Start address of the allocated region within the free region, the start of the free region if
+                        `None`
+        :type address: int | None
+        :return: Handle of the allocated region
+        :rtype: _Handle
+        """
+        regions = self._regions
+        padding = self.get_padding(size)
+        free_address = regions.address(handle)
+        free_size = regions.total_size(handle)
+        if address is None:
+            address = free_address
+        leading_size = address - free_address
+        trailing_size = free_size - leading_size - size - padding
+        if leading_size:
+            # The memory in front of the region stays free
+            self._update(handle, free_address, leading_size, 0, True)
+            allocated_handle = self._insert_after(handle, address, size, padding, False)
+            if trailing_size:
+                self._insert_after(allocated_handle, address + size + padding, trailing_size, 0, True)
+        elif trailing_size:
+            # Split the free region, the leftover memory stays free
+            allocated_handle = self._insert_before(handle, address, size, padding, False)
+            self._update(handle, address + size + padding, trailing_size, 0, True)
+        else:
+            # The allocation takes up the whole free region
+            self._update(handle, address, size, padding, False)
+            allocated_handle = handle
+        self._cursor = allocated_handle
+        return allocated_handle
+
+    def _allocate_many_first_fit(self, sizes: list[int]) -> list[_Handle]:
+        """Allocate regions for all `sizes` in a single pass over the regions
+
+        Free regions only shrink while a batch is allocated, so the regions can be visited in address order, placing
+        every pending size that fits into the leftover space of the current region. This results in the same placement
+        in the free regions as allocating the sizes one after another, deferred regions are skipped as allocated.
+
+        :raises OutOfMemoryError: Raised if not all sizes fit, the regions are not modified in this case
+        :return: Handles of the allocated regions in the order of `sizes`
+        :rtype: list[_Handle]
+        """
+        regions = self._regions
+        total_sizes = [size + self.get_padding(size) for size in sizes]
+        pending = list(range(len(sizes)))  # Indices of the sizes which are not placed yet
+        placements: list[tuple[_Handle, list[int]]] = []
+
+        # Plan the placement of all sizes before modifying any region
+        for handle in regions:
+            if not pending:
+                break
+            if not regions.is_free(handle):
+                continue
+            available_size = regions.total_size(handle)
+            is_consumed = False  # An allocation taking up the whole leftover space turns the free region allocated
+            placed: list[int] = []
+            unplaced: list[int] = []
+            for idx in pending:
+                if not is_consumed and total_sizes[idx] <= available_size:
+                    placed.append(idx)
+                    available_size -= total_sizes[idx]
+                    is_consumed = not available_size
+                else:
+                    unplaced.append(idx)
+            if placed:
+                placements.append((handle, placed))
+                pending = unplaced
+
+        if pending:
+            raise OutOfMemoryError(f"No memory region for size {sizes[pending[0]]} found")
+
+        handles: list[_Handle] = [None] * len(sizes)
+        for free_handle, placed in placements:
+            for idx in placed:
+                handles[idx] = self._allocate_from(free_handle, sizes[idx])
+        return handles
+
+    def _free_handles(self, handles: list[_Handle]) -> None:
+        """Free the regions of `handles` and merge each run of adjacent free regions once"""
+        regions = self._regions
+        pending = {handle for handle in handles if not regions.is_free(handle)}
+        for handle in sorted(pending, key=regions.address):
+            if handle not in pending:
+                # The region was merged into the run of a previous region
+                continue
+
+            # Free regions are merged, so only the direct predecessor can be a free region
+            first_handle = handle
+            previous_handle = regions.prev(handle)
+            if previous_handle is not None and regions.is_free(previous_handle):
+                first_handle = previous_handle
+
+            address = regions.address(first_handle)
+            size = 0
+            run: list[_Handle] = []
+            current_handle = first_handle
+            while current_handle is not None and (regions.is_free(current_handle) or current_handle in pending):
+                size += regions.total_size(current_handle)
+                pending.discard(current_handle)
+                run.append(current_handle)
+                current_handle = regions.next(current_handle)
+
+            for merged_handle in run[1:]:
+                self._remove(merged_handle)
+            self._update(first_handle, address, size, 0, True)
+
+    def _increase_region_size(self, handle: _Handle, size: int) -> MemoryRegion:
         """Increase the size of a region
 
-        :param region: Memory region to resize
-        :type region: MemoryRegion
+        :param handle: Handle of the memory region to resize
+        :type handle: _Handle
         :param size: New size of the region
         :type size: int
         :raises ValueError: Raised for sizes smaller than the current region size
@@ -277,76 +2056,85 @@ class Allocator:
         :return: Memory region with the increased size
         :rtype: MemoryRegion
         """
-        if size < region.size:
-            raise ValueError(f"Cannot increase region size of {region} to {size}")  # pragma: no cover
-
-        region_idx = self._get_region_idx(region)
-        _, next_region = self._get_surrounding_regions(region)
-        padding = self._get_padding(size)
-
-        if next_region and next_region.is_free and (region.total_size + next_region.total_size) >= (size + padding):
-            # We have space to resize the current region to the desired size
-            resized_region = dataclasses.replace(region, size=size, padding=padding)
-            self._regions[region_idx] = resized_region
-            # The allocated region was inserted before the free region,
-            # reduce the size of the following free region and remove it if the size is zero
-            new_free_region = MemoryRegion(
-                address=region.address + resized_region.total_size,
-                size=region.total_size + next_region.total_size - resized_region.total_size,
-                is_free=True,
-            )
+        regions = self._regions
+        if size < regions.size(handle):
+            raise ValueError(f"Cannot increase region size of {regions.region(handle)} to {size}")  # pragma: no cover
 
-            if new_free_region.total_size:
-                # Replace the previous region with one reduced in size
-                self._regions[region_idx + 1] = new_free_region
+        address = regions.address(handle)
+        padding = self.get_padding(size)
+        total_size = size + padding
+        end_address = address + regions.total_size(handle)
+        next_handle = regions.next(handle)
+        if next_handle is not None and regions.is_free(next_handle):
+            end_address += regions.total_size(next_handle)
+        else:
+            next_handle = None
+
+        if end_address - address < total_size:
+            # Grow into the free region in front of the region, only take as much memory as the aligned start address
+            # requires
+            new_address = address - (total_size - (end_address - address))
+            new_address -= (new_address - self._address) % self._alignment
+            requested_alignment = regions.alignment(handle)
+            if requested_alignment:
+                new_address -= new_address % requested_alignment
+            previous_handle = regions.prev(handle)
+            if (
+                previous_handle is None
+                or not regions.is_free(previous_handle)
+                or regions.address(previous_handle) > new_address
+            ):
+                raise OutOfMemoryError(f"Cannot resize {regions.region(handle)} to size {size}")
+
+            previous_address = regions.address(previous_handle)
+            if previous_address < new_address:
+                self._update(previous_handle, previous_address, new_address - previous_address, 0, True)
             else:
-                # The new free region would be empty, remove it from the list of regions
-                self._regions.pop(region_idx + 1)
-            return resized_region
-
-        raise OutOfMemoryError(f"Cannot resize {region} to size {size}")
+                self._remove(previous_handle)
+            address = new_address
+
+        # We have space to resize the current region to the desired size
+        self._update(handle, address, size, padding, regions.is_free(handle))
+        leftover_size = end_address - address - total_size
+        if next_handle is not None:
+            # Reduce the size of the following free region and remove it if the size is zero
+            if leftover_size:
+                self._update(next_handle, address + total_size, leftover_size, 0, True)
+            else:
+                self._remove(next_handle)
+        elif leftover_size:
+            # Memory taken from the previous region which is not required
+            self._insert_after(handle, address + total_size, leftover_size, 0, True)
+        return regions.region(handle)
 
-    def _decrease_region_size(self, region: MemoryRegion, size: int) -> MemoryRegion:
+    def _decrease_region_size(self, handle: _Handle, size: int) -> MemoryRegion:
         """Decrease the size of a memory region
 
-        :param region: Memory region to resize
-        :type region: MemoryRegion
+        :param handle: Handle of the memory region to resize
+        :type handle: _Handle
         :param size: New size of the region
         :type size: int
         :raises ValueError: Raised for sizes greater than the current region size
         :return: Memory region with the decreased size
         :rtype: MemoryRegion
         """
-
-        if size > region.size:
-            raise ValueError(f"Cannot reduce region size of {region} to {size}")  # pragma: no cover
-
-        region_idx = self._get_region_idx(region)
-        _, next_region = self._get_surrounding_regions(region)
-        padding = self._get_padding(size)
-
-        resized_region = dataclasses.replace(region, size=size, padding=padding)
-        self._regions[region_idx] = resized_region
-        if next_region and next_region.is_free:
+        regions = self._regions
+        if size > regions.size(handle):
+            raise ValueError(f"Cannot reduce region size of {regions.region(handle)} to {size}")  # pragma: no cover
+
+        address = regions.address(handle)
+        padding = self.get_padding(size)
+        released_size = regions.total_size(handle) - size - padding
+        self._update(handle, address, size, padding, regions.is_free(handle))
+        if not released_size:
+            return regions.region(handle)
+
+        free_address = address + size + padding
+        next_handle = regions.next(handle)
+        if next_handle is not None and regions.is_free(next_handle):
             # Move next free region
-
-            self._regions[region_idx + 1] = dataclasses.replace(
-                next_region,
-                address=resized_region.address + resized_region.total_size,
-                size=next_region.total_size + region.total_size - resized_region.total_size,
-            )
-
+            self._update(next_handle, free_address, regions.total_size(next_handle) + released_size, 0, True)
         else:
             # No next region, or next region is not free, insert a new region
-            free_region_address = resized_region.address + resized_region.total_size
-            if next_region:
-                # There is a next region and it is already allocated, calculate the size of a free memory range to be
-                # inserted
-                free_region_size = next_region.address - free_region_address
-            else:
-                # There is no next region, we are at the end of the total memory range
-                free_region_size = self._address + self._size - free_region_address
-            self._regions.insert(
-                region_idx + 1, MemoryRegion(address=free_region_address, size=free_region_size, is_free=True)
-            )
-        return resized_region
+            self._insert_after(handle, free_address, released_size, 0, True)
+        return regions.region(handle)
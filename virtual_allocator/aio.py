@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+
+from virtual_allocator import Allocator, MemoryRegion, OutOfMemoryError
+
+__all__ = ["AsyncAllocator"]
+
+
+class _Waiter:
+    """Allocation waiting for free memory"""
+
+    __slots__ = ("future", "retries", "size")
+
+    def __init__(self, size: int, future: asyncio.Future[MemoryRegion]) -> None:
+        self.size = size
+        self.future = future
+        self.retries = 0  # Number of times the allocation did not fit when memory was released
+
+
+class AsyncAllocator:
+    """Asyncio front-end for an allocator, which waits for free memory instead of raising :class:`OutOfMemoryError`
+
+    Allocations which do not fit are queued in order of arrival, new allocations are queued behind waiting allocations.
+    Whenever memory is released through :meth:`free` or :meth:`resize`, the queued allocations are retried in order. An
+    allocation which still does not fit stays queued without blocking the allocations behind it, so a large allocation
+    does not stall the queue until enough memory for it is released. Once an allocation did not fit for more than
+    `max_retries` releases, it blocks the allocations behind it until it is served, so it cannot starve. Allocations
+    larger than the memory range of the allocator can never be served and fail right away.
+
+    All regions have to be freed and resized through the front-end, otherwise waiters are not woken up.
+    """
+
+    def __init__(self, allocator: Allocator, max_retries: int = 8):
+        self._allocator = allocator
+        self._max_retries = max_retries
+        self._waiters: collections.deque[_Waiter] = collections.deque()
+
+    @property
+    def allocator(self) -> Allocator:
+        """Get the wrapped allocator"""
+        return self._allocator
+
+    @property
+    def num_waiters(self) -> int:
+        """Get the number of allocations waiting for free memory"""
+        return len(self._waiters)
+
+    async def allocate(self, size: int, timeout: float | None = None) -> MemoryRegion:
+        """Allocate memory of `size`, wait until enough memory is free if it does not fit
+
+        :param size: Size of the memory region in bytes
+        :type size: int
+        :param timeout: Maximum time to wait in seconds, wait without limit if `None`
+        :type timeout: float | None
+        :raises ValueError: Raised if an invalid size is passed in
+        :raises AlignmentError: Raised if the size is not a multiple of the block size
+        :raises OutOfMemoryError: Raised if the size exceeds the memory range of the allocator
+        :raises TimeoutError: Raised if the memory could not be allocated within `timeout`
+        :return: Allocated memory region
+        :rtype: MemoryRegion
+        """
+        self._allocator.check_size(size)
+        if size + self._allocator.get_padding(size) > self._allocator.size:
+            raise OutOfMemoryError(f"Size {size} exceeds the size {self._allocator.size} of the allocator")
+        if not self._waiters:
+            try:
+                return self._allocator.allocate(size)
+            except OutOfMemoryError:
+                pass
+
+        waiter = _Waiter(size, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        try:
+            async with asyncio.timeout(timeout):
+                return await waiter.future
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # The memory was allocated, but the caller is gone, release it again
+                self.free(waiter.future.result())
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def resize(self, region: MemoryRegion, size: int) -> MemoryRegion:
+        """Resize a memory region, waiting allocations are retried if the region shrinks
+
+        :param region: Region to resize
+        :type region: MemoryRegion
+        :param size: New size of the region
+        :type size: int
+        :raises UnknownRegionError: Raised if the region does not exist in the allocator
+        :raises OutOfMemoryError: Raised if the region cannot get resized
+        :return: Resized memory region
+        :rtype: MemoryRegion
+        """
+        resized_region = self._allocator.resize(region, size)
+        if resized_region.total_size < region.total_size:
+            self._wake_waiters()
+        return resized_region
+
+    def free(self, region: MemoryRegion) -> None:
+        """Free a memory region and retry waiting allocations
+
+        :param region: Region to free
+        :type region: MemoryRegion
+        :raises UnknownRegionError: Raised if the region does not exist in the allocator
+        """
+        self._allocator.free(region)
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        """Allocate memory for the waiting allocations in order, the ones which do not fit stay queued
+
+        The allocations behind an allocation which exceeded the maximum number of retries are not retried.
+        """
+        waiters: collections.deque[_Waiter] = collections.deque()
+        is_blocked = False
+        for waiter in self._waiters:
+            if waiter.future.done():
+                # Cancelled, the waiting task does not find itself in the queue once it runs
+                continue
+            if is_blocked:
+                waiters.append(waiter)
+                continue
+            try:
+                region = self._allocator.allocate(waiter.size)
+            except OutOfMemoryError:
+                waiter.retries += 1
+                is_blocked = waiter.retries > self._max_retries
+                waiters.append(waiter)
+                continue
+            waiter.future.set_result(region)
+        self._waiters = waiters
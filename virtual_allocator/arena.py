@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import types
+import typing as ty
+
+from virtual_allocator import (
+    AlignmentError,
+    AllocationPolicy,
+    Allocator,
+    MemoryRegion,
+    OutOfMemoryError,
+    UnknownRegionError,
+)
+
+__all__ = ["Arena"]
+
+
+class Arena:
+    """Region of a parent allocator from which regions with a common lifetime are sub-allocated
+
+    The arena takes one region of `size` from the parent, an :class:`Allocator` or another arena, and sub-allocates the
+    regions from it. Releasing the arena returns its region to the parent with a single free, no matter how many regions
+    were sub-allocated. Regions of the arena and of arenas nested in it must not be used afterwards.
+
+    Without an allocation policy the regions are placed by a bump pointer, allocating is O(1) and only the most recently
+    allocated region can be freed before the arena is released or reset. With an allocation policy the arena manages
+    its region with an :class:`Allocator`, so any region can be freed and its memory reused. The block size and
+    alignment are the ones of the root allocator.
+    """
+
+    def __init__(self, parent: Allocator | Arena, size: int, allocation_policy: AllocationPolicy | None = None):
+        self._parent = parent
+        self._block_size = parent.block_size
+        self._alignment = parent.alignment
+        self._region = parent.allocate(size)
+        # Incremented on every reset, nested arenas allocated before are released then
+        self._generation = 0
+        self._parent_generation = parent.generation if isinstance(parent, Arena) else 0
+        self._released = False
+        self._allocation_policy = allocation_policy
+        self._allocator: Allocator | None = None
+        self._top = self._region.address
+        self._live_regions: list[MemoryRegion] = []  # Regions allocated by the bump pointer in order
+        self.reset()
+
+    def __enter__(self) -> ty.Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: types.TracebackType | None,
+    ) -> None:
+        if not self.is_released:
+            self.release()
+
+    @property
+    def parent(self) -> Allocator | Arena:
+        """Get the allocator or arena the region of the arena was allocated from"""
+        return self._parent
+
+    @property
+    def region(self) -> MemoryRegion:
+        """Get the region of the arena in the parent"""
+        return self._region
+
+    @property
+    def block_size(self) -> int:
+        """Get the block size all region sizes are a multiple of"""
+        return self._block_size
+
+    @property
+    def alignment(self) -> int:
+        """Get the alignment of all regions"""
+        return self._alignment
+
+    @property
+    def generation(self) -> int:
+        """Get the number of resets of the arena, nested arenas allocated in earlier generations are released"""
+        return self._generation
+
+    @property
+    def is_released(self) -> bool:
+        """Whether the arena, or an arena it is nested in, was released or reset"""
+        if self._released:
+            return True
+        parent = self._parent
+        return isinstance(parent, Arena) and (parent.generation != self._parent_generation or parent.is_released)
+
+    @property
+    def used_size(self) -> int:
+        """Get the memory of the arena allocated to regions, including their padding"""
+        self._check_live()
+        if self._allocator is not None:
+            return self._region.size - self._allocator.stats().free_size
+        return self._top - self._region.address
+
+    def allocate(self, size: int) -> MemoryRegion:
+        """Allocate memory of `size` in the arena
+
+        :param size: Size of the memory region in bytes
+        :type size: int
+        :raises ValueError: Raised if an invalid size is passed in or the arena is released
+        :raises AlignmentError: Raised if the size is not a multiple of the block size
+        :raises OutOfMemoryError: Raised if the arena has no room for the region
+        :return: Allocated memory region
+        :rtype: MemoryRegion
+        """
+        self._check_live()
+        if self._allocator is not None:
+            return self._allocator.allocate(size)
+
+        if size < 0:
+            raise ValueError(f"Invalid size {size}")
+        if size % self._block_size != 0:
+            raise AlignmentError(f"Size {size} is not a multiple of block size {self._block_size}")
+        padding = -size % self._alignment
+        address = self._top
+        if address + size + padding > self._region.address + self._region.size:
+            raise OutOfMemoryError(f"No room for size {size} in arena at {self._region.address:#x}")
+        self._top = address + size + padding
+        region = MemoryRegion(address, size, False, padding)
+        self._live_regions.append(region)
+        return region
+
+    def free(self, region: MemoryRegion) -> None:
+        """Free a region of the arena
+
+        With a bump pointer only the most recently allocated region which is not freed yet can be freed, the other
+        regions are freed when the arena is released or reset.
+
+        :param region: Region to free
+        :type region: MemoryRegion
+        :raises ValueError: Raised if the arena is released
+        :raises UnknownRegionError: Raised if the region was not allocated from the arena, is freed already or is not the
+                                    most recently allocated region of a bump pointer arena
+        """
+        self._check_live()
+        if self._allocator is not None:
+            self._allocator.free(region)
+            return
+
+        if not self._live_regions or self._live_regions[-1] != region:
+            raise UnknownRegionError(f"Memory region {region} is not the most recently allocated region of the arena")
+        self._live_regions.pop()
+        self._top = region.address
+
+    def reset(self) -> None:
+        """Free all regions of the arena at once and keep its region for new regions
+
+        Arenas nested in this arena are released.
+
+        :raises ValueError: Raised if the arena is released
+        """
+        self._check_live()
+        self._generation += 1
+        self._top = self._region.address
+        self._live_regions.clear()
+        if self._allocation_policy is not None:
+            self._allocator = Allocator(
+                self._region.address, self._region.size, self._block_size, self._alignment, self._allocation_policy
+            )
+
+    def release(self) -> None:
+        """Free all regions of the arena at once and return the region of the arena to the parent
+
+        Arenas nested in this arena are released as well.
+
+        :raises ValueError: Raised if the arena is released
+        """
+        self._check_live()
+        self._released = True
+        self._allocator = None
+        self._parent.free(self._region)
+
+    def _check_live(self) -> None:
+        """Check that the arena is not released
+
+        :raises ValueError: Raised if the arena is released
+        """
+        if self.is_released:
+            raise ValueError(f"Arena at {self._region.address:#x} is released")
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import heapq
+import typing as ty
+
+from virtual_allocator import AlignmentError, MemoryRegion, OutOfMemoryError, UnknownRegionError
+
+__all__ = ["BuddyAllocator"]
+
+
+class _FreeBlocks:
+    """Free blocks of one order, yields the block with the lowest index first
+
+    Removed blocks are only dropped from the set, their heap entries are skipped lazily.
+    """
+
+    def __init__(self) -> None:
+        self._blocks: set[int] = set()
+        self._heap: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def __contains__(self, block: int) -> bool:
+        return block in self._blocks
+
+    def __iter__(self) -> ty.Iterator[int]:
+        return iter(self._blocks)
+
+    def add(self, block: int) -> None:
+        self._blocks.add(block)
+        heapq.heappush(self._heap, block)
+        if len(self._heap) > 2 * len(self._blocks) + 16:
+            # Drop the entries of removed blocks
+            self._heap = sorted(self._blocks)
+
+    def remove(self, block: int) -> None:
+        self._blocks.remove(block)
+
+    def pop(self) -> int:
+        while True:
+            block = heapq.heappop(self._heap)
+            if block in self._blocks:
+                self._blocks.remove(block)
+                return block
+
+
+class BuddyAllocator:
+    """Buddy allocator
+
+    The memory range is split into blocks with a power of two multiple of the block size. Allocations are rounded up to
+    the next block, blocks are split in halves until they fit the allocation. When a block is freed, it is merged with
+    its buddy, the other half of the block it was split from, as long as the buddy is free. Allocate, resize and free
+    take O(log n) time for a memory range of n blocks.
+
+    The rounding up of the allocations is reported as the padding of the allocated regions.
+    """
+
+    def __init__(self, address: int, size: int, block_size: int):
+        if size % block_size != 0:
+            raise AlignmentError(f"Size {size} is not a multiple of block size {block_size}")
+
+        self._address = address
+        self._size = size
+        self._block_size = block_size
+
+        num_blocks = size // block_size
+        self._max_order = max(num_blocks.bit_length() - 1, 0)
+        self._free: list[_FreeBlocks] = [_FreeBlocks() for _ in range(self._max_order + 1)]
+        self._allocated: dict[int, tuple[int, int]] = {}  # Index of the first block to (order, size) of allocations
+
+        # Split the memory range into the largest possible blocks. The larger blocks come first, so every block index is
+        # a multiple of the block count and buddies are found by flipping the bit of the order in the index.
+        block = 0
+        for order in reversed(range(self._max_order + 1)):
+            if num_blocks & (1 << order):
+                self._free[order].add(block)
+                block += 1 << order
+
+    @property
+    def regions(self) -> list[MemoryRegion]:
+        """Get all regions currently in the allocator"""
+        regions = [
+            MemoryRegion(self._block_address(block), self._block_size << order, is_free=True)
+            for order, free_blocks in enumerate(self._free)
+            for block in free_blocks
+        ]
+        regions.extend(self._region(block, order, size) for block, (order, size) in self._allocated.items())
+        regions.sort(key=lambda region: region.address)
+        return regions
+
+    def allocate(self, size: int) -> MemoryRegion:
+        """Allocate memory of `size` in the range of the allocator
+
+        :param size: Size of the memory region in bytes
+        :type size: int
+        :raises ValueError: Raised if an invalid size is passed in
+        :raises AlignmentError: Raised if the size is not a multiple of the block size
+        :raises OutOfMemoryError: Raised if no fitting free block could be found
+        :return: Allocated memory region
+        :rtype: MemoryRegion
+        """
+        order = self._get_order(size)
+        free_order = order
+        while free_order <= self._max_order and not self._free[free_order]:
+            free_order += 1
+        if free_order > self._max_order:
+            raise OutOfMemoryError(f"No memory region for size {size} found")
+
+        block = self._free[free_order].pop()
+        # Split the block until it has the required order, the upper halves stay free
+        while free_order > order:
+            free_order -= 1
+            self._free[free_order].add(block + (1 << free_order))
+
+        self._allocated[block] = (order, size)
+        return self._region(block, order, size)
+
+    def resize(self, region: MemoryRegion, size: int) -> MemoryRegion:
+        """Resize a memory region. The memory region can only be grown if its buddies are free.
+
+        :param region: Region to resize
+        :type region: MemoryRegion
+        :param size: New size of the region
+        :type size: int
+        :raises UnknownRegionError: Raised if the region does not exist in the allocator
+        :raises OutOfMemoryError: Raised if the region cannot get resized
+        :return: Resized memory region
+        :rtype: MemoryRegion
+        """
+        new_order = self._get_order(size)
+        block = self._get_block(region)
+        order, _ = self._allocated[block]
+
+        if new_order < order:
+            # Release the upper halves of the block, their buddies are the retained lower halves, which are allocated
+            for free_order in range(new_order, order):
+                self._free[free_order].add(block + (1 << free_order))
+        elif new_order > order:
+            # The block can only grow if it is the lower half of each block up to the new order and the upper halves
+            # are free
+            for grow_order in range(order, new_order):
+                if block & (1 << grow_order) or block + (1 << grow_order) not in self._free[grow_order]:
+                    raise OutOfMemoryError(f"Cannot resize {region} to size {size}")
+            for grow_order in range(order, new_order):
+                self._free[grow_order].remove(block + (1 << grow_order))
+
+        self._allocated[block] = (new_order, size)
+        return self._region(block, new_order, size)
+
+    def free(self, region: MemoryRegion) -> None:
+        """Free a memory region
+
+        The block of the region is merged with its buddies as long as they are free
+
+        :param region: Region to free
+        :type region: MemoryRegion
+        :raises UnknownRegionError: Raised if the region does not exist in the allocator
+        """
+        if region.is_free:
+            block, remainder = divmod(region.address - self._address, self._block_size)
+            order = (region.size // self._block_size).bit_length() - 1
+            if (
+                remainder
+                or not 0 <= order <= self._max_order
+                or region.size != self._block_size << order
+                or block not in self._free[order]
+            ):
+                raise UnknownRegionError(f"Memory region {region} is unknown")
+            return
+
+        block = self._get_block(region)
+        order, _ = self._allocated.pop(block)
+        while order < self._max_order:
+            buddy = block ^ (1 << order)
+            if buddy not in self._free[order]:
+                break
+            self._free[order].remove(buddy)
+            block = min(block, buddy)
+            order += 1
+        self._free[order].add(block)
+
+    def _get_order(self, size: int) -> int:
+        """Get the order of the smallest block fitting `size`
+
+        :raises ValueError: Raised if the size is negative
+        :raises AlignmentError: Raised if the size is not a multiple of the block size
+        """
+        if size < 0:
+            raise ValueError(f"Invalid size {size}")
+
+        num_blocks, remainder = divmod(size, self._block_size)
+        if remainder:
+            raise AlignmentError(f"Size {size} is not a multiple of block size {self._block_size}")
+        return max(num_blocks - 1, 0).bit_length()
+
+    def _get_block(self, region: MemoryRegion) -> int:
+        """Get the index of the first block of an allocated region"""
+        block, remainder = divmod(region.address - self._address, self._block_size)
+        allocation = self._allocated.get(block)
+        if remainder or allocation is None or self._region(block, *allocation) != region:
+            raise UnknownRegionError(f"Memory region {region} is unknown")
+        return block
+
+    def _block_address(self, block: int) -> int:
+        return self._address + block * self._block_size
+
+    def _region(self, block: int, order: int, size: int) -> MemoryRegion:
+        """Create the memory region of an allocated block"""
+        return MemoryRegion(self._block_address(block), size, is_free=False, padding=(self._block_size << order) - size)
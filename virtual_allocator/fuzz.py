@@ -0,0 +1,390 @@
+"""Differential fuzzing of allocators against a reference model
+
+Run ``python -m virtual_allocator.fuzz --help`` for the command line interface.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import functools
+import random
+import sys
+import typing as ty
+
+from virtual_allocator import (
+    AlignmentError,
+    AllocationPolicy,
+    Allocator,
+    MemoryRegion,
+    OutOfMemoryError,
+    RegionStorage,
+    UnknownRegionError,
+)
+
+__all__ = ["Divergence", "FuzzReport", "fuzz"]
+
+_REFERENCE = "reference"  # Name of the reference allocator
+
+
+class _FuzzTarget(ty.Protocol):
+    """Allocator which can be fuzzed against the reference allocator"""
+
+    @property
+    def regions(self) -> list[MemoryRegion]: ...
+
+    def allocate(self, size: int) -> MemoryRegion: ...
+
+    def resize(self, region: MemoryRegion, size: int) -> MemoryRegion: ...
+
+    def free(self, region: MemoryRegion) -> None: ...
+
+
+# Creates an allocator from (address, size, block size, alignment, allocation policy)
+_Factory: ty.TypeAlias = ty.Callable[[int, int, int, int, AllocationPolicy], _FuzzTarget]
+
+
+class _ReferenceModel:
+    """Naive model of the allocator the fuzzed allocators are compared to
+
+    The regions are a plain list in address order which is scanned on every call, no code is shared with
+    :class:`Allocator`. Bugs common to all region storages of the allocator therefore show up as divergences. The model
+    places regions by the first, best and worst fit policies, ties are broken by the lowest address.
+    """
+
+    POLICIES = (AllocationPolicy.FIRST_FIT, AllocationPolicy.BEST_FIT, AllocationPolicy.WORST_FIT)
+
+    def __init__(self, address: int, size: int, block_size: int, alignment: int, allocation_policy: AllocationPolicy):
+        if allocation_policy not in self.POLICIES:
+            raise ValueError(f"Allocation policy {allocation_policy.name} is not modelled")
+        self._block_size = block_size
+        self._alignment = alignment
+        self._allocation_policy = allocation_policy
+        self._regions = [MemoryRegion(address, size, True)]
+
+    @property
+    def regions(self) -> list[MemoryRegion]:
+        return list(self._regions)
+
+    def allocate(self, size: int) -> MemoryRegion:
+        self._check_size(size)
+        padding = -size % self._alignment
+        regions = self._regions
+        fitting = [idx for idx, region in enumerate(regions) if region.is_free and region.total_size >= size + padding]
+        if not fitting:
+            raise OutOfMemoryError(f"No memory region for size {size} found")
+        if self._allocation_policy == AllocationPolicy.FIRST_FIT:
+            idx = fitting[0]
+        elif self._allocation_policy == AllocationPolicy.BEST_FIT:
+            idx = min(fitting, key=lambda idx: regions[idx].total_size)
+        else:
+            idx = max(fitting, key=lambda idx: regions[idx].total_size)
+
+        free_region = regions[idx]
+        region = MemoryRegion(free_region.address, size, False, padding)
+        regions[idx] = region
+        leftover_size = free_region.total_size - region.total_size
+        if leftover_size:
+            regions.insert(idx + 1, MemoryRegion(region.address + region.total_size, leftover_size, True))
+        return region
+
+    def resize(self, region: MemoryRegion, size: int) -> MemoryRegion:
+        self._check_size(size)
+        idx = self._index(region)
+        if size == region.size:
+            return region
+        regions = self._regions
+        resized = MemoryRegion(region.address, size, region.is_free, -size % self._alignment)
+        if size < region.size:
+            # Shrinking returns the released memory to the following free region, if the padding takes up the released
+            # memory the regions around the region stay as they are
+            regions[idx] = resized
+            released_size = region.total_size - resized.total_size
+            following = regions[idx + 1] if idx + 1 < len(regions) else None
+            if released_size and following is not None and following.is_free:
+                regions[idx + 1] = MemoryRegion(
+                    following.address - released_size, following.total_size + released_size, True
+                )
+            elif released_size:
+                regions.insert(idx + 1, MemoryRegion(resized.address + resized.total_size, released_size, True))
+            return resized
+
+        # Replace the regions from start to end by the grown region and the free memory around it
+        start, end = idx, idx + 1
+        available_size = region.total_size
+        if end < len(regions) and regions[end].is_free:
+            available_size += regions[end].total_size
+            end += 1
+        replacement = []
+        if available_size < resized.total_size:
+            # Take the missing memory rounded up to the alignment from the previous free region
+            shortfall = resized.total_size - available_size
+            previous_region = regions[idx - 1] if idx else None
+            if previous_region is None or not previous_region.is_free or previous_region.total_size < shortfall:
+                raise OutOfMemoryError(f"Cannot resize {region} to size {size}")
+            taken_size = min(-(-shortfall // self._alignment) * self._alignment, previous_region.total_size)
+            if taken_size < previous_region.total_size:
+                replacement.append(MemoryRegion(previous_region.address, previous_region.total_size - taken_size, True))
+            resized = dataclasses.replace(resized, address=region.address - taken_size)
+            available_size += taken_size
+            start -= 1
+        replacement.append(resized)
+        if available_size > resized.total_size:
+            replacement.append(
+                MemoryRegion(resized.address + resized.total_size, available_size - resized.total_size, True)
+            )
+        regions[start:end] = replacement
+        return resized
+
+    def free(self, region: MemoryRegion) -> None:
+        idx = self._index(region)
+        if region.is_free:
+            return
+        regions = self._regions
+        start, end = idx, idx + 1
+        if start > 0 and regions[start - 1].is_free:
+            start -= 1
+        if end < len(regions) and regions[end].is_free:
+            end += 1
+        size = sum(merged.total_size for merged in regions[start:end])
+        regions[start:end] = [MemoryRegion(regions[start].address, size, True)]
+
+    def _check_size(self, size: int) -> None:
+        if size < 0:
+            raise ValueError(f"Invalid size {size}")
+        if size % self._block_size:
+            raise AlignmentError(f"Size {size} is not a multiple of block size {self._block_size}")
+
+    def _index(self, region: MemoryRegion) -> int:
+        """Get the index of the first region equal to `region`"""
+        for idx, candidate in enumerate(self._regions):
+            if candidate == region:
+                return idx
+        raise UnknownRegionError(f"Memory region {region} is unknown")
+
+
+@dataclasses.dataclass(frozen=True)
+class Divergence:
+    """First point where an allocator diverged from the reference allocator"""
+
+    operation: int  # Number of the operation after which the divergence was found, starting at 1
+    call: str  # Diverging call, "regions" or "validate" for the periodic checks
+    backend: str  # Name of the diverging allocator, "reference" if the reference failed
+    expected: str  # Result of the reference
+    actual: str  # Result of the diverging allocator
+
+
+@dataclasses.dataclass(frozen=True)
+class FuzzReport:
+    """Result of a fuzzing run"""
+
+    operations: int  # Number of operations run, up to and including a divergence
+    out_of_memory_errors: int  # Number of operations which raised OutOfMemoryError
+    peak_live_regions: int  # Highest number of allocated regions during the run
+    divergence: Divergence | None  # First divergence, `None` if all allocators behaved like the reference
+
+
+def _call(method: ty.Callable[[], MemoryRegion | None]) -> tuple[MemoryRegion | None, str]:
+    """Run a call and return its result and a description of it
+
+    The errors raised by allocators for invalid calls are described by their type, any other exception is a bug and
+    is raised.
+    """
+    try:
+        result = method()
+    except (OutOfMemoryError, UnknownRegionError, ValueError) as exc:
+        return None, type(exc).__name__
+    return result, repr(result)
+
+
+def _validate(allocator: _FuzzTarget) -> str:
+    """Validate an allocator if it has a `validate` method, return the violated invariant or "valid" """
+    validate = getattr(allocator, "validate", None)
+    if validate is not None:
+        try:
+            validate()
+        except AssertionError as exc:
+            return str(exc)
+    return "valid"
+
+
+def _check(operation: int, allocators: dict[str, _FuzzTarget]) -> Divergence | None:
+    """Validate all allocators and compare their regions to the regions of the reference"""
+    for name, allocator in allocators.items():
+        invariant = _validate(allocator)
+        if invariant != "valid":
+            return Divergence(operation, "validate", name, "valid", invariant)
+
+    expected = allocators[_REFERENCE].regions
+    for name, allocator in allocators.items():
+        actual = allocator.regions
+        if actual != expected:
+            # Report the first differing region instead of all regions
+            idx = next(
+                (idx for idx, (a, b) in enumerate(zip(expected, actual)) if a != b), min(len(expected), len(actual))
+            )
+            return Divergence(
+                operation,
+                "regions",
+                name,
+                repr(expected[idx]) if idx < len(expected) else "end of regions",
+                repr(actual[idx]) if idx < len(actual) else "end of regions",
+            )
+    return None
+
+
+def fuzz(
+    num_operations: int,
+    allocation_policy: AllocationPolicy = AllocationPolicy.FIRST_FIT,
+    backends: ty.Mapping[str, _Factory] | None = None,
+    seed: int = 0,
+    size: int = 1 << 24,
+    block_size: int = 16,
+    alignment: int = 64,
+    max_live_regions: int = 1_000,
+    check_interval: int = 1_000,
+) -> FuzzReport:
+    """Run random allocate, resize and free operations against a reference and the allocators to test
+
+    The reference is a naive model of the allocator for the first, best and worst fit policies. The model cannot
+    predict the placement of the other policies, for them the reference is an :class:`Allocator` with the linked list
+    region storage. Every operation is run on all allocators and has to give the same result. Every `check_interval`
+    operations and after the last operation, all allocators with a `validate` method are validated and their regions
+    are compared. The run stops at the first divergence.
+
+    The sizes follow a power law and some of them are empty. The number of allocated regions grows up to
+    `max_live_regions`, which sets the number of regions of the heap the operations run on.
+
+    :param num_operations: Number of operations to run
+    :type num_operations: int
+    :param allocation_policy: Allocation policy of all allocators
+    :type allocation_policy: AllocationPolicy
+    :param backends: Factories of the allocators to test by name, called with (address, size, block size, alignment,
+                     allocation policy). An :class:`Allocator` with each region storage if `None`.
+    :type backends: ty.Mapping[str, _Factory] | None
+    :param seed: Seed of the operations, the same seed runs the same operations
+    :type seed: int
+    :param size: Size of the memory range of the allocators
+    :type size: int
+    :param block_size: Block size of the allocators
+    :type block_size: int
+    :param alignment: Alignment of the allocators
+    :type alignment: int
+    :param max_live_regions: Maximum number of allocated regions
+    :type max_live_regions: int
+    :param check_interval: Number of operations between the validations and comparisons of the regions
+    :type check_interval: int
+    :return: Report of the run including the first divergence
+    :rtype: FuzzReport
+    """
+    if backends is None:
+        backends = {
+            storage.name.lower(): functools.partial(Allocator, region_storage=storage) for storage in RegionStorage
+        }
+    allocators: dict[str, _FuzzTarget] = {
+        _REFERENCE: (
+            _ReferenceModel(0, size, block_size, alignment, allocation_policy)
+            if allocation_policy in _ReferenceModel.POLICIES
+            else Allocator(0, size, block_size, alignment, allocation_policy)
+        )
+    }
+    for name, factory in backends.items():
+        allocators[name] = factory(0, size, block_size, alignment, allocation_policy)
+
+    rng = random.Random(seed)
+    max_units = max(size // block_size // 64, 1)
+    live: list[MemoryRegion] = []  # Allocated regions, equal in all allocators as long as they do not diverge
+    out_of_memory_errors = 0
+    peak_live_regions = 0
+
+    def random_size() -> int:
+        if rng.random() < 0.01:
+            return 0
+        return min(int(rng.paretovariate(1.0)), max_units) * block_size
+
+    for operation in range(1, num_operations + 1):
+        choice = rng.random()
+        idx = rng.randrange(len(live)) if live else -1
+        calls: dict[str, ty.Callable[[], MemoryRegion | None]]
+        if idx < 0 or (choice < 0.5 and len(live) < max_live_regions):
+            new_size = random_size()
+            call = f"allocate({new_size})"
+            calls = {name: functools.partial(allocator.allocate, new_size) for name, allocator in allocators.items()}
+        elif choice < 0.8 or len(live) >= max_live_regions:
+            call = f"free({live[idx]})"
+            calls = {name: functools.partial(allocator.free, live[idx]) for name, allocator in allocators.items()}
+        else:
+            new_size = random_size()
+            call = f"resize({live[idx]}, {new_size})"
+            calls = {
+                name: functools.partial(allocator.resize, live[idx], new_size) for name, allocator in allocators.items()
+            }
+
+        result, expected = _call(calls.pop(_REFERENCE))
+        divergence = None
+        if expected == "OutOfMemoryError":
+            out_of_memory_errors += 1
+        elif result is None and expected != "None":
+            divergence = Divergence(operation, call, _REFERENCE, "no exception", expected)
+        for name, method in calls.items():
+            actual = _call(method)[1]
+            if divergence is None and actual != expected:
+                divergence = Divergence(operation, call, name, expected, actual)
+        if divergence is not None:
+            return FuzzReport(operation, out_of_memory_errors, peak_live_regions, divergence)
+
+        if call.startswith("free"):
+            live[idx] = live[-1]
+            live.pop()
+        elif result is not None:
+            if call.startswith("allocate"):
+                live.append(result)
+            else:
+                live[idx] = result
+            peak_live_regions = max(peak_live_regions, len(live))
+
+        if operation % check_interval == 0 or operation == num_operations:
+            divergence = _check(operation, allocators)
+            if divergence is not None:
+                return FuzzReport(operation, out_of_memory_errors, peak_live_regions, divergence)
+    return FuzzReport(num_operations, out_of_memory_errors, peak_live_regions, None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fuzz the region storages of the allocator against a reference")
+    parser.add_argument("--operations", type=int, default=1_000_000, help="Number of operations per policy")
+    parser.add_argument(
+        "--policy",
+        choices=[policy.name for policy in AllocationPolicy],
+        action="append",
+        help="Allocation policy to fuzz, can be repeated, all policies by default",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random operations")
+    parser.add_argument("--regions", type=int, default=1_000, help="Maximum number of allocated regions")
+    parser.add_argument("--check-interval", type=int, default=1_000, help="Operations between full checks")
+    args = parser.parse_args()
+
+    diverged = False
+    for policy in [AllocationPolicy[name] for name in args.policy] if args.policy else list(AllocationPolicy):
+        report = fuzz(
+            args.operations,
+            policy,
+            seed=args.seed,
+            max_live_regions=args.regions,
+            check_interval=args.check_interval,
+        )
+        print(
+            f"{policy.name}: {report.operations} operations, {report.out_of_memory_errors} out of memory errors, "
+            f"{report.peak_live_regions} peak regions"
+        )
+        divergence = report.divergence
+        if divergence is not None:
+            diverged = True
+            print(f"  {divergence.backend} diverged after operation {divergence.operation}: {divergence.call}")
+            print(f"    expected: {divergence.expected}")
+            print(f"    actual:   {divergence.actual}")
+    sys.exit(1 if diverged else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import bisect
+import typing as ty
+
+from virtual_allocator import (
+    AlignmentError,
+    AllocationPolicy,
+    Allocator,
+    MemoryRegion,
+    OutOfMemoryError,
+    RegionStorage,
+    UnknownRegionError,
+)
+
+__all__ = ["MultiRangeAllocator"]
+
+
+class _Window:
+    """Disjoint address window of a multi-range allocator"""
+
+    __slots__ = ("address", "allocator", "largest_free_size", "size")
+
+    def __init__(self, address: int, size: int, allocator: Allocator) -> None:
+        self.address = address
+        self.size = size
+        self.allocator = allocator
+        self.largest_free_size = size
+
+
+class MultiRangeAllocator:
+    """Allocator for a set of disjoint address windows
+
+    Each window is an :class:`Allocator` for its memory range. The size of the largest free region of every window is
+    kept in a shared index, so allocations go straight to a window which fits them instead of trying the windows in
+    turn. With the first and next fit policies the window with the lowest address is used, with the worst fit policy the
+    window with the largest free region. Otherwise the window with the smallest largest free region is used, which keeps
+    large free regions in the other windows intact. Within the window the allocation policy places the region.
+
+    The first and next fit policies have no index of the free regions of a window, finding the largest one would scan
+    all regions of the window after every operation. For them the shared index keeps an upper bound of the largest free
+    size, which is raised when memory is returned to the window and lowered to the exact size when an allocation in the
+    window fails.
+
+    Regions cannot span multiple windows, windows can be added and removed at runtime.
+    """
+
+    def __init__(
+        self,
+        windows: ty.Iterable[tuple[int, int]],
+        block_size: int,
+        alignment: int,
+        allocation_policy: AllocationPolicy,
+        region_storage: RegionStorage = RegionStorage.LINKED_LIST,
+    ):
+        self._block_size = block_size
+        self._alignment = alignment
+        self._allocation_policy = allocation_policy
+        self._region_storage = region_storage
+
+        self._windows: list[_Window] = []
+        self._window_addresses: list[int] = []
+        # Entries of (largest free size, window address) of all windows with free memory, ordered by size
+        self._free_index: list[tuple[int, int]] = []
+        for address, size in windows:
+            self.add_window(address, size)
+
+    @property
+    def windows(self) -> list[tuple[int, int]]:
+        """Get the (address, size) of all windows ordered by address"""
+        return [(window.address, window.size) for window in self._windows]
+
+    @property
+    def regions(self) -> list[MemoryRegion]:
+        """Get all regions currently in the allocator"""
+        return [region for window in self._windows for region in window.allocator.regions]
+
+    def add_window(self, address: int, size: int) -> None:
+        """Add an address window to the allocator
+
+        :param address: Start address of the window
+        :type address: int
+        :param size: Size of the window
+        :type size: int
+        :raises ValueError: Raised if the size is not positive or the window overlaps another window
+        """
+        if size <= 0:
+            raise ValueError(f"Invalid window size {size}")
+
+        idx = bisect.bisect_right(self._window_addresses, address)
+        if idx > 0:
+            prev_window = self._windows[idx - 1]
+            if prev_window.address + prev_window.size > address:
+                raise ValueError(f"Window at {address:#x} overlaps window at {prev_window.address:#x}")
+        if idx < len(self._windows) and address + size > self._window_addresses[idx]:
+            raise ValueError(f"Window at {address:#x} overlaps window at {self._window_addresses[idx]:#x}")
+
+        allocator = Allocator(
+            address, size, self._block_size, self._alignment, self._allocation_policy, self._region_storage
+        )
+        self._windows.insert(idx, _Window(address, size, allocator))
+        self._window_addresses.insert(idx, address)
+        bisect.insort(self._free_index, (size, address))
+
+    def remove_window(self, address: int) -> None:
+        """Remove the address window starting at `address` from the allocator
+
+        :param address: Start address of the window
+        :type address: int
+        :raises ValueError: Raised if there is no window at the address or it contains allocated regions
+        """
+        idx = bisect.bisect_left(self._window_addresses, address)
+        if idx == len(self._windows) or self._window_addresses[idx] != address:
+            raise ValueError(f"No window at {address:#x}")
+
+        window = self._windows[idx]
+        if any(not region.is_free for region in window.allocator.regions):
+            raise ValueError(f"Window at {address:#x} contains allocated regions")
+
+        self._unindex(window)
+        del self._windows[idx]
+        del self._window_addresses[idx]
+
+    def allocate(self, size: int) -> MemoryRegion:
+        """Allocate memory of `size` in a window which fits it
+
+        :param size: Size of the memory region in bytes
+        :type size: int
+        :raises ValueError: Raised if an invalid size is passed in
+        :raises AlignmentError: Raised if the size is not a multiple of the block size
+        :raises OutOfMemoryError: Raised if no window has a fitting free memory region
+        :return: Allocated memory region
+        :rtype: MemoryRegion
+        """
+        return self._allocate(size)
+
+    def resize(self, region: MemoryRegion, size: int) -> MemoryRegion:
+        """Resize a memory region in place in the window owning it
+
+        :param region: Region to resize
+        :type region: MemoryRegion
+        :param size: New size of the region
+        :type size: int
+        :raises UnknownRegionError: Raised if the region does not exist in the allocator
+        :raises OutOfMemoryError: Raised if the region cannot get resized
+        :return: Resized memory region
+        :rtype: MemoryRegion
+        """
+        window = self._get_window(region)
+        resized_region = window.allocator.resize(region, size)
+        self._update_index(window, resized_region.address + resized_region.total_size)
+        return resized_region
+
+    def reallocate(self, region: MemoryRegion, size: int) -> tuple[MemoryRegion, bool]:
+        """Resize a memory region, move it to a free memory region of any window if it cannot be resized in place
+
+        :param region: Region to reallocate
+        :type region: MemoryRegion
+        :param size: New size of the region
+        :type size: int
+        :raises UnknownRegionError: Raised if the region does not exist in the allocator
+        :raises OutOfMemoryError: Raised if the region can neither be resized nor moved, the region is unchanged then
+        :return: 2-tuple of (reallocated region, whether the start address changed and the data has to be moved)
+        :rtype: tuple[MemoryRegion, bool]
+        """
+        window = self._get_window(region)
+        try:
+            resized_region = window.allocator.resize(region, size)
+        except OutOfMemoryError:
+            pass
+        else:
+            self._update_index(window, resized_region.address + resized_region.total_size)
+            return resized_region, resized_region.address != region.address
+
+        new_region = self._allocate(size)
+        window.allocator.free(region)
+        self._update_index(window, region.address)
+        return new_region, True
+
+    def free(self, region: MemoryRegion) -> None:
+        """Free a memory region in the window owning it
+
+        :param region: Region to free
+        :type region: MemoryRegion
+        :raises UnknownRegionError: Raised if the region does not exist in the allocator
+        """
+        window = self._get_window(region)
+        window.allocator.free(region)
+        self._update_index(window, region.address)
+
+    def _allocate(self, size: int) -> MemoryRegion:
+        """Allocate a region of `size` in a window which fits it"""
+        while True:
+            window = self._find_window(size)
+            try:
+                region = window.allocator.allocate(size)
+            except OutOfMemoryError:
+                # The largest free size of the window was an upper bound, index the exact size and try the next window
+                largest_free_size = window.allocator.stats().largest_free_size
+                if largest_free_size >= window.largest_free_size:
+                    raise
+                self._set_largest_free_size(window, largest_free_size)
+                continue
+            self._update_index(window)
+            return region
+
+    def _find_window(self, size: int) -> _Window:
+        """Find a window with a free region for `size` in the free size index"""
+        if size < 0:
+            raise ValueError(f"Invalid size {size}")
+        if size % self._block_size != 0:
+            raise AlignmentError(f"Size {size} is not a multiple of block size {self._block_size}")
+
+        # The windows fitting the size including its padding are at the end of the index
+        total_size = size + -size % self._alignment
+        idx = bisect.bisect_left(self._free_index, (total_size,))
+        if idx == len(self._free_index):
+            raise OutOfMemoryError(f"No memory region for size {size} found")
+        if self._allocation_policy in (AllocationPolicy.FIRST_FIT, AllocationPolicy.NEXT_FIT):
+            address = min(address for _, address in self._free_index[idx:])
+        elif self._allocation_policy == AllocationPolicy.WORST_FIT:
+            address = self._free_index[-1][1]
+        else:
+            address = self._free_index[idx][1]
+        return self._windows[bisect.bisect_left(self._window_addresses, address)]
+
+    def _get_window(self, region: MemoryRegion) -> _Window:
+        """Get the window owning the address of a region"""
+        idx = bisect.bisect_right(self._window_addresses, region.address) - 1
+        if idx < 0 or region.address > self._windows[idx].address + self._windows[idx].size:
+            raise UnknownRegionError(f"Memory region {region} is unknown")
+        return self._windows[idx]
+
+    def _update_index(self, window: _Window, address: int | None = None) -> None:
+        """Update the largest free size of a window in the free size index after it changed
+
+        :param window: Window which changed
+        :type window: _Window
+        :param address: Address memory was returned to the window at, `None` if no memory was returned. Only the free
+                        region at this address can raise the upper bound of the first and next fit policies.
+        :type address: int | None
+        """
+        if self._allocation_policy not in (AllocationPolicy.FIRST_FIT, AllocationPolicy.NEXT_FIT):
+            # Read from the free region index of the window
+            self._set_largest_free_size(window, window.allocator.stats().largest_free_size)
+        elif address is not None and address < window.address + window.size:
+            free_region = window.allocator.region_at(address)
+            if free_region.is_free and free_region.size > window.largest_free_size:
+                self._set_largest_free_size(window, free_region.size)
+
+    def _set_largest_free_size(self, window: _Window, largest_free_size: int) -> None:
+        """Set the largest free size of a window and move it in the free size index"""
+        self._unindex(window)
+        window.largest_free_size = largest_free_size
+        if largest_free_size:
+            bisect.insort(self._free_index, (largest_free_size, window.address))
+
+    def _unindex(self, window: _Window) -> None:
+        """Remove a window from the free size index"""
+        if window.largest_free_size:
+            del self._free_index[bisect.bisect_left(self._free_index, (window.largest_free_size, window.address))]
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+import math
+import threading
+
+from virtual_allocator import (
+    AllocationPolicy,
+    Allocator,
+    MemoryRegion,
+    OutOfMemoryError,
+    RegionStorage,
+    UnknownRegionError,
+)
+
+__all__ = ["ShardedAllocator"]
+
+
+class _Shard:
+    """Part of the memory range of a sharded allocator with its own lock"""
+
+    __slots__ = ("allocator", "lock")
+
+    def __init__(self, allocator: Allocator) -> None:
+        self.allocator = allocator
+        self.lock = threading.Lock()
+
+
+class ShardedAllocator:
+    """Thread-safe allocator partitioning the memory range into shards
+
+    Each shard is an :class:`Allocator` for a contiguous part of the memory range with its own lock. Every thread gets a
+    home shard assigned on its first allocation, threads with different home shards do not contend for a lock. If the
+    home shard cannot fit an allocation, the other shards are tried in turn before :class:`OutOfMemoryError` is raised.
+    Regions are freed and resized in the shard owning their address.
+
+    Regions cannot span multiple shards, so the largest possible allocation is the size of a shard.
+    """
+
+    def __init__(
+        self,
+        address: int,
+        size: int,
+        block_size: int,
+        alignment: int,
+        allocation_policy: AllocationPolicy,
+        num_shards: int,
+        region_storage: RegionStorage = RegionStorage.LINKED_LIST,
+    ):
+        if num_shards < 1:
+            raise ValueError(f"Invalid number of shards {num_shards}")
+
+        # Shard boundaries are multiples of the block size and the alignment, so each shard behaves like a part of a
+        # single allocator
+        granularity = math.lcm(block_size, alignment)
+        shard_size = size // num_shards // granularity * granularity
+        if not shard_size:
+            raise ValueError(f"Size {size} is too small for {num_shards} shards")
+
+        self._shards: list[_Shard] = []
+        self._shard_addresses: list[int] = []
+        for idx in range(num_shards):
+            shard_address = address + idx * shard_size
+            if idx == num_shards - 1:
+                # The last shard gets the remainder of the memory range
+                shard_size = address + size - shard_address
+            self._shards.append(
+                _Shard(Allocator(shard_address, shard_size, block_size, alignment, allocation_policy, region_storage))
+            )
+            self._shard_addresses.append(shard_address)
+
+        self._local = threading.local()
+        self._next_home_shard = itertools.count()
+
+    @property
+    def num_shards(self) -> int:
+        return len(self._shards)
+
+    @property
+    def regions(self) -> list[MemoryRegion]:
+        """Get all regions currently in the allocator"""
+        regions = []
+        for shard in self._shards:
+            with shard.lock:
+                regions.extend(shard.allocator.regions)
+        return regions
+
+    def allocate(self, size: int) -> MemoryRegion:
+        """Allocate memory of `size` in the home shard of the calling thread, or any other shard if it does not fit
+
+        :param size: Size of the memory region in bytes
+        :type size: int
+        :raises ValueError: Raised if an invalid size is passed in
+        :raises AlignmentError: Raised if the size is not a multiple of the block size
+        :raises OutOfMemoryError: Raised if no shard has a fitting free memory region
+        :return: Allocated memory region
+        :rtype: MemoryRegion
+        """
+        home_shard = self._home_shard()
+        num_shards = len(self._shards)
+        for idx in range(home_shard, home_shard + num_shards):
+            shard = self._shards[idx % num_shards]
+            with shard.lock:
+                try:
+                    return shard.allocator.allocate(size)
+                except OutOfMemoryError:
+                    # Steal from the next shard
+                    pass
+        raise OutOfMemoryError(f"No memory region for size {size} found")
+
+    def resize(self, region: MemoryRegion, size: int) -> MemoryRegion:
+        """Resize a memory region in the shard owning it
+
+        :param region: Region to resize
+        :type region: MemoryRegion
+        :param size: New size of the region
+        :type size: int
+        :raises UnknownRegionError: Raised if the region does not exist in the allocator
+        :raises OutOfMemoryError: Raised if the region cannot get resized
+        :return: Resized memory region
+        :rtype: MemoryRegion
+        """
+        shard = self._get_shard(region)
+        with shard.lock:
+            return shard.allocator.resize(region, size)
+
+    def free(self, region: MemoryRegion) -> None:
+        """Free a memory region in the shard owning it
+
+        :param region: Region to free
+        :type region: MemoryRegion
+        :raises UnknownRegionError: Raised if the region does not exist in the allocator
+        """
+        shard = self._get_shard(region)
+        with shard.lock:
+            shard.allocator.free(region)
+
+    def _home_shard(self) -> int:
+        """Get the index of the home shard of the calling thread, threads are assigned to the shards round-robin"""
+        try:
+            home_shard: int = self._local.home_shard
+        except AttributeError:
+            home_shard = self._local.home_shard = next(self._next_home_shard) % len(self._shards)
+        return home_shard
+
+    def _get_shard(self, region: MemoryRegion) -> _Shard:
+        """Get the shard owning the address of a region"""
+        idx = bisect.bisect_right(self._shard_addresses, region.address) - 1
+        if idx < 0:
+            raise UnknownRegionError(f"Memory region {region} is unknown")
+        return self._shards[idx]
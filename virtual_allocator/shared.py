@@ -0,0 +1,396 @@
+from __future__ import annotations
+
+import bisect
+import multiprocessing
+import multiprocessing.synchronize
+import os
+import struct
+import typing as ty
+from multiprocessing import shared_memory
+
+from virtual_allocator import (
+    AllocationPolicy,
+    Allocator,
+    AllocatorStats,
+    MemoryRegion,
+    OutOfMemoryError,
+    Placement,
+    RegionStorage,
+    _AddressMap,
+    _ArrayRegionTable,
+    _SortedAddresses,
+)
+
+__all__ = ["SharedAllocator"]
+
+# Shared memory layout, all fields are native integers:
+# Configuration: address, size, block size, alignment, maximum number of regions
+# State: head row, number of regions, number of used rows, number of unused rows, number of address map entries,
+#        number of sorted addresses
+# Region columns: addresses, sizes, paddings, requested alignments, previous rows, next rows, unused rows, free flags
+# Address map: keys, rows
+# Sorted start addresses
+_CONFIG = struct.Struct("QQQQQ")
+_STATE_OFFSET = 64
+_HEAD, _LEN, _NUM_ROWS, _NUM_UNUSED_ROWS, _MAP_LEN, _NUM_ADDRESSES = range(6)
+_COLUMNS_OFFSET = 128
+
+_Format: ty.TypeAlias = ty.Literal["B", "q", "Q"]
+
+
+def _map_bits(max_regions: int) -> int:
+    """Get the number of bits of the address map capacity, the load factor stays below 1/2 for `max_regions`"""
+    return (2 * max_regions).bit_length()
+
+
+def _map_offset(max_regions: int) -> int:
+    """Get the offset of the address map in the shared memory for `max_regions` regions"""
+    return _COLUMNS_OFFSET + 7 * 8 * max_regions + -(-max_regions // 8) * 8
+
+
+def _shm_size(max_regions: int) -> int:
+    """Get the size of the shared memory for `max_regions` regions"""
+    return _map_offset(max_regions) + (16 << _map_bits(max_regions)) + 8 * max_regions
+
+
+def _buffer(shm: shared_memory.SharedMemory) -> memoryview:
+    """Get the buffer of a shared memory block"""
+    if shm.buf is None:
+        raise AssertionError(f"Shared memory {shm.name} is closed")
+    return shm.buf
+
+
+class _SharedAddressMap(_AddressMap):
+    """Address map with fixed capacity stored in shared memory"""
+
+    def __init__(self, keys: memoryview, rows: memoryview, state: memoryview, bits: int) -> None:
+        self._keys = keys  # type: ignore[assignment]
+        self._rows = rows  # type: ignore[assignment]
+        self._state = state
+        self._bits = bits
+        self._mask = (1 << bits) - 1
+
+    @property
+    def _len(self) -> int:
+        return int(self._state[_MAP_LEN])
+
+    @_len.setter
+    def _len(self, value: int) -> None:
+        self._state[_MAP_LEN] = value
+
+    def _grow(self) -> None:
+        # The capacity is twice the maximum number of regions, so the load factor limit is never reached
+        raise AssertionError("Shared address map is full")
+
+
+class _SharedSortedAddresses(_SortedAddresses):
+    """Sorted set of addresses with fixed capacity stored in shared memory
+
+    The addresses are kept in a single array, so every process sees the changes of the others. Adding and removing an
+    address moves the following entries in one memory copy.
+    """
+
+    def __init__(self, addresses: memoryview, state: memoryview) -> None:
+        self._addresses = addresses
+        self._state = state
+
+    def __iter__(self) -> ty.Iterator[int]:
+        return iter(self._addresses[: self._state[_NUM_ADDRESSES]].tolist())
+
+    def add(self, address: int) -> None:
+        count = self._state[_NUM_ADDRESSES]
+        idx = bisect.bisect_left(self._addresses, address, 0, count)
+        self._addresses[idx + 1 : count + 1] = self._addresses[idx:count]
+        self._addresses[idx] = address
+        self._state[_NUM_ADDRESSES] = count + 1
+
+    def remove(self, address: int) -> None:
+        count = self._state[_NUM_ADDRESSES] - 1
+        idx = bisect.bisect_left(self._addresses, address, 0, count)
+        self._addresses[idx:count] = self._addresses[idx + 1 : count + 1]
+        self._state[_NUM_ADDRESSES] = count
+
+    def floor(self, address: int) -> int | None:
+        idx = bisect.bisect_right(self._addresses, address, 0, self._state[_NUM_ADDRESSES])
+        return int(self._addresses[idx - 1]) if idx else None
+
+
+class _RowStack:
+    """Stack of unused rows stored in shared memory"""
+
+    def __init__(self, rows: memoryview, state: memoryview) -> None:
+        self._rows = rows
+        self._state = state
+
+    def __len__(self) -> int:
+        return int(self._state[_NUM_UNUSED_ROWS])
+
+    def append(self, row: int) -> None:
+        count = self._state[_NUM_UNUSED_ROWS]
+        self._rows[count] = row
+        self._state[_NUM_UNUSED_ROWS] = count + 1
+
+    def pop(self) -> int:
+        count = self._state[_NUM_UNUSED_ROWS] - 1
+        self._state[_NUM_UNUSED_ROWS] = count
+        return int(self._rows[count])
+
+
+class _SharedRegionTable(_ArrayRegionTable):
+    """Region table with a fixed number of rows stored in shared memory
+
+    All state of the table lives in the shared memory, so every process attached to it sees the same regions.
+    """
+
+    def __init__(self, buf: memoryview, max_regions: int) -> None:
+        self._max_regions = max_regions
+        self._views: list[memoryview] = []
+        self._state = self._view(buf, _STATE_OFFSET, "q", 8)
+        offset = _COLUMNS_OFFSET
+        columns: list[memoryview] = []
+        formats: tuple[_Format, ...] = ("Q", "Q", "Q", "Q", "q", "q", "q")
+        for fmt in formats:
+            columns.append(self._view(buf, offset, fmt, max_regions))
+            offset += 8 * max_regions
+        (
+            self._addresses,
+            self._sizes,
+            self._paddings,
+            self._alignments,
+            self._prev,
+            self._next,
+            unused_rows,
+        ) = columns  # type: ignore[assignment]
+        self._unused_rows = _RowStack(unused_rows, self._state)  # type: ignore[assignment]
+        self._free_flags = self._view(buf, offset, "B", max_regions)  # type: ignore[assignment]
+
+        offset = _map_offset(max_regions)
+        bits = _map_bits(max_regions)
+        keys = self._view(buf, offset, "Q", 1 << bits)
+        rows = self._view(buf, offset + (8 << bits), "q", 1 << bits)
+        self._handles = _SharedAddressMap(keys, rows, self._state, bits)
+        addresses = self._view(buf, offset + (16 << bits), "Q", max_regions)
+        self._sorted_addresses = _SharedSortedAddresses(addresses, self._state)
+
+    def _view(self, buf: memoryview, offset: int, fmt: _Format, count: int) -> memoryview:
+        """Create a view of `count` items of `fmt` at `offset`"""
+        view = buf[offset : offset + struct.calcsize(fmt) * count].cast(fmt)
+        self._views.append(view)
+        return view
+
+    def release(self) -> None:
+        """Release the views of the shared memory, the table cannot be used afterwards"""
+        for view in self._views:
+            view.release()
+
+    @property
+    def _head(self) -> int:
+        return int(self._state[_HEAD])
+
+    @_head.setter
+    def _head(self, value: int) -> None:
+        self._state[_HEAD] = value
+
+    @property
+    def _len(self) -> int:
+        return int(self._state[_LEN])
+
+    @_len.setter
+    def _len(self, value: int) -> None:
+        self._state[_LEN] = value
+
+    @property
+    def num_unused_rows(self) -> int:
+        """Get the number of rows available for new regions"""
+        return self._max_regions - self._state[_NUM_ROWS] + self._state[_NUM_UNUSED_ROWS]
+
+    def _new_row(self, address: int, size: int, padding: int, is_free: bool, prev_row: int, next_row: int) -> int:
+        if self._unused_rows:
+            row = self._unused_rows.pop()
+        else:
+            row = self._state[_NUM_ROWS]
+            self._state[_NUM_ROWS] = row + 1
+        self._addresses[row] = address
+        self._sizes[row] = size
+        self._paddings[row] = padding
+        self._alignments[row] = 0
+        self._free_flags[row] = is_free
+        self._prev[row] = prev_row
+        self._next[row] = next_row
+        return int(row)
+
+
+class SharedAllocator(Allocator):
+    """First fit allocator shared by multiple processes
+
+    The regions are stored in a :class:`multiprocessing.shared_memory.SharedMemory` block and every operation holds a
+    process-safe lock, so all processes attached to the allocator allocate and free directly in the same memory range.
+    Pass the allocator to a child process as an argument, or call :meth:`attach` with the name of the shared memory and
+    the lock.
+
+    The shared memory has room for a fixed number of regions, an operation which would need more regions raises
+    :class:`OutOfMemoryError`. Only the first fit policy is supported, the free region indexes of the other policies are
+    not stored in shared memory. The sorted start addresses for :meth:`region_at` and :meth:`regions_in` are kept in the
+    shared memory as well, so the lookups bisect them in every process.
+
+    :meth:`snapshot` writes the regions under the lock, a snapshot is restored into an :class:`Allocator` with
+    :meth:`Allocator.restore`. Restoring a shared allocator is not supported.
+    """
+
+    def __init__(
+        self,
+        address: int,
+        size: int,
+        block_size: int,
+        alignment: int,
+        max_regions: int,
+        lock: multiprocessing.synchronize.RLock | None = None,
+        name: str | None = None,
+    ):
+        if max_regions < 1:
+            raise ValueError(f"Invalid maximum number of regions {max_regions}")
+
+        map_size = 8 << _map_bits(max_regions)
+        shm = shared_memory.SharedMemory(name, create=True, size=_shm_size(max_regions))
+        buf = _buffer(shm)
+        _CONFIG.pack_into(buf, 0, address, size, block_size, alignment, max_regions)
+        # Mark all slots of the address map as empty, the rows follow the keys
+        rows_offset = _map_offset(max_regions) + map_size
+        buf[rows_offset : rows_offset + map_size] = b"\xff" * map_size
+        self._setup(shm, multiprocessing.RLock() if lock is None else lock)
+        self._regions._head = -1
+        self._insert_before(None, address, size, 0, True)
+
+    @classmethod
+    def attach(cls, name: str, lock: multiprocessing.synchronize.RLock) -> SharedAllocator:
+        """Attach to the shared memory of an allocator created in another process
+
+        :param name: Name of the shared memory of the allocator, see :attr:`name`
+        :type name: str
+        :param lock: Lock of the allocator, see :attr:`lock`
+        :type lock: multiprocessing.synchronize.RLock
+        :return: Allocator operating on the same regions as the allocator which created the shared memory
+        :rtype: SharedAllocator
+        """
+        alloc = cls.__new__(cls)
+        alloc._setup(shared_memory.SharedMemory(name), lock)
+        return alloc
+
+    def _setup(self, shm: shared_memory.SharedMemory, lock: multiprocessing.synchronize.RLock) -> None:
+        """Initialize the allocator with the configuration and the regions in the shared memory"""
+        address, size, block_size, alignment, max_regions = _CONFIG.unpack_from(_buffer(shm))
+        super().__init__(address, size, block_size, alignment, AllocationPolicy.FIRST_FIT)
+        self._shm = shm
+        self._lock = lock
+        self._regions: _SharedRegionTable = _SharedRegionTable(_buffer(shm), max_regions)
+
+    def __reduce__(self) -> tuple[ty.Any, ...]:
+        # Child processes attach to the shared memory instead of copying the regions
+        return type(self).attach, (self.name, self._lock)
+
+    @property
+    def name(self) -> str:
+        """Get the name of the shared memory storing the regions"""
+        return self._shm.name
+
+    @property
+    def lock(self) -> multiprocessing.synchronize.RLock:
+        """Get the lock held by all operations"""
+        return self._lock
+
+    @property
+    def regions(self) -> list[MemoryRegion]:
+        with self._lock:
+            return super().regions
+
+    def stats(self) -> AllocatorStats:
+        with self._lock:
+            return super().stats()
+
+    def validate(self) -> None:
+        with self._lock:
+            super().validate()
+
+    def allocate(self, size: int, alignment: int | None = None, hint: int | Placement | None = None) -> MemoryRegion:
+        with self._lock:
+            # Placing a region in the middle of a free region splits it into three regions
+            self._check_capacity(1 if alignment is None and hint is None else 2)
+            return super().allocate(size, alignment, hint)
+
+    def allocate_many(self, sizes: ty.Iterable[int]) -> list[MemoryRegion]:
+        sizes = list(sizes)
+        with self._lock:
+            self._check_capacity(len(sizes))
+            return super().allocate_many(sizes)
+
+    def resize(self, region: MemoryRegion, size: int) -> MemoryRegion:
+        with self._lock:
+            self._check_capacity(1)
+            return super().resize(region, size)
+
+    def reallocate(self, region: MemoryRegion, size: int) -> tuple[MemoryRegion, bool]:
+        with self._lock:
+            # Moving a region with a requested alignment can split a free region into three regions
+            self._check_capacity(2 if self._regions.alignment(self._get_region_handle(region)) else 1)
+            return super().reallocate(region, size)
+
+    def region_at(self, address: int) -> MemoryRegion:
+        with self._lock:
+            return super().region_at(address)
+
+    def regions_in(self, start: int, end: int) -> list[MemoryRegion]:
+        with self._lock:
+            return super().regions_in(start, end)
+
+    def free(self, region: MemoryRegion) -> None:
+        with self._lock:
+            super().free(region)
+
+    def free_many(self, regions: ty.Iterable[MemoryRegion]) -> None:
+        with self._lock:
+            super().free_many(regions)
+
+    def coalesce(self) -> None:
+        with self._lock:
+            super().coalesce()
+
+    def snapshot(self, path: str | os.PathLike[str]) -> None:
+        with self._lock:
+            super().snapshot(path)
+
+    @classmethod
+    def restore(
+        cls, path: str | os.PathLike[str], region_storage: RegionStorage = RegionStorage.LINKED_LIST
+    ) -> Allocator:
+        """Not supported, the regions of a shared allocator live in shared memory of a fixed size
+
+        :raises NotImplementedError: Always raised, restore the snapshot with :meth:`Allocator.restore` instead
+        """
+        raise NotImplementedError("Shared allocators cannot be restored, use Allocator.restore")
+
+    def compact(self) -> dict[int, int]:
+        with self._lock:
+            # The free regions are replaced by the free memory in front of the regions with a requested alignment and
+            # a free region at the end
+            regions = self._regions
+            self._check_capacity(
+                1 + sum(1 if regions.alignment(handle) else -regions.is_free(handle) for handle in regions)
+            )
+            return super().compact()
+
+    def close(self) -> None:
+        """Detach from the shared memory, the allocator cannot be used afterwards"""
+        self._regions.release()
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Destroy the shared memory, call once after all processes closed the allocator"""
+        self._shm.unlink()
+
+    def _check_capacity(self, num_regions: int) -> None:
+        """Check that the shared memory has room for `num_regions` new regions before the regions are modified
+
+        :raises OutOfMemoryError: Raised if the shared memory has no room for the regions
+        """
+        if self._regions.num_unused_rows < num_regions:
+            raise OutOfMemoryError(f"No room for {num_regions} more regions in shared memory {self.name}")
@@ -0,0 +1,227 @@
+"""Simulate the placement of an allocator for large workloads on NumPy arrays
+
+Requires NumPy, install it with the ``numpy`` extra: ``pip install virtual-allocator[numpy]``.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+
+from virtual_allocator import AlignmentError, AllocationPolicy
+
+try:
+    import numpy as np
+    import numpy.typing as npt
+except ImportError as exc:  # pragma: no cover
+    raise ImportError("virtual_allocator.simulate requires NumPy, install virtual-allocator[numpy]") from exc
+
+__all__ = ["SimulationResult", "simulate"]
+
+# Number of regions freed at once from which the free list is rebuilt instead of inserting the regions one by one
+_BATCH_THRESHOLD = 32
+
+
+@dataclasses.dataclass(frozen=True)
+class SimulationResult:
+    """Placement and curves of a simulation, all arrays have one entry per request"""
+
+    addresses: npt.NDArray[np.int64]  # Start address of each request, -1 if it raised OutOfMemoryError
+    times: npt.NDArray[np.float64]  # Arrival time of each request
+    occupancy: npt.NDArray[np.int64]  # Allocated memory including padding after each request
+    fragmentation: npt.NDArray[np.float64]  # Share of free memory outside the largest free region after each request
+
+    @property
+    def out_of_memory_errors(self) -> int:
+        return int(np.count_nonzero(self.addresses < 0))
+
+
+class _FreeList:
+    """Free regions in parallel arrays ordered by address, adjacent free regions are always merged"""
+
+    def __init__(self, address: int, size: int) -> None:
+        # Spare capacity at the end of the arrays avoids reallocating them for every inserted free region
+        self.starts = np.zeros(64, dtype=np.int64)
+        self.sizes = np.zeros(64, dtype=np.int64)
+        self.starts[0] = address
+        self.sizes[0] = size
+        self.count = 1
+        self.free_size = size
+        self.largest = size
+
+    def find_first(self, size: int) -> int:
+        """Get the index of the free region with the lowest address which fits `size`, -1 if none fits"""
+        if not self.count:
+            return -1
+        fits = self.sizes[: self.count] >= size
+        idx = int(fits.argmax())
+        return idx if fits[idx] else -1
+
+    def find_best(self, size: int) -> int:
+        """Get the index of the smallest free region which fits `size`, ties are broken by the lowest address"""
+        if not self.count:
+            return -1
+        sizes = self.sizes[: self.count]
+        candidates = np.where(sizes >= size, sizes, np.iinfo(np.int64).max)
+        idx = int(candidates.argmin())
+        return idx if sizes[idx] >= size else -1
+
+    def take(self, idx: int, size: int) -> int:
+        """Allocate `size` at the start of the free region `idx` and return the address"""
+        address = int(self.starts[idx])
+        region_size = int(self.sizes[idx])
+        self.free_size -= size
+        if region_size == size:
+            self.starts[idx : self.count - 1] = self.starts[idx + 1 : self.count]
+            self.sizes[idx : self.count - 1] = self.sizes[idx + 1 : self.count]
+            self.count -= 1
+        else:
+            self.starts[idx] += size
+            self.sizes[idx] -= size
+        if region_size == self.largest:
+            self.largest = int(self.sizes[: self.count].max()) if self.count else 0
+        return address
+
+    def release(self, address: int, size: int) -> None:
+        """Free a region and merge it with the adjacent free regions"""
+        self.free_size += size
+        merged_size = size
+        count = self.count
+        idx = int(np.searchsorted(self.starts[:count], address))
+        merge_prev = idx > 0 and self.starts[idx - 1] + self.sizes[idx - 1] == address
+        merge_next = idx < count and address + size == self.starts[idx]
+        if merge_prev and merge_next:
+            self.sizes[idx - 1] += size + self.sizes[idx]
+            merged_size = int(self.sizes[idx - 1])
+            self.starts[idx : count - 1] = self.starts[idx + 1 : count]
+            self.sizes[idx : count - 1] = self.sizes[idx + 1 : count]
+            self.count -= 1
+        elif merge_prev:
+            self.sizes[idx - 1] += size
+            merged_size = int(self.sizes[idx - 1])
+        elif merge_next:
+            self.starts[idx] = address
+            self.sizes[idx] += size
+            merged_size = int(self.sizes[idx])
+        else:
+            if count == len(self.starts):
+                self.starts = np.concatenate([self.starts, np.zeros(count, dtype=np.int64)])
+                self.sizes = np.concatenate([self.sizes, np.zeros(count, dtype=np.int64)])
+            self.starts[idx + 1 : count + 1] = self.starts[idx:count]
+            self.sizes[idx + 1 : count + 1] = self.sizes[idx:count]
+            self.starts[idx] = address
+            self.sizes[idx] = size
+            self.count += 1
+        self.largest = max(self.largest, merged_size)
+
+    def release_batch(self, addresses: npt.NDArray[np.int64], sizes: npt.NDArray[np.int64]) -> None:
+        """Free multiple regions by merging them into the free list with sorting instead of one insertion per region"""
+        if len(addresses) < _BATCH_THRESHOLD:
+            for address, size in zip(addresses.tolist(), sizes.tolist()):
+                self.release(address, size)
+            return
+
+        self.free_size += int(sizes.sum())
+        starts = np.concatenate([self.starts[: self.count], addresses])
+        region_sizes = np.concatenate([self.sizes[: self.count], sizes])
+        order = np.argsort(starts, kind="stable")
+        starts = starts[order]
+        region_sizes = region_sizes[order]
+        # A region starts a new free region unless it directly follows the previous one
+        is_first = np.ones(len(starts), dtype=bool)
+        is_first[1:] = starts[1:] != starts[:-1] + region_sizes[:-1]
+        firsts = np.flatnonzero(is_first)
+        self.count = len(firsts)
+        self.starts = np.concatenate([starts[firsts], np.zeros(self.count, dtype=np.int64)])
+        self.sizes = np.concatenate([np.add.reduceat(region_sizes, firsts), np.zeros(self.count, dtype=np.int64)])
+        self.largest = int(self.sizes[: self.count].max())
+
+
+def simulate(
+    address: int,
+    size: int,
+    block_size: int,
+    alignment: int,
+    allocation_policy: AllocationPolicy,
+    sizes: npt.ArrayLike,
+    lifetimes: npt.ArrayLike,
+    arrivals: npt.ArrayLike | None = None,
+) -> SimulationResult:
+    """Simulate the placement of a stream of requests by an :class:`Allocator`
+
+    Request `i` is allocated at `arrivals[i]` and freed at `arrivals[i] + lifetimes[i]`. Before each allocation, all
+    requests ending at or before its arrival are freed. The placement is the same as with an :class:`Allocator` of the
+    same configuration receiving the same calls, requests which do not fit fail like with :class:`OutOfMemoryError`.
+
+    The free regions are kept in sorted arrays, the search for a fitting region is a vectorized scan over them and
+    batches of freed regions are merged into them with a single sort. This is much faster than the first fit scan of
+    :class:`Allocator` for large numbers of free regions.
+
+    :param address: Start address of the simulated memory range
+    :type address: int
+    :param size: Size of the simulated memory range
+    :type size: int
+    :param block_size: Block size of the simulated allocator
+    :type block_size: int
+    :param alignment: Alignment of the simulated allocator
+    :type alignment: int
+    :param allocation_policy: Allocation policy to simulate, `FIRST_FIT` or `BEST_FIT`
+    :type allocation_policy: AllocationPolicy
+    :param sizes: Size of each request, positive multiples of the block size
+    :type sizes: npt.ArrayLike
+    :param lifetimes: Time from the allocation to the free of each request, positive, `inf` for requests never freed
+    :type lifetimes: npt.ArrayLike
+    :param arrivals: Non-decreasing allocation time of each request, the index of the request by default
+    :type arrivals: npt.ArrayLike | None
+    :raises ValueError: Raised for unsupported policies and invalid requests
+    :raises AlignmentError: Raised if a size is not a multiple of the block size
+    :return: Placement of the requests with the occupancy and fragmentation after each request
+    :rtype: SimulationResult
+    """
+    if allocation_policy not in (AllocationPolicy.FIRST_FIT, AllocationPolicy.BEST_FIT):
+        raise ValueError(f"Simulation of allocation policy {allocation_policy} is not supported")
+
+    request_sizes = np.asarray(sizes, dtype=np.int64)
+    num_requests = len(request_sizes)
+    times = np.arange(num_requests, dtype=np.float64) if arrivals is None else np.asarray(arrivals, dtype=np.float64)
+    request_lifetimes = np.asarray(lifetimes, dtype=np.float64)
+    if len(times) != num_requests or len(request_lifetimes) != num_requests:
+        raise ValueError("The numbers of sizes, lifetimes and arrivals differ")
+    ends = times + request_lifetimes
+    if np.any(request_sizes <= 0):
+        raise ValueError("Sizes have to be positive")
+    if np.any(request_sizes % block_size):
+        raise AlignmentError(f"Sizes are not a multiple of block size {block_size}")
+    if np.any(ends <= times):
+        raise ValueError("Lifetimes have to be positive")
+    if np.any(np.diff(times) < 0):
+        raise ValueError("Arrivals have to be non-decreasing")
+
+    # Sizes including the padding to the alignment, as added by the allocator
+    total_sizes = -(-request_sizes // alignment) * alignment
+    free_order = np.argsort(ends, kind="stable")
+    sorted_ends = ends[free_order]
+    # Number of requests ending at or before the arrival of each request
+    num_freed = np.searchsorted(sorted_ends, times, side="right")
+
+    free_list = _FreeList(address, size)
+    find = free_list.find_first if allocation_policy == AllocationPolicy.FIRST_FIT else free_list.find_best
+    addresses = np.full(num_requests, -1, dtype=np.int64)
+    occupancy = np.empty(num_requests, dtype=np.int64)
+    fragmentation = np.empty(num_requests, dtype=np.float64)
+    freed = 0
+    for idx, total_size in enumerate(total_sizes.tolist()):
+        if num_freed[idx] > freed:
+            # Lifetimes are positive, so all requests ending before this arrival were allocated before
+            ending = free_order[freed : num_freed[idx]]
+            ending = ending[addresses[ending] >= 0]
+            free_list.release_batch(addresses[ending], total_sizes[ending])
+            freed = int(num_freed[idx])
+
+        free_idx = find(total_size)
+        if free_idx >= 0:
+            addresses[idx] = free_list.take(free_idx, total_size)
+        free_size = free_list.free_size
+        occupancy[idx] = size - free_size
+        fragmentation[idx] = 1 - free_list.largest / free_size if free_size else 0.0
+
+    return SimulationResult(addresses, times, occupancy, fragmentation)
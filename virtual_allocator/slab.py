@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import collections
+import typing as ty
+
+from virtual_allocator import Allocator, MemoryRegion, OutOfMemoryError, UnknownRegionError
+
+__all__ = ["SlabCache"]
+
+
+class _SizeClass:
+    """Slabs of one object size"""
+
+    def __init__(self, size: int, stride: int) -> None:
+        self.size = size
+        self.stride = stride
+        self.partial_slabs: dict[_Slab, None] = {}  # Slabs with free objects, in insertion order
+        # Slabs without allocated objects, the least recently emptied slab first
+        self.empty_slabs: collections.OrderedDict[_Slab, None] = collections.OrderedDict()
+
+
+class _Slab:
+    """Region of the backing allocator split into objects of one size class"""
+
+    __slots__ = ("free_objects", "num_objects", "region", "size_class")
+
+    def __init__(self, region: MemoryRegion, size_class: _SizeClass, num_objects: int) -> None:
+        self.region = region
+        self.size_class = size_class
+        self.num_objects = num_objects
+        # Stack of the addresses of the free objects, the lowest address is handed out first
+        self.free_objects = [region.address + idx * size_class.stride for idx in reversed(range(num_objects))]
+
+    @property
+    def is_empty(self) -> bool:
+        return len(self.free_objects) == self.num_objects
+
+
+class SlabCache:
+    """Cache of fixed-size objects in front of an allocator
+
+    For each configured object size, the cache carves slabs for `objects_per_slab` objects from the backing allocator
+    and hands out the objects from per-size freelists in O(1). Allocations of other sizes are passed through to the
+    backing allocator. Objects are laid out with the alignment of the backing allocator, the difference to the next
+    object is reported as the padding of the regions.
+
+    Slabs which become empty are kept for reuse, at most `max_empty_slabs` of them per size class. When more slabs become
+    empty, the least recently emptied slab is returned to the backing allocator. With `max_empty_slabs=None` empty slabs
+    are only returned by :meth:`reclaim`.
+    """
+
+    def __init__(
+        self,
+        allocator: Allocator,
+        object_sizes: ty.Iterable[int],
+        objects_per_slab: int = 64,
+        max_empty_slabs: int | None = 1,
+    ):
+        if objects_per_slab < 1:
+            raise ValueError(f"Invalid number of objects per slab {objects_per_slab}")
+        if max_empty_slabs is not None and max_empty_slabs < 0:
+            raise ValueError(f"Invalid number of empty slabs {max_empty_slabs}")
+
+        self._allocator = allocator
+        self._objects_per_slab = objects_per_slab
+        self._max_empty_slabs = max_empty_slabs
+        self._size_classes: dict[int, _SizeClass] = {}
+        for size in object_sizes:
+            allocator.check_size(size)
+            self._size_classes[size] = _SizeClass(size, size + allocator.get_padding(size))
+        self._objects: dict[int, tuple[_Slab, int]] = {}  # Address to (slab, size) of the allocated objects
+
+    @property
+    def allocator(self) -> Allocator:
+        """Get the backing allocator"""
+        return self._allocator
+
+    def allocate(self, size: int) -> MemoryRegion:
+        """Allocate memory of `size`
+
+        Sizes of the configured size classes are allocated from a slab, other sizes from the backing allocator.
+
+        :param size: Size of the memory region in bytes
+        :type size: int
+        :raises ValueError: Raised if an invalid size is passed in
+        :raises AlignmentError: Raised if the size is not a multiple of the block size
+        :raises OutOfMemoryError: Raised if no new slab or region could be allocated from the backing allocator
+        :return: Allocated memory region
+        :rtype: MemoryRegion
+        """
+        size_class = self._size_classes.get(size)
+        if size_class is None:
+            return self._allocator.allocate(size)
+
+        if size_class.partial_slabs:
+            slab = next(reversed(size_class.partial_slabs))
+        elif size_class.empty_slabs:
+            slab, _ = size_class.empty_slabs.popitem()
+            size_class.partial_slabs[slab] = None
+        else:
+            slab = _Slab(
+                self._allocator.allocate(size_class.stride * self._objects_per_slab),
+                size_class,
+                self._objects_per_slab,
+            )
+            size_class.partial_slabs[slab] = None
+
+        address = slab.free_objects.pop()
+        if not slab.free_objects:
+            del size_class.partial_slabs[slab]
+        self._objects[address] = (slab, size)
+        return MemoryRegion(address, size, is_free=False, padding=size_class.stride - size)
+
+    def resize(self, region: MemoryRegion, size: int) -> MemoryRegion:
+        """Resize a memory region
+
+        Objects in a slab can only be resized within their slot, other regions are resized by the backing allocator.
+
+        :param region: Region to resize
+        :type region: MemoryRegion
+        :param size: New size of the region
+        :type size: int
+        :raises UnknownRegionError: Raised if the region does not exist
+        :raises OutOfMemoryError: Raised if the region cannot get resized
+        :return: Resized memory region
+        :rtype: MemoryRegion
+        """
+        if region.address not in self._objects:
+            return self._allocator.resize(region, size)
+
+        self._allocator.check_size(size)
+        slab, size_class = self._get_object(region)
+        if size > size_class.stride:
+            raise OutOfMemoryError(f"Cannot resize {region} to size {size}")
+        self._objects[region.address] = (slab, size)
+        return MemoryRegion(region.address, size, is_free=False, padding=size_class.stride - size)
+
+    def free(self, region: MemoryRegion) -> None:
+        """Free a memory region
+
+        :param region: Region to free
+        :type region: MemoryRegion
+        :raises UnknownRegionError: Raised if the region does not exist
+        """
+        if region.address not in self._objects:
+            self._allocator.free(region)
+            return
+
+        slab, size_class = self._get_object(region)
+        del self._objects[region.address]
+        if not slab.free_objects:
+            size_class.partial_slabs[slab] = None
+        slab.free_objects.append(region.address)
+        if not slab.is_empty:
+            return
+
+        del size_class.partial_slabs[slab]
+        size_class.empty_slabs[slab] = None
+        if self._max_empty_slabs is not None and len(size_class.empty_slabs) > self._max_empty_slabs:
+            evicted_slab, _ = size_class.empty_slabs.popitem(last=False)
+            self._allocator.free(evicted_slab.region)
+
+    def reclaim(self) -> int:
+        """Return all empty slabs to the backing allocator
+
+        :return: Number of slabs returned
+        :rtype: int
+        """
+        num_slabs = 0
+        for size_class in self._size_classes.values():
+            for slab in size_class.empty_slabs:
+                self._allocator.free(slab.region)
+            num_slabs += len(size_class.empty_slabs)
+            size_class.empty_slabs.clear()
+        return num_slabs
+
+    def _get_object(self, region: MemoryRegion) -> tuple[_Slab, _SizeClass]:
+        """Get the slab and size class of an allocated object"""
+        slab, size = self._objects[region.address]
+        size_class = slab.size_class
+        if region != MemoryRegion(region.address, size, is_free=False, padding=size_class.stride - size):
+            raise UnknownRegionError(f"Memory region {region} is unknown")
+        return slab, size_class
@@ -0,0 +1,524 @@
+"""Record the calls of an allocator to a trace file and replay traces against other allocators
+
+A trace is a text file with a header line followed by one line per call, written while the calls happen. Regions are
+referred to by an ID assigned on allocation, so a trace can be replayed with a different placement of the regions:
+
+* ``a <id> <size> <address> [alignment=<alignment>] [hint=<hint>] <ns>``: allocation of region `id`, the alignment and
+  the hint are only written if they were passed, the hint is an address or the name of a :class:`Placement`
+* ``A <id> <size>,<size>,... <address>,<address>,... <ns>``: allocation of multiple regions at once, the regions get
+  consecutive IDs starting at `id`
+* ``r <id> <size> <address> <ns>``: resize of region `id` to `size`, `address` is the new start address
+* ``m <id> <size> <address> <ns>``: reallocation of region `id` to `size`, `address` is the new start address
+* ``f <id> <ns>``: free of region `id`
+* ``F <id> <id> ... <ns>``: free of multiple regions at once
+* ``c <ns>``: compaction of the allocator
+
+`address` and the list of addresses are ``-`` if the call raised :class:`OutOfMemoryError`, `ns` is the duration of the
+call in nanoseconds.
+
+Replay a trace from the command line with ``python -m virtual_allocator.trace <trace> [--policy BEST_FIT]``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import dataclasses
+import os
+import time
+import types
+import typing as ty
+
+from virtual_allocator import AllocationPolicy, Allocator, MemoryRegion, OutOfMemoryError, Placement, RegionStorage
+
+__all__ = ["ReplayReport", "TraceRecorder", "replay"]
+
+_T = ty.TypeVar("_T")
+
+_HEADER_MAGIC = "virtual-allocator-trace"
+_VERSION = 1
+
+
+class TraceRecorder:
+    """Record the calls of an allocator to a trace file
+
+    While recording, the allocation methods of the allocator instance are replaced by wrappers which write each call to
+    the trace, so the allocator can be recorded without changing the code using it. Regions allocated before the
+    recording starts are written to the trace as allocations.
+
+    Stop the recording with :meth:`close` or by using the recorder as a context manager.
+    """
+
+    _METHODS = ("allocate", "allocate_many", "resize", "reallocate", "free", "free_many", "compact")
+
+    def __init__(self, allocator: Allocator, path: str | os.PathLike[str]):
+        self._allocator = allocator
+        self._next_id = 0
+        self._ids: dict[MemoryRegion, list[int]] = {}  # IDs of the live regions, equal empty regions share an entry
+
+        # The file stays open until the recording stops, it is only closed here if writing the header fails
+        with contextlib.ExitStack() as stack:
+            self._file = stack.enter_context(open(path, "w"))
+            self._file.write(
+                f"{_HEADER_MAGIC} {_VERSION} {allocator.address} {allocator.size} {allocator.block_size} "
+                f"{allocator.alignment} {allocator.allocation_policy.name}\n"
+            )
+            for region in allocator.regions:
+                if not region.is_free:
+                    self._file.write(f"a {self._add(region)} {region.size} {region.address} 0\n")
+            self._closer = stack.pop_all()
+
+        # Keep instance attributes like the wrappers of an instrumented allocator, they are restored on close
+        self._replaced = {name: allocator.__dict__[name] for name in self._METHODS if name in allocator.__dict__}
+        self._methods: dict[str, ty.Callable[..., ty.Any]] = {name: getattr(allocator, name) for name in self._METHODS}
+        for name in self._METHODS:
+            setattr(allocator, name, getattr(self, f"_{name}"))
+
+    def __enter__(self) -> ty.Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: types.TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop recording, restore the methods of the allocator and close the trace file"""
+        if self._file.closed:
+            return
+        for name in self._METHODS:
+            if name in self._replaced:
+                setattr(self._allocator, name, self._replaced[name])
+            else:
+                delattr(self._allocator, name)
+        self._closer.close()
+
+    def _add(self, region: MemoryRegion) -> int:
+        """Assign an ID to a newly allocated region"""
+        region_id = self._next_id
+        self._next_id += 1
+        self._ids.setdefault(region, []).append(region_id)
+        return region_id
+
+    def _add_failed(self) -> int:
+        """Assign an ID to an allocation which failed, the ID is never referred to again"""
+        region_id = self._next_id
+        self._next_id += 1
+        return region_id
+
+    def _get(self, region: MemoryRegion) -> int | None:
+        """Get the ID of a live region, `None` if the region is not allocated"""
+        ids = self._ids.get(region)
+        return ids[-1] if ids else None
+
+    def _pop(self, region: MemoryRegion) -> int:
+        """Remove a live region and return its ID"""
+        ids = self._ids[region]
+        region_id = ids.pop()
+        if not ids:
+            del self._ids[region]
+        return region_id
+
+    def _allocate(self, size: int, alignment: int | None = None, hint: int | Placement | None = None) -> MemoryRegion:
+        options = "" if alignment is None else f" alignment={alignment}"
+        if hint is not None:
+            options += f" hint={hint.name if isinstance(hint, Placement) else hint}"
+        start = time.perf_counter_ns()
+        try:
+            region: MemoryRegion = self._methods["allocate"](size, alignment, hint)
+        except OutOfMemoryError:
+            self._file.write(f"a {self._add_failed()} {size} -{options} {time.perf_counter_ns() - start}\n")
+            raise
+        duration = time.perf_counter_ns() - start
+        self._file.write(f"a {self._add(region)} {size} {region.address}{options} {duration}\n")
+        return region
+
+    def _allocate_many(self, sizes: ty.Iterable[int]) -> list[MemoryRegion]:
+        sizes = list(sizes)
+        first_id = self._next_id
+        start = time.perf_counter_ns()
+        try:
+            regions: list[MemoryRegion] = self._methods["allocate_many"](sizes)
+        except OutOfMemoryError:
+            self._next_id += len(sizes)
+            self._file.write(f"A {first_id} {','.join(map(str, sizes))} - {time.perf_counter_ns() - start}\n")
+            raise
+        duration = time.perf_counter_ns() - start
+        if regions:
+            for region in regions:
+                self._add(region)
+            addresses = ",".join(str(region.address) for region in regions)
+            self._file.write(f"A {first_id} {','.join(map(str, sizes))} {addresses} {duration}\n")
+        return regions
+
+    def _resize(self, region: MemoryRegion, size: int) -> MemoryRegion:
+        return ty.cast(MemoryRegion, self._record_resize("r", region, size))
+
+    def _reallocate(self, region: MemoryRegion, size: int) -> tuple[MemoryRegion, bool]:
+        return ty.cast(tuple[MemoryRegion, bool], self._record_resize("m", region, size))
+
+    def _record_resize(self, operation: str, region: MemoryRegion, size: int) -> ty.Any:
+        """Record a call of :meth:`Allocator.resize` or :meth:`Allocator.reallocate`"""
+        method = self._methods["resize" if operation == "r" else "reallocate"]
+        region_id = self._get(region)
+        start = time.perf_counter_ns()
+        try:
+            result = method(region, size)
+        except OutOfMemoryError:
+            if region_id is not None:
+                self._file.write(f"{operation} {region_id} {size} - {time.perf_counter_ns() - start}\n")
+            raise
+        duration = time.perf_counter_ns() - start
+        new_region = result if operation == "r" else result[0]
+        if region_id is not None:
+            self._pop(region)
+            self._ids.setdefault(new_region, []).append(region_id)
+            self._file.write(f"{operation} {region_id} {size} {new_region.address} {duration}\n")
+        return result
+
+    def _free(self, region: MemoryRegion) -> None:
+        region_id = self._get(region)
+        start = time.perf_counter_ns()
+        self._methods["free"](region)
+        duration = time.perf_counter_ns() - start
+        if region_id is not None:
+            self._pop(region)
+            self._file.write(f"f {region_id} {duration}\n")
+
+    def _free_many(self, regions: ty.Iterable[MemoryRegion]) -> None:
+        regions = list(regions)
+        start = time.perf_counter_ns()
+        self._methods["free_many"](regions)
+        duration = time.perf_counter_ns() - start
+        region_ids = [self._pop(region) for region in regions if self._get(region) is not None]
+        self._file.write(f"F {' '.join(map(str, region_ids))} {duration}\n")
+
+    def _compact(self) -> dict[int, int]:
+        start = time.perf_counter_ns()
+        relocations: dict[int, int] = self._methods["compact"]()
+        duration = time.perf_counter_ns() - start
+        ids: dict[MemoryRegion, list[int]] = {}
+        for region, region_ids in self._ids.items():
+            address = relocations.get(region.address, region.address)
+            ids.setdefault(dataclasses.replace(region, address=address), []).extend(region_ids)
+        self._ids = ids
+        self._file.write(f"c {duration}\n")
+        return relocations
+
+
+class _ReplayTarget(ty.Protocol):
+    """Allocator a trace can be replayed against"""
+
+    def allocate(self, size: int) -> MemoryRegion: ...
+
+    def resize(self, region: MemoryRegion, size: int) -> MemoryRegion: ...
+
+    def free(self, region: MemoryRegion) -> None: ...
+
+
+@dataclasses.dataclass(frozen=True)
+class ReplayReport:
+    """Comparison of a replay with the recorded trace
+
+    The peak end address is the highest end address of an allocated region including its padding, the difference to the
+    start address of the allocator is the peak memory usage including fragmentation. The trace only contains the
+    requested sizes, the recorded peak adds the padding to the alignment of the recorded allocator.
+    """
+
+    operations: int  # Number of replayed operations
+    different_placements: int  # Number of allocations, resizes and reallocations with a different resulting address
+    recorded_out_of_memory_errors: int
+    replayed_out_of_memory_errors: int
+    recorded_peak_end_address: int
+    replayed_peak_end_address: int
+    recorded_duration_ns: int  # Total duration of the recorded calls
+    replayed_duration_ns: int  # Total duration of the replayed calls
+
+
+def _read_header(line: str) -> tuple[int, int, int, int, AllocationPolicy]:
+    """Parse the header line of a trace into (address, size, block size, alignment, allocation policy)"""
+    fields = line.split()
+    if len(fields) != 7 or fields[0] != _HEADER_MAGIC:
+        raise ValueError("Not an allocator trace")
+    if int(fields[1]) != _VERSION:
+        raise ValueError(f"Unsupported trace version {fields[1]}")
+    address, size, block_size, alignment = (int(field) for field in fields[2:6])
+    return address, size, block_size, alignment, AllocationPolicy[fields[6]]
+
+
+def replay(
+    path: str | os.PathLike[str],
+    allocator: _ReplayTarget | None = None,
+    allocation_policy: AllocationPolicy | None = None,
+    region_storage: RegionStorage = RegionStorage.LINKED_LIST,
+) -> ReplayReport:
+    """Replay a trace against an allocator and compare the results to the recording
+
+    The trace is streamed, only the regions which are currently allocated are kept in memory. Calls which raised
+    :class:`OutOfMemoryError` in the recording are attempted as well, if they succeed in the replay they are undone, so
+    the replay stays in the same state as the recording.
+
+    Allocators without the batch methods `allocate_many` and `free_many` get the regions of batches allocated and freed
+    one by one. Reallocations are replayed with `resize` and the allocation of a new region if the allocator has no
+    `reallocate` method, compactions are skipped if it has no `compact` method.
+
+    :param path: Path of the trace file
+    :type path: str | os.PathLike[str]
+    :param allocator: Allocator to replay the trace against, by default a new :class:`Allocator` with the configuration
+                      of the recorded allocator
+    :type allocator: _ReplayTarget | None
+    :param allocation_policy: Allocation policy of the default allocator, the recorded policy if `None`
+    :type allocation_policy: AllocationPolicy | None
+    :param region_storage: Region storage of the default allocator
+    :type region_storage: RegionStorage
+    :raises ValueError: Raised if the file is not a valid trace
+    :return: Comparison of the replay with the recording
+    :rtype: ReplayReport
+    """
+    with open(path) as f:
+        address, size, block_size, alignment, recorded_policy = _read_header(f.readline())
+        if allocator is None:
+            allocator = Allocator(
+                address, size, block_size, alignment, allocation_policy or recorded_policy, region_storage
+            )
+        return _Replay(allocator, address, alignment).run(f)
+
+
+class _Replay:
+    """State of the replay of a trace"""
+
+    def __init__(self, allocator: _ReplayTarget, address: int, alignment: int) -> None:
+        self._allocator = allocator
+        self._alignment = alignment  # Alignment of the recorded allocator
+        self._regions: dict[int, MemoryRegion] = {}  # Replayed regions by ID
+        self._operations = 0
+        self._different_placements = 0
+        self._recorded_errors = 0
+        self._replayed_errors = 0
+        self._recorded_peak = address
+        self._replayed_peak = address
+        self._recorded_duration = 0
+        self._replayed_duration = 0
+        self._handlers: dict[str, ty.Callable[[list[str]], None]] = {
+            "a": self._allocate,
+            "A": self._allocate_many,
+            "r": self._resize,
+            "m": self._resize,
+            "f": self._free,
+            "F": self._free_many,
+            "c": self._compact,
+        }
+
+    def run(self, lines: ty.Iterable[str]) -> ReplayReport:
+        for line in lines:
+            fields = line.split()
+            self._operations += 1
+            self._recorded_duration += int(fields[-1])
+            self._handlers[fields[0]](fields)
+        return ReplayReport(
+            self._operations,
+            self._different_placements,
+            self._recorded_errors,
+            self._replayed_errors,
+            self._recorded_peak,
+            self._replayed_peak,
+            self._recorded_duration,
+            self._replayed_duration,
+        )
+
+    def _timed(self, func: ty.Callable[..., _T], *args: ty.Any, **kwargs: ty.Any) -> _T:
+        """Call `func` and add the duration to the replayed duration"""
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._replayed_duration += time.perf_counter_ns() - start
+
+    def _record_result(
+        self, region_ids: list[int], sizes: list[int], recorded: list[int] | None, replayed: list[MemoryRegion] | None
+    ) -> bool:
+        """Compare the resulting addresses of a call, return whether the replayed call has to be undone"""
+        if recorded is None:
+            self._recorded_errors += 1
+        else:
+            for address, size in zip(recorded, sizes):
+                self._recorded_peak = max(self._recorded_peak, address + size + -size % self._alignment)
+        if replayed is None:
+            self._replayed_errors += 1
+            self._different_placements += 0 if recorded is None else len(region_ids)
+            return False
+        if recorded is None:
+            self._different_placements += len(region_ids)
+            return True
+
+        for region_id, address, region in zip(region_ids, recorded, replayed):
+            self._regions[region_id] = region
+            self._replayed_peak = max(self._replayed_peak, region.address + region.total_size)
+            self._different_placements += region.address != address
+        return False
+
+    def _allocate(self, fields: list[str]) -> None:
+        region_id, size = int(fields[1]), int(fields[2])
+        # Only pass the options which were recorded, so allocators without them can replay the other allocations
+        options: dict[str, int | Placement] = {}
+        for field in fields[4:-1]:
+            name, value = field.split("=", 1)
+            if name == "alignment":
+                options[name] = int(value)
+            elif name == "hint":
+                options[name] = Placement[value] if value in Placement.__members__ else int(value)
+            else:
+                raise ValueError(f"Unknown allocation option {field}")
+        try:
+            region: MemoryRegion | None = self._timed(self._allocator.allocate, size, **options)
+        except OutOfMemoryError:
+            region = None
+        recorded = None if fields[3] == "-" else [int(fields[3])]
+        if self._record_result([region_id], [size], recorded, None if region is None else [region]):
+            assert region is not None
+            self._allocator.free(region)
+
+    def _allocate_many(self, fields: list[str]) -> None:
+        first_id = int(fields[1])
+        sizes = [int(size) for size in fields[2].split(",")]
+        try:
+            regions: list[MemoryRegion] | None = self._timed(self._allocate_batch, sizes)
+        except OutOfMemoryError:
+            regions = None
+        recorded = None if fields[3] == "-" else [int(address) for address in fields[3].split(",")]
+        if self._record_result(list(range(first_id, first_id + len(sizes))), sizes, recorded, regions):
+            assert regions is not None
+            self._free_batch(regions)
+
+    def _resize(self, fields: list[str]) -> None:
+        region_id, size = int(fields[1]), int(fields[2])
+        previous_region = self._regions.get(region_id)
+        if previous_region is None:
+            # The allocation of the region failed in the replay
+            return
+        move = fields[0] == "m"
+        try:
+            region: MemoryRegion | None = self._timed(self._resize_region, previous_region, size, move)
+        except OutOfMemoryError:
+            region = None
+        recorded = None if fields[3] == "-" else [int(fields[3])]
+        if self._record_result([region_id], [size], recorded, None if region is None else [region]):
+            assert region is not None
+            restored_region = self._restore_region(region, previous_region)
+            if restored_region is None:
+                # The region is lost, later operations on it are skipped like after a failed allocation
+                del self._regions[region_id]
+            else:
+                self._regions[region_id] = restored_region
+
+    def _free(self, fields: list[str]) -> None:
+        region = self._regions.pop(int(fields[1]), None)
+        if region is not None:
+            self._timed(self._allocator.free, region)
+
+    def _free_many(self, fields: list[str]) -> None:
+        region_ids = [int(field) for field in fields[1:-1]]
+        self._timed(self._free_batch, [self._regions.pop(i) for i in region_ids if i in self._regions])
+
+    def _compact(self, fields: list[str]) -> None:
+        compact = getattr(self._allocator, "compact", None)
+        if compact is None:
+            return
+        relocations: dict[int, int] = self._timed(compact)
+        for region_id, region in self._regions.items():
+            if region.address in relocations:
+                self._regions[region_id] = dataclasses.replace(region, address=relocations[region.address])
+
+    def _allocate_batch(self, sizes: list[int]) -> list[MemoryRegion]:
+        allocate_many = getattr(self._allocator, "allocate_many", None)
+        if allocate_many is not None:
+            regions: list[MemoryRegion] = allocate_many(sizes)
+            return regions
+        regions = []
+        try:
+            for size in sizes:
+                regions.append(self._allocator.allocate(size))
+        except OutOfMemoryError:
+            self._free_batch(regions)
+            raise
+        return regions
+
+    def _free_batch(self, regions: list[MemoryRegion]) -> None:
+        free_many = getattr(self._allocator, "free_many", None)
+        if free_many is not None:
+            free_many(regions)
+            return
+        for region in regions:
+            self._allocator.free(region)
+
+    def _restore_region(self, region: MemoryRegion, previous_region: MemoryRegion) -> MemoryRegion | None:
+        """Undo a resize or reallocation, `None` if the previous region could not be allocated again
+
+        A region which kept its start address is shrunk back in place. A region which grew into the previous free
+        region or moved is freed and allocated again at its previous address, allocators without placement hints
+        allocate it anywhere.
+        """
+        if region.address == previous_region.address:
+            try:
+                return self._allocator.resize(region, previous_region.size)
+            except OutOfMemoryError:
+                pass
+        self._allocator.free(region)
+        try:
+            if isinstance(self._allocator, Allocator):
+                return self._allocator.allocate(previous_region.size, hint=previous_region.address)
+            return self._allocator.allocate(previous_region.size)
+        except OutOfMemoryError:
+            return None
+
+    def _resize_region(self, region: MemoryRegion, size: int, move: bool) -> MemoryRegion:
+        """Resize a region in place, or move it as well if `move` is set"""
+        if not move:
+            return self._allocator.resize(region, size)
+        reallocate = getattr(self._allocator, "reallocate", None)
+        if reallocate is not None:
+            new_region: MemoryRegion = reallocate(region, size)[0]
+            return new_region
+        try:
+            return self._allocator.resize(region, size)
+        except OutOfMemoryError:
+            new_region = self._allocator.allocate(size)
+            self._allocator.free(region)
+            return new_region
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay an allocator trace and compare it to the recording")
+    parser.add_argument("trace", help="Path of the trace file")
+    parser.add_argument(
+        "--policy", choices=[policy.name for policy in AllocationPolicy], help="Allocation policy of the replay"
+    )
+    parser.add_argument(
+        "--storage",
+        choices=[storage.name for storage in RegionStorage],
+        default=RegionStorage.LINKED_LIST.name,
+        help="Region storage of the replay",
+    )
+    args = parser.parse_args()
+
+    report = replay(
+        args.trace,
+        allocation_policy=AllocationPolicy[args.policy] if args.policy else None,
+        region_storage=RegionStorage[args.storage],
+    )
+    print(f"operations:           {report.operations}")
+    print(f"different placements: {report.different_placements}")
+    print(f"{'':22}{'recorded':>16}{'replayed':>16}")
+    print(
+        f"{'out of memory errors':22}{report.recorded_out_of_memory_errors:>16}"
+        f"{report.replayed_out_of_memory_errors:>16}"
+    )
+    print(f"{'peak end address':22}{report.recorded_peak_end_address:>16}{report.replayed_peak_end_address:>16}")
+    print(f"{'duration [ms]':22}{report.recorded_duration_ns / 1e6:>16.1f}{report.replayed_duration_ns / 1e6:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()